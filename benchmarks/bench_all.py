@@ -0,0 +1,82 @@
+"""
+Benchmark: time to first row and total time of `all`, old single Rich table vs pages and plain streaming.
+
+Run from the repository root:
+    python -m benchmarks.bench_all [N ...]
+"""
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.bench_birthdays import make_book
+from src import commands
+
+SIZES = [10_000, 100_000]
+LEGACY_LIMIT = 10_000  # the old table takes about a minute at 100k contacts
+
+
+class FirstWrite(io.StringIO):
+    """Output stream that remembers when something was first written to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.first = None
+
+    def write(self, text):
+        if self.first is None and text:
+            self.first = time.perf_counter()
+        return super().write(text)
+
+
+# Copy of the previous implementation, kept here only for comparison.
+def legacy_all(book, console):
+    table = Table(title="All Contacts", title_style="bold magenta", box=box.MINIMAL_DOUBLE_HEAD)
+    for column in ("Name", "Phones", "Email", "Birthday"):
+        table.add_column(column)
+    for name, record in book.data.items():
+        phones = ', '.join([p.value for p in record.phones])
+        email = record.email.value if record.email else ''
+        birthday = record.birthday.value.strftime("%d.%m.%Y") if record.birthday else ''
+        table.add_row(name, phones, email, birthday)
+    console.print(table)
+
+
+def measure(run, terminal):
+    out = FirstWrite()
+    commands.console = Console(file=out, force_terminal=terminal, width=120)
+    started = time.perf_counter()
+    with redirect_stdout(out):
+        run()
+    elapsed = time.perf_counter() - started
+    return (out.first - started) * 1000, elapsed * 1000
+
+
+def main(sizes):
+    console = commands.console
+    try:
+        for n in sizes:
+            book = make_book(n)
+            book.name_range()  # build the ordered name index outside the timings
+            print(f"\n{n} contacts (ms)")
+            print(f"  {'method':<24} {'first row':>10} {'total':>10}")
+            runs = [
+                ("page 1, Rich table", lambda: commands.all_contacts([], book), True),
+                ("page 1000, Rich table", lambda: commands.all_contacts(["--page", "1000", "--size", "10"], book), True),
+                ("plain stream, all rows", lambda: commands.all_contacts([], book), False),
+            ]
+            if n <= LEGACY_LIMIT:
+                runs.insert(0, ("old single table", lambda: legacy_all(book, commands.console), True))
+            for label, run, terminal in runs:
+                first, total = measure(run, terminal)
+                print(f"  {label:<24} {first:10.2f} {total:10.2f}")
+    finally:
+        commands.console = console
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
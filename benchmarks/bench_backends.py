@@ -0,0 +1,72 @@
+"""
+Backend-agnostic benchmark: the same operations against pickle, record file and SQLite storage.
+
+Run from the repository root:
+    python -m benchmarks.bench_backends [N ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+from src.models.contacts import AddressBook, Record
+from src.models.notes import Notes, Note
+from src.storage.persistence import STORAGE_FILES, save_contacts, load_contacts, save_notes, load_notes
+
+SIZES = [10_000, 100_000]
+WORDS = "alpha beta gamma delta meeting call project report budget travel family urgent idea".split()
+TAGS = ["work", "home", "urgent", "later", "archived"]
+
+
+def make_data(n, seed=42):
+    rnd = random.Random(seed)
+    book, notes = AddressBook(), Notes()
+    for i in range(n):
+        rec = Record(f"Contact{i}")
+        rec.add_phone("+380" + str(500000000 + i))
+        if i % 2:
+            rec.add_birthday(date(rnd.randint(1950, 2010), rnd.randint(1, 12), rnd.randint(1, 28)))
+        book.add_record(rec)
+    for i in range(n // 10):
+        note = Note(f"note{i}", " ".join(rnd.choice(WORDS) for _ in range(20)))
+        for tag in rnd.sample(TAGS, 2):
+            note.add_tag(tag)
+        notes.add_note(note)
+    return book, notes
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return (time.perf_counter() - started) * 1000
+
+
+def run(storage, tmp, book, notes, n):
+    contacts_file, notes_file = (os.path.join(tmp, f) for f in STORAGE_FILES[storage])
+    results = {"save": timed(lambda: (save_contacts(book, contacts_file), save_notes(notes, notes_file)))}
+    loaded = {}
+    results["load"] = timed(lambda: loaded.update(book=load_contacts(contacts_file), notes=load_notes(notes_file)))
+    b, ns = loaded["book"], loaded["notes"]
+    results["find"] = timed(lambda: [b.find(f"Contact{i}") for i in range(0, n, n // 100)])
+    results["birthdays 7"] = timed(lambda: list(b.upcoming_birthdays(7)))
+    results["who"] = timed(lambda: b.find_by_phone("+380" + str(500000000 + n // 2)))
+    results["find-note"] = timed(lambda: list(ns.search("project or budget")))
+    results["find-tag"] = timed(lambda: ns.find_by_tags("work & !archived"))
+    return results
+
+
+def main(sizes):
+    for n in sizes:
+        book, notes = make_data(n)
+        print(f"\n{n} contacts, {n // 10} notes (ms)")
+        with tempfile.TemporaryDirectory() as tmp:
+            table = {storage: run(storage, tmp, book, notes, n) for storage in ("pickle", "recordfile", "sqlite", "sharded")}
+        print(f"{'operation':<12}" + "".join(f"{storage:>12}" for storage in table))
+        for op in table["pickle"]:
+            print(f"{op:<12}" + "".join(f"{table[storage][op]:>12.2f}" for storage in table))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,58 @@
+"""
+Benchmark: `birthdays <delta>` via the day-of-year index vs the old full scan.
+
+Run from the repository root:
+    python -m benchmarks.bench_birthdays [N ...]
+"""
+import random
+import sys
+import timeit
+from datetime import date
+
+from src.models.contacts import AddressBook, Record
+
+SIZES = [10_000, 100_000, 1_000_000]
+DELTAS = [1, 7, 30]
+
+
+def make_book(n, seed=42):
+    rnd = random.Random(seed)
+    book = AddressBook()
+    for i in range(n):
+        rec = Record(f"Contact{i}")
+        rec.add_birthday(date(rnd.randint(1950, 2010), rnd.randint(1, 12), rnd.randint(1, 28)))
+        book.add_record(rec)
+    return book
+
+
+def scan(book, delta, today):
+    """The previous implementation: visit every record."""
+    upcoming = []
+    for rec in book.data.values():
+        if rec.birthday:
+            bday = rec.birthday.value.replace(year=today.year)
+            if bday < today:
+                bday = bday.replace(year=today.year + 1)
+            if 0 <= (bday - today).days <= delta:
+                upcoming.append(rec)
+    return upcoming
+
+
+def indexed(book, delta, today):
+    return [rec for _, rec in book.upcoming_birthdays(delta, today)]
+
+
+def main(sizes):
+    today = date.today()
+    print(f"{'contacts':>10} {'delta':>6} {'matches':>8} {'scan ms':>9} {'index ms':>9}")
+    for n in sizes:
+        book = make_book(n)
+        for delta in DELTAS:
+            matches = len(indexed(book, delta, today))
+            t_scan = min(timeit.repeat(lambda: scan(book, delta, today), number=1, repeat=3))
+            t_index = min(timeit.repeat(lambda: indexed(book, delta, today), number=1, repeat=3))
+            print(f"{n:>10} {delta:>6} {matches:>8} {t_scan * 1000:>9.2f} {t_index * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,107 @@
+"""
+Benchmark: duplicate search with blocking and sorted-neighbourhood windows vs all pairs.
+
+Run from the repository root:
+    python -m benchmarks.bench_dedupe [N ...]
+
+Into a book of N contacts it plants N * PLANTED near-duplicates of random contacts
+(another case or separator, or a typo, with one of the original's phones in another
+format, its email or its birthday) and reports the search time, the pairs compared and
+the precision and recall on the planted pairs. Up to EXHAUSTIVE_MAX contacts it also
+compares every pair, to show what the windows miss and what they save.
+"""
+import random
+import re
+import sys
+import time
+from itertools import combinations
+
+from benchmarks.dataset import make_contacts
+from src.models.contacts import AddressBook, Record
+from src.models.dedupe import Profile, compare, find_duplicates
+
+SIZES = [1_000, 10_000, 100_000]
+PLANTED = 0.05
+EXHAUSTIVE_MAX = 2_000
+
+
+def variant_name(name, rnd):
+    """Another spelling of a name: other case and separators, or a typo in a letter."""
+    if rnd.random() < 0.5:
+        words = re.findall(r"[A-Z][a-z]*|\d+", name)
+        return rnd.choice(("_", ".", " ", "")).join(words).lower()
+    letters = [i for i, c in enumerate(name) if c.isalpha()]
+    i = rnd.choice(letters[1:-1])
+    kind = rnd.choice(("swap", "drop", "replace"))
+    if kind == "swap":
+        return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    if kind == "drop":
+        return name[:i] + name[i + 1:]
+    return name[:i] + rnd.choice("aeiouy") + name[i + 1:]
+
+
+def plant_duplicates(book, count, seed=7):
+    """Add count variants of random contacts; returns the (original, variant) pairs."""
+    rnd = random.Random(seed)
+    planted = set()
+    originals = rnd.sample(sorted(book.data), count)
+    for name in originals:
+        record = book.find(name)
+        duplicate = variant_name(name, rnd)
+        if duplicate in book.data:
+            continue
+        copy = Record(duplicate)
+        shared = rnd.choice(["phone"] + ["email"] * (record.email is not None) +
+                            ["birthday"] * (record.birthday is not None))
+        if shared == "phone":
+            phone = rnd.choice(record.phones).value
+            copy.add_phone(phone[3:] if phone.startswith("+380") else phone)
+        elif shared == "email":
+            copy.add_email(record.email.value.upper())
+        else:
+            copy.add_birthday(record.birthday.value)
+        book.add_record(copy)
+        planted.add(frozenset((name, duplicate)))
+    return planted
+
+
+def found_pairs(report):
+    """Every pair of contacts put in one group."""
+    pairs = set()
+    for group in report.groups:
+        names = [group.keep] + [name for name, _ in group.merged]
+        pairs.update(frozenset(pair) for pair in combinations(names, 2))
+    return pairs
+
+
+def exhaustive(book):
+    """Confirmed pairs found by comparing every pair of contacts."""
+    profiles = [Profile(record) for record in book.data.values()]
+    return {frozenset((a.name, b.name)) for a, b in combinations(profiles, 2) if compare(a, b) is not None}
+
+
+def main(sizes):
+    print(f"{'contacts':>9}{'planted':>9}{'ms':>10}{'compared':>12}{'all pairs':>15}{'precision':>11}{'recall':>8}")
+    for n in sizes:
+        book = AddressBook()
+        for record in make_contacts(n):
+            book.add_record(record)
+        planted = plant_duplicates(book, int(n * PLANTED))
+        total = len(book)
+        started = time.perf_counter()
+        report = find_duplicates(book)
+        elapsed = (time.perf_counter() - started) * 1000
+        found = found_pairs(report)
+        hits = len(found & planted)
+        print(f"{total:>9}{len(planted):>9}{elapsed:>10.1f}{report.candidates:>12}{total * (total - 1) // 2:>15}"
+              f"{hits / len(found) if found else 1:>11.3f}{hits / len(planted):>8.3f}")
+        if total <= EXHAUSTIVE_MAX:
+            started = time.perf_counter()
+            every = exhaustive(book)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"  all pairs: {elapsed:.1f} ms, {len(every)} confirmed pairs, "
+                  f"{len(every - found)} missed by the windows")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
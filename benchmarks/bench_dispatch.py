@@ -0,0 +1,87 @@
+"""
+Benchmark: command resolution over a typo corpus, old smart_guess vs the precomputed Dispatcher.
+
+Run from the repository root:
+    python -m benchmarks.bench_dispatch [N ...]
+"""
+import difflib
+import random
+import string
+import sys
+import time
+
+from src.commands import COMMANDS, ALIASES
+from src.utils.autocomplete import Dispatcher
+
+SIZES = [10_000, 100_000]
+
+
+# Copy of the previous implementation, kept here only for comparison.
+def legacy_guess(user_input, commands, aliases):
+    text = user_input.lower()
+    if text in aliases:
+        return aliases[text]
+    if text in commands:
+        return text
+    for cmd in commands:
+        if cmd in text:
+            return cmd
+    possible = list(commands.keys()) + list(aliases.keys())
+    prefix_matches = [cmd for cmd in possible if cmd.startswith(text)]
+    if prefix_matches:
+        return prefix_matches[0]
+    matches = difflib.get_close_matches(text, possible, n=1, cutoff=0.8)
+    return matches[0] if matches else None
+
+
+def typo(word, rnd):
+    """One random edit: deletion, insertion, substitution, adjacent swap or truncation."""
+    i = rnd.randrange(len(word))
+    kind = rnd.randrange(5)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + rnd.choice(string.ascii_lowercase) + word[i:]
+    if kind == 2:
+        return word[:i] + rnd.choice(string.ascii_lowercase) + word[i + 1:]
+    if kind == 3 and i + 1 < len(word):
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:max(i, 2)]
+
+
+def make_corpus(n, seed=42):
+    rnd = random.Random(seed)
+    names = list(COMMANDS) + list(ALIASES)
+    corpus = []
+    for _ in range(n):
+        word = rnd.choice(names)
+        corpus.append((typo(word, rnd), ALIASES.get(word, word)))
+    return corpus
+
+
+def run(label, resolve, corpus):
+    started = time.perf_counter()
+    results = [resolve(text) for text, _ in corpus]
+    elapsed = time.perf_counter() - started
+    correct = sum(result == expected for result, (_, expected) in zip(results, corpus))
+    wrong = sum(result is not None and result != expected for result, (_, expected) in zip(results, corpus))
+    print(f"  {label:<22} {elapsed / len(corpus) * 1e6:8.3f} us/lookup  "
+          f"correct {correct / len(corpus):6.1%}  wrong {wrong / len(corpus):6.1%}")
+
+
+def main(sizes):
+    started = time.perf_counter()
+    dispatcher = Dispatcher(COMMANDS, ALIASES)
+    print(f"Dispatcher built in {(time.perf_counter() - started) * 1000:.2f} ms")
+    for n in sizes:
+        corpus = make_corpus(n)
+        print(f"\n{n} inputs, {len(set(text for text, _ in corpus))} distinct")
+        run("smart_guess (old)", lambda text: legacy_guess(text, COMMANDS, ALIASES), corpus)
+        run("Dispatcher (cold)", Dispatcher(COMMANDS, ALIASES).resolve, corpus)
+        for text, _ in corpus:
+            dispatcher.resolve(text)
+        run("Dispatcher (memoized)", dispatcher.resolve, corpus)
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,60 @@
+"""
+Benchmark: streaming CSV/JSONL/vCard import (inline vs process pool) and export.
+
+Run from the repository root:
+    python -m benchmarks.bench_exchange [N]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.models.contacts import AddressBook
+from src.storage.exchange import import_contacts, export_contacts
+
+ROWS = 1_000_000
+
+
+def write_csv(path, n, seed=42):
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("name,phones,email,birthday\n")
+        for i in range(n):
+            phones = ";".join("+380" + str(rnd.randrange(10**8, 10**9)) for _ in range(rnd.randint(1, 2)))
+            email = f"user{i}@example.com" if i % 2 else ""
+            birthday = f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.{rnd.randint(1950, 2010)}" if i % 3 else ""
+            if i % 1000 == 0:
+                phones = "bad-phone"  # planted errors
+            f.write(f"Contact{i},{phones},{email},{birthday}\n")
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "contacts.csv")
+        write_csv(source, n)
+        print(f"{n} rows, {os.path.getsize(source) / 2**20:.1f} MB CSV")
+
+        for workers in (1, os.cpu_count() or 1):
+            book = AddressBook()
+            report, elapsed = timed(import_contacts, book, source, workers=workers)
+            print(f"import csv   workers={workers:<3} {elapsed:7.2f}s  {n / elapsed:>9.0f} rows/s  "
+                  f"imported={report.imported} failed={report.failed}")
+
+        for fmt in ("csv", "jsonl", "vcard"):
+            target = os.path.join(tmp, "export." + fmt)
+            count, elapsed = timed(export_contacts, book, target, fmt)
+            print(f"export {fmt:<6}            {elapsed:7.2f}s  {count / elapsed:>9.0f} rows/s")
+            if fmt != "csv":
+                _, elapsed = timed(import_contacts, AddressBook(), target, fmt)
+                print(f"import {fmt:<6}            {elapsed:7.2f}s  {count / elapsed:>9.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else ROWS)
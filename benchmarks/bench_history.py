@@ -0,0 +1,82 @@
+"""
+Benchmark: cost of versioning each command for undo/redo, vs deep-copying the book per command.
+
+Run from the repository root:
+    python -m benchmarks.bench_history [N ...]
+"""
+import copy
+import random
+import sys
+import time
+
+from benchmarks.bench_birthdays import make_book
+from src import commands
+from src.models.notes import Notes
+
+SIZES = [10_000, 100_000, 1_000_000]
+COMMANDS = 2000
+DEEPCOPY_LIMIT = 100_000  # a deep copy of 1M contacts takes tens of seconds
+
+
+def make_script(names, seed=7):
+    """Mix of contact changes on the given existing names (never touching one after deleting it)."""
+    rnd = random.Random(seed)
+    names = list(names)
+    script = []
+    for i in range(COMMANDS):
+        kind = rnd.randrange(4)
+        name = names.pop(rnd.randrange(len(names))) if kind == 3 else rnd.choice(names)
+        if kind == 0:
+            script.append(("add", [name, f"050{rnd.randrange(10 ** 7):07d}"]))
+        elif kind == 1:
+            script.append(("add-email", [name, f"user{i}@example.com"]))
+        elif kind == 2:
+            script.append(("change-birthday", [name, f"{rnd.randint(1, 28):02d}.05.1990"]))
+        else:
+            script.append(("delete-contact", [name]))
+    return script
+
+
+def run(script, book, notes, before=None, versioned=True):
+    started = time.perf_counter()
+    for command, args in script:
+        if before:
+            before()
+        handler = commands.COMMANDS[command]
+        (handler if versioned else handler.__wrapped__)(args, book, notes)
+    return (time.perf_counter() - started) / len(script) * 1e6
+
+
+def main(sizes):
+    for n in sizes:
+        notes = Notes()
+        book = make_book(n)
+        script = make_script(f"Contact{i}" for i in range(0, n, 2))
+        commands.history.clear()
+        print(f"\n{n} contacts, {COMMANDS} commands (us per command)")
+
+        plain = run(make_script(f"Contact{i}" for i in range(1, n, 2)), book, notes, versioned=False)
+        print(f"  {'command alone':<28} {plain:10.1f}")
+        versioned = run(script, book, notes)
+        print(f"  {'command + new version':<28} {versioned:10.1f}")
+
+        started = time.perf_counter()
+        undone = 0
+        while commands.history.undo(book, notes):
+            undone += 1
+        print(f"  {'undo':<28} {(time.perf_counter() - started) / undone * 1e6:10.1f}")
+        started = time.perf_counter()
+        while commands.history.redo(book, notes):
+            pass
+        print(f"  {'redo':<28} {(time.perf_counter() - started) / undone * 1e6:10.1f}")
+
+        if n <= DEEPCOPY_LIMIT:
+            copies = []
+            short = script[:20]
+            per_command = run(short, book, notes, lambda: copies.append(copy.deepcopy(book.data)))
+            print(f"  {'command + deepcopy':<28} {per_command:10.1f}")
+        commands.history.clear()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
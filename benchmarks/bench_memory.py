@@ -0,0 +1,86 @@
+"""
+Memory benchmark: legacy Field-per-value Record layout vs the compact slotted Record.
+
+Run from the repository root:
+    python -m benchmarks.bench_memory [N ...]
+"""
+import gc
+import random
+import sys
+import tracemalloc
+from datetime import date
+
+from src.models.contacts import Record
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+# Copy of the original layout, kept here only for comparison.
+class LegacyField:
+    def __init__(self, value):
+        self.value = value
+
+
+class LegacyRecord:
+    def __init__(self, name):
+        self.name = LegacyField(name)
+        self.phones = []
+        self.email = None
+        self.birthday = None
+
+
+def make_rows(n, seed=42):
+    rnd = random.Random(seed)
+    for i in range(n):
+        phones = ["+380" + str(rnd.randrange(10**8, 10**9)) for _ in range(rnd.randint(1, 3))]
+        email = f"user{i}@example.com" if i % 2 else None
+        birthday = date(rnd.randint(1950, 2010), rnd.randint(1, 12), rnd.randint(1, 28)) if i % 3 else None
+        yield f"Contact{i}", phones, email, birthday
+
+
+def build_legacy(rows):
+    data = {}
+    for name, phones, email, birthday in rows:
+        rec = LegacyRecord(name)
+        rec.phones = [LegacyField(p) for p in phones]
+        rec.email = LegacyField(email) if email else None
+        rec.birthday = LegacyField(birthday) if birthday else None
+        data[name] = rec
+    return data
+
+
+def build_compact(rows):
+    data = {}
+    for name, phones, email, birthday in rows:
+        rec = Record(name)
+        for p in phones:
+            rec.add_phone(p)
+        if email:
+            rec.add_email(email)
+        if birthday:
+            rec.add_birthday(birthday)
+        data[name] = rec
+    return data
+
+
+def measure(builder, rows):
+    gc.collect()
+    tracemalloc.start()
+    data = builder(rows)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current
+
+
+def main(sizes):
+    print(f"{'contacts':>10} {'legacy MB':>10} {'compact MB':>11} {'saved':>7}")
+    for n in sizes:
+        # Rows are generated inside the measurement so the strings each layout keeps are counted.
+        legacy = measure(build_legacy, make_rows(n))
+        compact = measure(build_compact, make_rows(n))
+        print(f"{n:>10} {legacy / 2**20:>10.1f} {compact / 2**20:>11.1f} {1 - compact / legacy:>7.0%}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
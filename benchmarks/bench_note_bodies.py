@@ -0,0 +1,87 @@
+"""
+Benchmark: loading notes with bodies in a memory-mapped blob file vs unpickling every body.
+
+Run from the repository root:
+    python -m benchmarks.bench_note_bodies [N ...]
+
+For N notes of 10-60 words it reports the load time, the memory held after loading
+(traced in a second load), the first full-text search (which, for the blob file, builds
+the index by reading the bodies), a tag query and a save after changing three notes in
+four, which compacts the blob file.
+"""
+import gc
+import glob
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.dataset import make_notes
+from src.models.notes import Notes
+from src.storage import recordfile
+from src.storage.persistence import save_notes, load_notes
+
+SIZES = [10_000, 100_000, 300_000]
+
+
+def held_memory(load):
+    """Bytes still allocated after one load (timed separately: tracing slows it down)."""
+    gc.collect()
+    tracemalloc.start()
+    notes = load()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del notes
+    return current
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def blob_size(notes_file):
+    return sum(os.path.getsize(name) for name in glob.glob(notes_file + ".*.blobs"))
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_file = os.path.join(tmp, "notes.pkl")
+        records_file = os.path.join(tmp, "notes.dat")
+        for n in sizes:
+            notes = Notes()
+            for note in make_notes(n):
+                notes.add_note(note)
+            save_notes(notes, pickle_file)
+            save_notes(notes, records_file)
+            del notes
+
+            print(f"\n{n} notes ({os.path.getsize(pickle_file) / 2 ** 20:.1f} MiB pickled)")
+            for label, filename in (("pickle, bodies in memory", pickle_file),
+                                    ("blob file, bodies mapped", records_file)):
+                held = held_memory(lambda: load_notes(filename))
+                gc.collect()
+                notes, load_ms = timed(lambda: load_notes(filename))
+                _, search_ms = timed(lambda: notes.find_note("meeting report"))
+                _, tag_ms = timed(lambda: notes.find_by_tag("urgent"))
+                print(f"  {label:<26} load {load_ms:9.1f} ms  held {held / 2 ** 20:7.1f} MiB  "
+                      f"first find-note {search_ms:8.1f} ms  find-tag {tag_ms:6.2f} ms")
+                del notes
+
+            notes = load_notes(records_file)
+            for i in range(n):
+                if i % 4:
+                    notes.change_note(f"note{i}", f"changed body of note {i}")
+            grown = blob_size(records_file)
+            _, save_ms = timed(lambda: save_notes(notes, records_file))
+            compacted = "compacted" if notes._bodies.size < grown else f"kept (garbage under " \
+                f"{recordfile.COMPACT_MIN_GARBAGE / 2 ** 20:g} MiB or half the file)"
+            print(f"  {'change 3/4, then save':<26} save {save_ms:9.1f} ms  "
+                  f"blob file {grown / 2 ** 20:.1f} -> {blob_size(records_file) / 2 ** 20:.1f} MiB, {compacted}")
+            del notes
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
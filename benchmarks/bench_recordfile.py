@@ -0,0 +1,43 @@
+"""
+Benchmark: startup (load + one find) with pickle vs the lazily loaded record file.
+
+Run from the repository root:
+    python -m benchmarks.bench_recordfile [N ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_birthdays import make_book
+from src.storage.persistence import save_contacts, load_contacts
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def startup(filename, name, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        book = load_contacts(filename)
+        book.find(name)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(sizes):
+    print(f"{'contacts':>10} {'pickle ms':>10} {'recordfile ms':>14} {'pickle MB':>10} {'recordfile MB':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            book = make_book(n)
+            pkl, dat = os.path.join(tmp, "book.pkl"), os.path.join(tmp, "book.dat")
+            save_contacts(book, pkl)
+            save_contacts(book, dat)
+            name = f"Contact{n // 2}"
+            t_pkl, t_dat = startup(pkl, name), startup(dat, name)
+            print(f"{n:>10} {t_pkl * 1000:>10.1f} {t_dat * 1000:>14.3f} "
+                  f"{os.path.getsize(pkl) / 2**20:>10.1f} {os.path.getsize(dat) / 2**20:>14.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
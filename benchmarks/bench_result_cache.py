@@ -0,0 +1,70 @@
+"""
+Benchmark: read-heavy command mix with the result cache on and off.
+
+Run from the repository root:
+    python -m benchmarks.bench_result_cache [N ...]
+
+For a book of N contacts (and N // 10 notes) it runs rounds of READS_PER_WRITE reads,
+drawn from a few popular queries, followed by one change that alternates between the
+book and the notes, and reports the time per command and the cache hit rate.
+"""
+import io
+import random
+import sys
+import time
+from contextlib import redirect_stdout
+
+from benchmarks.dataset import make_data
+from src.commands import COMMANDS, results
+
+SIZES = [10_000, 100_000]
+ROUNDS = 50
+READS_PER_WRITE = 20
+QUERIES = [
+    ("birthdays", ["7"]),
+    ("birthdays", ["30"]),
+    ("find-note", ["project", "budget"]),
+    ("find-note", ["meet*"]),
+    ("find-tag", ["work", "&", "!archived"]),
+    ("tags", []),
+    ("all", ["--page", "1"]),
+    ("all", ["--sort", "birthday", "--page", "2"]),
+]
+
+
+def workload(seed=7):
+    rnd = random.Random(seed)
+    for round_no in range(ROUNDS):
+        for _ in range(READS_PER_WRITE):
+            yield rnd.choice(QUERIES)
+        if round_no % 2:
+            yield "add-note", [f"bench{round_no}", "project report"]
+        else:
+            yield "add", [f"Bench{round_no}", "0501234567"]
+
+
+def run(book, notes, commands):
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for command, args in commands:
+            COMMANDS[command](args, book, notes)
+    return (time.perf_counter() - started) * 1000
+
+
+def main(sizes):
+    commands = list(workload())
+    for n in sizes:
+        print(f"\n{n} contacts, {len(commands)} commands, {READS_PER_WRITE} reads per write (ms per command)")
+        for enabled in (False, True):
+            book, notes = make_data(n)
+            results.clear()
+            results.enabled = enabled
+            run(book, notes, QUERIES)  # build the indexes first
+            elapsed = run(book, notes, commands)
+            rate = f"{results.hits / (results.hits + results.misses):.0%} hits" if enabled else ""
+            print(f"  {'cache on' if enabled else 'cache off':<10}{elapsed / len(commands):10.3f}   {rate}")
+    results.enabled = True
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,65 @@
+"""
+Benchmark: latency of commands while snapshots are written, inline (the old journal
+compaction) vs by the background saver.
+
+Run from the repository root:
+    python -m benchmarks.bench_saver [N ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_birthdays import make_book
+from src.commands import COMMANDS
+from src.models.notes import Notes
+from src.storage.journal import Journal
+from src.storage.persistence import STORAGE_FILES, save_contacts, load_contacts
+from src.storage.saver import Saver
+
+SIZES = [100_000, 1_000_000]
+COMMANDS_RUN = 5000
+SAVE_EVERY = 1000
+BACKENDS = ("recordfile", "pickle")
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(book, notes, journal, background):
+    saver = Saver(book, notes, journal, interval=3600, every=SAVE_EVERY, background=background)
+    latencies = []
+    for i in range(COMMANDS_RUN):
+        args = [f"Contact{i}", f"user{i}@example.com"]
+        started = time.perf_counter()
+        with saver.lock:
+            journal.append("book", "add-email", args)
+            COMMANDS["add-email"](args, book, notes)
+        saver.changed()
+        latencies.append(time.perf_counter() - started)
+    saver.close()
+    latencies.sort()
+    return saver.saves, [percentile(latencies, p) * 1000 for p in (0.5, 0.99, 1.0)]
+
+
+def main(sizes):
+    for n in sizes:
+        print(f"\n{n} contacts, {COMMANDS_RUN} commands, snapshot every {SAVE_EVERY} (ms per command)")
+        print(f"  {'backend':<12} {'snapshots':<12} {'saves':>6} {'p50':>8} {'p99':>8} {'max':>9}")
+        source = make_book(n)
+        for backend in BACKENDS:
+            with tempfile.TemporaryDirectory() as tmp:
+                contacts_file, notes_file = (os.path.join(tmp, name) for name in STORAGE_FILES[backend])
+                save_contacts(source, contacts_file)
+                for background in (False, True):
+                    journal = Journal(os.path.join(tmp, "journal.log"), fsync_every=0,
+                                      contacts_file=contacts_file, notes_file=notes_file)
+                    book = load_contacts(contacts_file)
+                    count, (p50, p99, worst) = run(book, Notes(), journal, background)
+                    label = "background" if background else "inline"
+                    print(f"  {backend:<12} {label:<12} {count:>6} {p50:8.3f} {p99:8.3f} {worst:9.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
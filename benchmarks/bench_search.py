@@ -0,0 +1,101 @@
+"""
+Benchmark: fuzzy name search with the trigram index vs a difflib scan over all names.
+
+Run from the repository root:
+    python -m benchmarks.bench_search [N ...]
+
+It first checks that every adjacent swap and deletion of a letter in the short names
+of SHORT_BOOK still finds the name, whatever grams the typo destroys.
+"""
+import difflib
+import random
+import string
+import sys
+import time
+
+from src.utils.ngram import NgramIndex
+
+SIZES = [10_000, 100_000, 1_000_000]
+QUERIES = 1000
+SCAN_LIMIT = 100_000  # the difflib scan is only timed up to this many names
+ONSETS = "b br ch d dr f g gr h k kl kr l m n p pr r s sh st t tr v z zh".split()
+NUCLEI = "a e i o u y ia ie io ei ou".split()
+CODAS = ["", "", "", "n", "r", "l", "s", "k", "ch", "nk", "st"]
+SHORT_BOOK = ["John", "Max", "Anna", "Ivan", "Olga", "Yan", "Johnson", "Maxwell", "Annabel"]
+
+
+def make_names(n, seed=42):
+    rnd = random.Random(seed)
+    names = set()
+    while len(names) < n:
+        syllables = (rnd.choice(ONSETS) + rnd.choice(NUCLEI) + rnd.choice(CODAS) for _ in range(rnd.randint(2, 4)))
+        names.add("".join(syllables).capitalize())
+    return sorted(names)
+
+
+def misspell(name, rnd):
+    """One or two random edits."""
+    for _ in range(rnd.randint(1, 2)):
+        i = rnd.randrange(len(name))
+        kind = rnd.randrange(3)
+        if kind == 0 and len(name) > 3:
+            name = name[:i] + name[i + 1:]
+        elif kind == 1:
+            name = name[:i] + rnd.choice(string.ascii_lowercase) + name[i + 1:]
+        else:
+            name = name[:i] + rnd.choice(string.ascii_lowercase) + name[i:]
+    return name
+
+
+def one_typo(name):
+    """Every adjacent swap and single deletion of a letter in name."""
+    swaps = {name[:i] + name[i + 1] + name[i] + name[i + 2:] for i in range(len(name) - 1)}
+    drops = {name[:i] + name[i + 1:] for i in range(len(name))}
+    return (swaps | drops) - {name}
+
+
+def check_short_typos():
+    index = NgramIndex(SHORT_BOOK)
+    checked, missed = 0, []
+    for name in SHORT_BOOK:
+        if len(name) <= 4:
+            for typo in sorted(one_typo(name)):
+                checked += 1
+                if name not in index.search(typo):
+                    missed.append(f"{typo} -> {name}")
+    if missed:
+        raise AssertionError("short-name typos not found: " + ", ".join(missed))
+    print(f"{checked} one-typo variants of 3-4 letter names, all found")
+
+
+def measure(search, queries):
+    hits, times = 0, []
+    for query, expected in queries:
+        started = time.perf_counter()
+        found = search(query)
+        times.append(time.perf_counter() - started)
+        hits += expected in found
+    times.sort()
+    return times[len(times) // 2] * 1000, times[int(len(times) * 0.99)] * 1000, hits / len(queries)
+
+
+def main(sizes):
+    check_short_typos()
+    for n in sizes:
+        names = make_names(n)
+        rnd = random.Random(7)
+        queries = [(misspell(name, rnd), name) for name in rnd.sample(names, QUERIES)]
+
+        started = time.perf_counter()
+        index = NgramIndex(names)
+        print(f"\n{n} names, index built in {time.perf_counter() - started:.2f}s")
+        print(f"  {'method':<14} {'p50 ms':>8} {'p99 ms':>8} {'recall@10':>10}")
+        p50, p99, recall = measure(lambda q: index.search(q, 10), queries)
+        print(f"  {'trigram index':<14} {p50:8.3f} {p99:8.3f} {recall:10.1%}")
+        if n <= SCAN_LIMIT:
+            p50, p99, recall = measure(lambda q: difflib.get_close_matches(q, names, 10, 0.6), queries[:100])
+            print(f"  {'difflib scan':<14} {p50:8.3f} {p99:8.3f} {recall:10.1%}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
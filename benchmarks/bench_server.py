@@ -0,0 +1,94 @@
+"""
+Load generator for server mode: latency percentiles and throughput at 1-1000 concurrent sessions.
+
+Starts `python -m src.main --serve` on a seeded book in a temporary directory and runs a
+read-mostly command mix over the line protocol.
+
+Run from the repository root:
+    python -m benchmarks.bench_server [SESSIONS ...]
+"""
+import asyncio
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SESSIONS = [1, 10, 100, 1000]
+CONTACTS = 10_000
+REQUESTS = 5_000       # per concurrency level, spread over the sessions
+WRITE_RATIO = 0.1
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(directory, n):
+    lines = [f"add Contact{i} {1000000000 + i}\n" for i in range(n)]
+    with open(os.path.join(directory, "seed.txt"), "w") as f:
+        f.writelines(lines)
+    subprocess.run([sys.executable, "-m", "src.main", "--batch", "seed.txt"], cwd=directory,
+                   env=dict(os.environ, PYTHONPATH=ROOT), check=True, capture_output=True)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(rnd, n):
+    i = rnd.randrange(n)
+    if rnd.random() < WRITE_RATIO:
+        return f"add-email Contact{i} user{i}@example.com"
+    return rnd.choice([f"phone Contact{i}", f"who {1000000000 + i}", "birthdays 7"])
+
+
+async def session(port, count, rnd, n, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for _ in range(count):
+        started = time.perf_counter()
+        writer.write((request(rnd, n) + "\n").encode())
+        await writer.drain()
+        while (await reader.readline()) not in (b"\n", b""):
+            pass
+        latencies.append(time.perf_counter() - started)
+    writer.write(b"exit\n")
+    await writer.drain()
+    writer.close()
+
+
+async def load(port, sessions, n):
+    latencies = []
+    per_session = max(1, REQUESTS // sessions)
+    started = time.perf_counter()
+    await asyncio.gather(*(session(port, per_session, random.Random(s), n, latencies)
+                           for s in range(sessions)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"  {sessions:>8} {len(latencies):>9} {p50:9.2f} {p99:9.2f} {len(latencies) / elapsed:10.0f}")
+
+
+def main(levels):
+    with tempfile.TemporaryDirectory() as directory:
+        seed(directory, CONTACTS)
+        port = free_port()
+        server = subprocess.Popen([sys.executable, "-m", "src.main", "--serve", f"127.0.0.1:{port}"],
+                                  cwd=directory, env=dict(os.environ, PYTHONPATH=ROOT),
+                                  stderr=subprocess.PIPE, text=True)
+        try:
+            server.stderr.readline()  # "Serving on ..."
+            print(f"{CONTACTS} contacts, {WRITE_RATIO:.0%} writes")
+            print(f"  {'sessions':>8} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>10}")
+            for sessions in levels:
+                asyncio.run(load(port, sessions, CONTACTS))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SESSIONS)
@@ -0,0 +1,102 @@
+"""
+Benchmark: an address book sharded by name hash vs one pickle file.
+
+Run from the repository root:
+    python -m benchmarks.bench_shards [N ...]
+
+For N contacts it reports the full save and load of the single pickle file and of the
+shard directory (with the indexes built, as unpickling the book does), then for the
+shards: opening the book and one lookup (loads one shard), loading every shard through
+a process pool (whose results are pickled back to this process, so it unpickles
+everything again), and the save after changing a few contacts, which rewrites only
+their shards, with one writer and with a pool of writers.
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import make_contacts
+from src.models.contacts import AddressBook
+from src.storage import shards
+
+SIZES = [100_000, 1_000_000]
+CHANGED = 10  # contacts changed before the incremental save
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def load_pool(dirname):
+    """Every shard loaded by pool workers and sent back here."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    manifest = shards.read_manifest(dirname)
+    paths = [os.path.join(dirname, name) for name in manifest["files"]]
+    with ProcessPoolExecutor() as pool:
+        return list(pool.map(shards._load_shard, paths))
+
+
+def change_some(book, names):
+    for name in names:
+        book.find(name).add_phone("0501234567")
+
+
+def main(sizes):
+    cpus = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        single = os.path.join(tmp, "addressbook.pkl")
+        sharded = os.path.join(tmp, "addressbook.shards")
+        for n in sizes:
+            book = AddressBook()
+            for record in make_contacts(n):
+                book.add_record(record)
+            names = list(book.data)[::max(1, n // CHANGED)][:CHANGED]
+
+            def dump():
+                with open(single, "wb") as f:
+                    pickle.dump(book, f)
+
+            def load():
+                with open(single, "rb") as f:
+                    return pickle.load(f)
+
+            _, single_save = timed(dump)
+            loaded, single_load = timed(load)
+            del loaded
+            _, shard_save = timed(lambda: shards.save_contacts(book, sharded))
+            del book
+
+            print(f"\n{n} contacts, {shards.SHARDS} shards, {cpus} CPU(s) (ms)")
+            print(f"  {'':<34}{'one file':>12}{'shards':>12}")
+            print(f"  {'save everything':<34}{single_save:12.1f}{shard_save:12.1f}")
+
+            def open_and_find():
+                opened = shards.load_contacts(sharded)
+                return opened, opened.find(names[0])
+
+            (opened, _), open_ms = timed(open_and_find)
+            _, full_ms = timed(opened._ensure_indexes)
+            print(f"  {'load everything, build indexes':<34}{single_load:12.1f}{full_ms + open_ms:12.1f}")
+            print(f"  {'open and find one contact':<34}{single_load:12.1f}{open_ms:12.1f}")
+            del opened
+            _, pool_ms = timed(lambda: load_pool(sharded))
+            print(f"  {'load everything, process pool':<34}{'':>12}{pool_ms:12.1f}")
+
+            for workers in (1, max(cpus, 2)):
+                book = shards.load_contacts(sharded)
+                book.data.load_all()
+                change_some(book, names)
+                dirty = sum(1 for changed in book.data.changes if changed)
+                _, save_ms = timed(lambda: shards.save_contacts(book, sharded, workers=workers))
+                label = f"save {dirty} changed shards, {workers} writer{'s' if workers > 1 else ''}"
+                print(f"  {label:<34}{single_save:12.1f}{save_ms:12.1f}")
+                del book
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,70 @@
+"""
+Benchmark: snapshot files (block-compressed, checksummed) vs a raw pickle.
+
+Run from the repository root:
+    python -m benchmarks.bench_snapshot [N ...]
+
+For the book and notes of N contacts it writes the pickled pair raw and as snapshots
+with every codec, each with one worker and with a thread per CPU, and reports the file
+size, save time and load time (median of REPEAT runs; loads decompress while they
+unpickle).
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import make_data
+from src.storage import snapshot
+
+SIZES = [10_000, 100_000]
+REPEAT = 3
+CODECS = [("none", None), ("zlib", 1), ("zlib", 6), ("lzma", 0)]
+
+
+def median_ms(func):
+    times = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def measure(filename, save, load):
+    def write():
+        with open(filename, "wb") as f:
+            save(f)
+
+    def read():
+        with open(filename, "rb") as f:
+            load(f)
+
+    save_ms = median_ms(write)
+    return os.path.getsize(filename), save_ms, median_ms(read)
+
+
+def main(sizes):
+    cpus = os.cpu_count() or 1
+    workers = sorted({1, max(2, cpus)})
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, "snapshot.pkl")
+        for n in sizes:
+            data = make_data(n)
+            print(f"\n{n} contacts, {n // 10} notes, {cpus} CPU(s)")
+            print(f"  {'format':<22}{'workers':>8}{'size MiB':>10}{'ratio':>7}{'save ms':>10}{'load ms':>10}")
+            raw, save_ms, load_ms = measure(filename, lambda f: pickle.dump(data, f, pickle.HIGHEST_PROTOCOL),
+                                            pickle.load)
+            print(f"  {'raw pickle':<22}{'':>8}{raw / 2 ** 20:10.2f}{1:7.2f}{save_ms:10.1f}{load_ms:10.1f}")
+            for codec, level in CODECS:
+                for count in workers:
+                    size, save_ms, load_ms = measure(
+                        filename, lambda f: snapshot.dump(data, f, codec, level, workers=count),
+                        lambda f: snapshot.load(f, workers=count))
+                    label = codec if level is None else f"{codec} level {level}"
+                    print(f"  {label:<22}{count:>8}{size / 2 ** 20:10.2f}{size / raw:7.2f}{save_ms:10.1f}{load_ms:10.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
@@ -0,0 +1,151 @@
+"""
+Benchmark: cold start of the bot, with a budget that fails when startup gets slower.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup [--runs N] [--import-budget MS] [--prompt-budget MS]
+
+Every run is a fresh interpreter in an empty data directory. Measured are the import
+time of src.main (from python -X importtime), the wall time of a one-command batch run
+and the time until the first prompt of an interactive session on a pseudo-terminal,
+with the help cache cold and warm. The script exits with status 1 if a median is over
+its budget or if a module meant to load lazily is imported at startup.
+"""
+import argparse
+import os
+import pty
+import re
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+RUNS = 10
+IMPORT_BUDGET_MS = 70.0   # import of src.main: about 40-50 ms here, 95 ms when Rich was imported eagerly
+PROMPT_BUDGET_MS = 100.0  # start to the first prompt with the help cached: about 65 ms, 135 ms before
+# Imported on first use only: Rich by tables, asyncio by --serve, the process pool by import.
+LAZY_MODULES = ("rich", "asyncio", "concurrent.futures")
+PROMPT = b"Enter a command"
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def environment(tmp):
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), XDG_CACHE_HOME=os.path.join(tmp, "cache"))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_profile(env, cwd):
+    """
+    Import src.main once with -X importtime. Returns the cumulative ms of src.main and
+    {module: (cumulative ms, module that imported it)}.
+    """
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import src.main"], env=env, cwd=cwd,
+                            capture_output=True, text=True, check=True).stderr
+    lines = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            lines.append((len(match.group(3)), match.group(4), int(match.group(2)) / 1000))
+    modules = {}
+    for i, (depth, name, total) in enumerate(lines):
+        # Imports are listed after their children: the parent is the next line less indented.
+        parent = next((other for d, other, _ in lines[i + 1:] if d < depth), None)
+        modules[name] = (total, parent)
+    return modules.get("src.main", (0.0, None))[0], modules
+
+
+def batch_run(env, cwd):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "src.main", "--batch", "-"], input=b"hello\n", env=env, cwd=cwd,
+                   capture_output=True, check=True)
+    return (time.perf_counter() - started) * 1000
+
+
+def time_to_prompt(env, cwd):
+    """Milliseconds from starting an interactive session on a pty until its first prompt."""
+    master, slave = pty.openpty()
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "src.main"], stdin=slave, stdout=slave, stderr=slave,
+                               env=env, cwd=cwd, close_fds=True)
+    os.close(slave)
+    output = b""
+    try:
+        while PROMPT not in output:
+            ready, _, _ = select.select([master], [], [], 10)
+            if not ready:
+                raise RuntimeError(f"no prompt after 10 s: {output[-200:]!r}")
+            output += os.read(master, 65536)
+        elapsed = (time.perf_counter() - started) * 1000
+        os.write(master, b"exit\n")
+        while process.poll() is None:  # drain the output so the bot can finish writing
+            if select.select([master], [], [], 0.1)[0]:
+                try:
+                    os.read(master, 65536)
+                except OSError:
+                    break
+        process.wait(10)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        os.close(master)
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS, metavar="MS")
+    parser.add_argument("--prompt-budget", type=float, default=PROMPT_BUDGET_MS, metavar="MS")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    options = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = environment(tmp)
+        import_profile(env, tmp)  # write the bytecode caches first
+        profiles = [import_profile(env, tmp) for _ in range(options.runs)]
+        imports = median([total for total, _ in profiles])
+        batch = median([batch_run(env, tmp) for _ in range(options.runs)])
+        cold = []
+        for _ in range(options.runs):
+            shutil.rmtree(env["XDG_CACHE_HOME"], ignore_errors=True)
+            cold.append(time_to_prompt(env, tmp))
+        warm = [time_to_prompt(env, tmp) for _ in range(options.runs)]
+        prompt_cold, prompt_warm = median(cold), median(warm)
+
+    print(f"Cold start, median of {options.runs} runs (ms)")
+    print(f"  {'import src.main':<36} {imports:8.1f}   budget {options.import_budget:g}")
+    print(f"  {'batch run of one command':<36} {batch:8.1f}")
+    print(f"  {'first prompt, help not cached':<36} {prompt_cold:8.1f}")
+    print(f"  {'first prompt, help cached':<36} {prompt_warm:8.1f}   budget {options.prompt_budget:g}")
+
+    modules = profiles[-1][1]
+    print("\nSlowest libraries imported by src modules (cumulative ms, last run)")
+    libraries = [name for name, (_, parent) in modules.items()
+                 if not name.startswith("src") and parent and parent.startswith("src")]
+    for name in sorted(libraries, key=lambda name: modules[name][0], reverse=True)[:options.top]:
+        total, parent = modules[name]
+        print(f"  {name:<24} {total:8.1f}   from {parent}")
+
+    failures = []
+    if imports > options.import_budget:
+        failures.append(f"import of src.main took {imports:.1f} ms (budget {options.import_budget:g} ms)")
+    if prompt_warm > options.prompt_budget:
+        failures.append(f"first prompt took {prompt_warm:.1f} ms (budget {options.prompt_budget:g} ms)")
+    eager = sorted(name for name in modules if name.split(".")[0] in LAZY_MODULES or name in LAZY_MODULES)
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager[:5])}")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
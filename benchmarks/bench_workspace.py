@@ -0,0 +1,91 @@
+"""
+Benchmark: switching between named books kept in memory vs loaded on every switch,
+and listing books from their metadata vs loading them.
+
+Run from the repository root:
+    python -m benchmarks.bench_workspace [N ...]
+
+BOOKS books of N contacts (and N // 10 notes) are written with each storage backend.
+Then SWITCHES switches visit them round robin, each followed by one `search`, with
+all of them resident and with one resident book (so every switch unloads one and
+loads the next); the "with a change" rows also add a contact on each visit, so the
+unloaded book is saved first. Last, `books` is timed against loading every book
+to count its contacts.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.dataset import make_data
+from src.commands import COMMANDS, history
+from src.storage.persistence import load_contacts, load_notes, save_contacts, save_notes, STORAGE_FILES
+from src.storage.workspace import Workspace
+
+SIZES = [10_000, 100_000]
+BOOKS = 4
+SWITCHES = 20
+BACKENDS = ("recordfile", "pickle", "sqlite")
+
+
+def make_books(root, backend, n):
+    book, notes = make_data(n)
+    for i in range(BOOKS):
+        directory = os.path.join(root, f"team{i}")
+        os.makedirs(directory)
+        contacts_file, notes_file = STORAGE_FILES[backend]
+        save_contacts(book, os.path.join(directory, contacts_file))
+        save_notes(notes, os.path.join(directory, notes_file))
+
+
+def visit(entry, change, name):
+    COMMANDS["search"](["Olena"], entry.book, entry.notes)
+    if change:
+        args = [name, "0501234567"]
+        with entry.saver.lock:
+            entry.journal.append("book", "add", args)
+            COMMANDS["add"](args, entry.book, entry.notes)
+        entry.touch()
+
+
+def switch(workspace, change):
+    started = time.perf_counter()
+    for i in range(SWITCHES):
+        visit(workspace.use(f"team{i % BOOKS}"), change, f"Visitor{i}")
+    return (time.perf_counter() - started) * 1000 / SWITCHES
+
+
+def main(sizes):
+    for n in sizes:
+        print(f"\n{BOOKS} books of {n} contacts, {SWITCHES} switches (ms per switch)")
+        print(f"  {'backend':<12}{'resident':>9}{'read only':>11}{'with a change':>15}"
+              f"{'books':>9}{'load all':>10}")
+        for backend in BACKENDS:
+            with tempfile.TemporaryDirectory() as tmp:
+                make_books(tmp, backend, n)
+                for resident in (BOOKS, 1):
+                    workspace = Workspace(COMMANDS, history, root=tmp)
+                    workspace.configure(backend, resident, fsync_every=0)
+                    for i in range(BOOKS):  # load them and build their indexes before timing
+                        visit(workspace.use(f"team{i}"), True, "Warmup")
+                    reads = switch(workspace, False)
+                    writes = switch(workspace, True)
+                    workspace.close()
+                    if resident > 1:
+                        print(f"  {backend:<12}{resident:>9}{reads:>11.2f}{writes:>15.2f}")
+                        continue
+                    started = time.perf_counter()
+                    [workspace.info(name) for name in workspace.books()]
+                    listed = (time.perf_counter() - started) * 1000
+                    started = time.perf_counter()
+                    for i in range(BOOKS):
+                        directory = os.path.join(tmp, f"team{i}")
+                        contacts_file, notes_file = STORAGE_FILES[backend]
+                        len(load_contacts(os.path.join(directory, contacts_file)))
+                        load_notes(os.path.join(directory, notes_file))
+                    loaded = (time.perf_counter() - started) * 1000
+                    print(f"  {backend:<12}{resident:>9}{reads:>11.2f}{writes:>15.2f}{listed:>9.2f}{loaded:>10.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or SIZES)
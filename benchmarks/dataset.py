@@ -0,0 +1,84 @@
+"""
+Seeded generator of realistic contacts and notes for benchmarks (same seed, same data).
+
+Contacts have names built from common first and last names, 1-3 phones, an email for
+70% of them and a birthday for 80%. Notes (one per ten contacts) have 10-60 words drawn
+with a Zipf-like skew from a small vocabulary and 0-3 tags.
+"""
+import random
+from datetime import date
+
+from src.models.contacts import AddressBook, Record
+from src.models.notes import Notes, Note
+
+FIRST_NAMES = (
+    "Olena Andrii Iryna Oleksandr Maria Dmytro Natalia Serhii Tetiana Volodymyr Yulia Mykola Anna "
+    "Ivan Kateryna Petro Svitlana Taras Oksana Bohdan Halyna Yurii Larysa Roman Viktoria Maksym "
+    "James Mary John Patricia Robert Jennifer Michael Linda William Elizabeth David Barbara Richard "
+    "Susan Joseph Jessica Thomas Sarah Charles Karen Daniel Nancy Matthew Lisa Anthony Betty Mark "
+    "Sandra Paul Ashley Steven Emily Andrew Donna Joshua Michelle Kevin Carol Brian Amanda George"
+).split()
+LAST_NAMES = (
+    "Melnyk Shevchenko Kovalenko Bondarenko Tkachenko Kravchenko Oliinyk Shevchuk Koval Polishchuk "
+    "Bondar Tkachuk Moroz Marchenko Lysenko Rudenko Savchenko Petrenko Klymenko Pavlenko Kozak "
+    "Smith Johnson Williams Brown Jones Garcia Miller Davis Rodriguez Martinez Hernandez Lopez "
+    "Gonzalez Wilson Anderson Thomas Taylor Moore Jackson Martin Lee Perez Thompson White Harris "
+    "Sanchez Clark Ramirez Lewis Robinson Walker Young Allen King Wright Scott Torres Nguyen Hill"
+).split()
+DOMAINS = ["gmail.com", "ukr.net", "outlook.com", "i.ua", "yahoo.com", "company.com.ua"]
+OPERATORS = ["50", "66", "67", "68", "63", "73", "93", "95", "96", "97", "98", "99"]
+WORDS = (
+    "meeting call project report budget travel family urgent idea client invoice contract deadline "
+    "review plan draft email follow up order delivery payment birthday gift doctor school lesson "
+    "book flight hotel car repair insurance tax bank loan rent office team release bug fix feature "
+    "design test deploy server backup password account subscription renewal groceries dinner party"
+).split()
+TAGS = ["work", "home", "urgent", "later", "archived", "family", "finance", "health", "travel", "ideas"]
+
+
+def contact_name(i, rnd):
+    """A unique name: first and last name, with a number once the combinations run out."""
+    first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+    return f"{first}{last}" if i < len(FIRST_NAMES) * len(LAST_NAMES) // 4 else f"{first}{last}{i}"
+
+
+def make_contacts(n, seed=42):
+    """Yield n records with unique names."""
+    rnd = random.Random(seed)
+    seen = set()
+    i = 0
+    while len(seen) < n:
+        name = contact_name(i, rnd)
+        i += 1
+        if name in seen:
+            continue
+        seen.add(name)
+        record = Record(name)
+        for _ in range(rnd.choice((1, 1, 1, 2, 2, 3))):
+            record.add_phone(f"+380{rnd.choice(OPERATORS)}{rnd.randrange(10 ** 7):07d}")
+        if rnd.random() < 0.7:
+            record.add_email(f"{name.lower()}{rnd.randrange(100)}@{rnd.choice(DOMAINS)}")
+        if rnd.random() < 0.8:
+            record.add_birthday(date(rnd.randint(1940, 2010), rnd.randint(1, 12), rnd.randint(1, 28)))
+        yield record
+
+
+def make_notes(n, seed=42):
+    """Yield n notes with unique titles."""
+    rnd = random.Random(seed + 1)
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    for i in range(n):
+        note = Note(f"note{i}", " ".join(rnd.choices(WORDS, weights, k=rnd.randint(10, 60))))
+        for tag in rnd.sample(TAGS, rnd.randint(0, 3)):
+            note.add_tag(tag)
+        yield note
+
+
+def make_data(n, seed=42):
+    """AddressBook of n contacts and Notes of n // 10 notes."""
+    book, notes = AddressBook(), Notes()
+    for record in make_contacts(n, seed):
+        book.add_record(record)
+    for note in make_notes(max(1, n // 10), seed):
+        notes.add_note(note)
+    return book, notes
@@ -0,0 +1,197 @@
+"""
+Benchmark harness: times the main operations on seeded data and compares result files.
+
+Run from the repository root:
+    python -m benchmarks.harness run [--sizes 1000 100000 ...] [--output results.json]
+    python -m benchmarks.harness compare OLD.json NEW.json [--threshold 0.2]
+
+`run` writes one JSON file with, per data size and operation, the median and p95 time of
+one call in microseconds. `compare` prints the change of every median and exits with
+status 1 if any operation got slower than the threshold allows.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+from rich.console import Console
+
+from benchmarks.bench_dispatch import make_corpus
+from benchmarks.dataset import make_data, WORDS, TAGS
+from src import commands
+from src.commands import COMMANDS, ALIASES
+from src.storage.persistence import STORAGE_FILES, save_contacts, load_contacts, save_notes, load_notes
+from src.utils.autocomplete import Dispatcher
+
+SIZES = [1_000, 10_000, 100_000]
+BACKENDS = sorted(STORAGE_FILES)
+QUERIES = 200        # calls timed for each per-call operation
+STORAGE_REPEAT = 3   # full loads and saves timed per backend
+THRESHOLD = 0.2      # allowed slowdown of a median before compare reports a regression
+
+
+def summary(seconds):
+    seconds = sorted(seconds)
+    return {
+        "median_us": seconds[len(seconds) // 2] * 1e6,
+        "p95_us": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))] * 1e6,
+        "calls": len(seconds),
+    }
+
+
+def time_calls(func, inputs):
+    """Time func(x) for every x separately."""
+    times = []
+    for x in inputs:
+        started = time.perf_counter()
+        func(x)
+        times.append(time.perf_counter() - started)
+    return summary(times)
+
+
+def time_output(run, terminal=True):
+    """Time a handler that prints to a console in memory (a terminal or a pipe)."""
+    console = commands.console
+    out = io.StringIO()
+    commands.console = Console(file=out, force_terminal=terminal, width=120)
+    try:
+        started = time.perf_counter()
+        with redirect_stdout(out):
+            run()
+        return time.perf_counter() - started
+    finally:
+        commands.console = console
+
+
+def bench_storage(book, notes, backends, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in backends:
+            contacts_file, notes_file = (os.path.join(tmp, name) for name in STORAGE_FILES[backend])
+            saves, loads = [], []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                save_contacts(book, contacts_file)
+                save_notes(notes, notes_file)
+                saves.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                loaded = load_contacts(contacts_file)
+                load_notes(notes_file)
+                len(loaded.data)
+                loads.append(time.perf_counter() - started)
+            results[f"save_contacts+notes[{backend}]"] = summary(saves)
+            results[f"load_contacts+notes[{backend}]"] = summary(loads)
+    return results
+
+
+def bench_size(n, seed, backends, repeat):
+    rnd = random.Random(seed)
+    started = time.perf_counter()
+    book, notes = make_data(n, seed)
+    print(f"{n} contacts: generated in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    names = list(book.data)
+    results = {}
+    results["find"] = time_calls(book.find, [rnd.choice(names) for _ in range(QUERIES)])
+    results["birthdays 7 cached"] = time_calls(
+        lambda delta: COMMANDS["birthdays"]([delta], book, notes), ["7"] * QUERIES)
+    commands.results.enabled = False  # the entries below time the queries themselves
+    results["birthdays 7"] = time_calls(
+        lambda delta: COMMANDS["birthdays"]([delta], book, notes), ["7"] * QUERIES)
+    results["find_note"] = time_calls(
+        notes.find_note, [" ".join(rnd.sample(WORDS, 2)) for _ in range(QUERIES)])
+    results["find_by_tag"] = time_calls(notes.find_by_tag, [rnd.choice(TAGS) for _ in range(QUERIES)])
+    results["all page 1"] = summary([time_output(lambda: COMMANDS["all"]([], book, notes)) for _ in range(5)])
+    results["all plain stream"] = summary([time_output(lambda: COMMANDS["all"]([], book, notes), terminal=False)])
+    corpus = [text for text, _ in make_corpus(QUERIES, seed)]
+    results["dispatch cold"] = time_calls(Dispatcher(COMMANDS, ALIASES).candidates, corpus)
+    commands.results.enabled = True
+    results.update(bench_storage(book, notes, backends, repeat))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options):
+    report = {
+        "meta": {
+            "seed": options.seed,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "commit": git_commit(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    for n in options.sizes:
+        results = bench_size(n, options.seed, options.backends, options.repeat)
+        report["results"][str(n)] = results
+        print(f"\n{n} contacts (us per call)")
+        for name, result in results.items():
+            print(f"  {name:<36} {result['median_us']:14.1f} us  (p95 {result['p95_us']:.1f})")
+    with open(options.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {options.output}")
+
+
+def compare(options):
+    with open(options.old, encoding="utf-8") as f:
+        old = json.load(f)["results"]
+    with open(options.new, encoding="utf-8") as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    for size in sorted(set(old) & set(new), key=int):
+        print(f"\n{size} contacts (median us)")
+        for name in sorted(set(old[size]) & set(new[size])):
+            before, after = old[size][name]["median_us"], new[size][name]["median_us"]
+            change = after / before - 1 if before else 0.0
+            flag = ""
+            if change > options.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"  {name:<36} {before:14.1f} {after:14.1f} {change:+8.1%}{flag}")
+    print(f"\n{regressions} regressions (threshold {options.threshold:.0%}).")
+    return 1 if regressions else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="action", required=True)
+    run_parser = sub.add_parser("run", help="time the operations and write a results file")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, metavar="N",
+                            help="contacts per data set, 1k to 10M (default: %(default)s)")
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    run_parser.add_argument("--repeat", type=int, default=STORAGE_REPEAT, help="timed loads and saves")
+    run_parser.add_argument("--output", "-o", default="bench_results.json")
+    compare_parser = sub.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                                help="allowed slowdown as a fraction (default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    if options.action == "run":
+        run(options)
+        return 0
+    return compare(options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
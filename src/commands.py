@@ -1,17 +1,74 @@
+import re
 import sys
-from datetime import datetime, timedelta
+from datetime import date, datetime
+from itertools import islice
 
 from colorama import Fore
-from rich.console import Console
-from rich.table import Table
-from rich import box
 
-from src.decorators import input_error
+from src.decorators import input_error, versioned, cached
 from src.models.contacts import Record, AddressBook
 from src.models.notes import Notes, Note
+from src.models.history import History
+from src.models.dedupe import find_duplicates, merge_duplicates
 from src.utils.validators import validate_phone, validate_email, validate_birthday
-
-console = Console()
+from src.utils.metrics import metrics, PERCENTILES
+from src.utils.cache import ResultCache
+from src.utils.console import LazyConsole, terminal_key, read_cached, write_cached
+from src.storage.exchange import export_contacts, import_contacts, read_contacts
+from src.storage.workspace import Workspace
+
+console = LazyConsole()  # Rich is imported when a table is first printed
+history = History()  # undo/redo of the mutating commands below
+results = ResultCache()  # results of the read-only commands below, by store version
+
+FIND_NOTE_LIMIT = 20  # best matches shown by find-note
+FIND_PHONE_LIMIT = 20  # phones shown by find-phone
+SEARCH_LIMIT = 10  # contacts shown by search
+PAGE_SIZE = 50  # rows per page of 'all' on a terminal
+ALL_SORTS = ("name", "birthday")
+ALL_FIELDS = ("phone", "email", "birthday")
+SUGGEST_LIMIT = 3  # "did you mean" names offered for an unknown contact
+DEDUPE_LIMIT = 20  # duplicate groups listed by dedupe
+
+HELP_ROWS = [
+    ("hello", "Greets the user"),
+    ("add <name> <phone>", "Add new contact and phone"),
+    ("change <name> <old_phone> <new_phone>", "Change existing phone number"),
+    ("phone <name>", "Show phone numbers for contact"),
+    ("search <name>", "Find contacts whose names differ by up to 2 typos"),
+    ("who <phone>", "Show contacts with this phone"),
+    ("find-phone <prefix*|*suffix>", "Find phones by prefix or suffix"),
+    ("delete-contact <name>", "Delete contact"),
+    ("add-email <name> <email>", "Add email"),
+    ("change-email <name> <new_email>", "Change email"),
+    ("delete-email <name>", "Delete email"),
+    ("add-birthday <name> <DD.MM.YYYY>", "Add birthday"),
+    ("change-birthday <name> <DD.MM.YYYY>", "Change birthday"),
+    ("delete-birthday <name>", "Delete birthday"),
+    ("birthdays <delta>", "Show birthdays in next N days"),
+    ("add-note <title> <content>", "Add note"),
+    ("change-note <title> <new_content>", "Change note"),
+    ("delete-note <title>", "Delete note"),
+    ("find-note <query>", "Find notes by whole words (AND-ed, 'or' between groups); 'word*' matches a prefix"),
+    ("add-tag <title> <tag>", "Add tag to note"),
+    ("find-tag <expression>", "Find notes by tags, e.g. 'work & urgent', 'a | b', '!archived'"),
+    ("tags", "Show tags with number of notes"),
+    ("all [--page N] [--size K]", "Show contacts page by page; also --sort name|birthday (those without one "
+                                  "last), --reverse, --prefix P, --has phone|email|birthday"),
+    ("import <file> [csv|vcard|jsonl]", "Import contacts from file"),
+    ("export <file> [csv|vcard|jsonl]", "Export contacts to file"),
+    ("dedupe [--dry-run]", "Merge duplicate contacts (same or similar name, shared phone or email); "
+                           "--dry-run only lists them"),
+    ("use <book>", "Switch to another address book with its notes (a new name creates one)"),
+    ("books", "Show address books with their contacts, notes and last change"),
+    ("undo", "Undo the last change to contacts or notes"),
+    ("redo", "Redo the last undone change"),
+    ("stats [on|off|reset]", "Show calls, errors and latency percentiles per command, and result cache hits"),
+    ("stats json|prometheus <file>", "Write the statistics to a file"),
+    ("help", "Show available commands"),
+    ("exit/close", "Exit bot"),
+]
+help_texts = {}  # rendered help table per console setup, see help_text()
 
 
 def parse_input(user_input):
@@ -25,43 +82,63 @@ def parse_input(user_input):
     return cmd.lower(), args
 
 
-@input_error
-def show_help(args=None, book=None, notes=None):
+def contact_not_found(book, name):
     """
-    Show available commands.
+    Error for an unknown contact name, with the closest existing names as suggestions.
     """
+    message = "Contact not found."
+    suggestions = book.search_names(name, SUGGEST_LIMIT)
+    if suggestions:
+        message += f" Did you mean: {', '.join(suggestions)}?"
+    return Fore.RED + message
+
+
+def render_help():
+    """
+    Render the help table with the current console.
+    """
+    from rich import box
+    from rich.table import Table
+
     table = Table(title="Available Commands", title_style="bold cyan", box=box.SIMPLE_HEAVY)
     table.add_column("Command", style="bold green", no_wrap=True)
     table.add_column("Description", style="white")
+    for cmd, desc in HELP_ROWS:
+        table.add_row(cmd, desc)
+    with console.capture() as capture:
+        console.print(table)
+    return capture.get()
 
-    commands_list = [
-        ("hello", "Greets the user"),
-        ("add <name> <phone>", "Add new contact and phone"),
-        ("change <name> <old_phone> <new_phone>", "Change existing phone number"),
-        ("phone <name>", "Show phone numbers for contact"),
-        ("delete-contact <name>", "Delete contact"),
-        ("add-email <name> <email>", "Add email"),
-        ("change-email <name> <new_email>", "Change email"),
-        ("delete-email <name>", "Delete email"),
-        ("add-birthday <name> <DD.MM.YYYY>", "Add birthday"),
-        ("change-birthday <name> <DD.MM.YYYY>", "Change birthday"),
-        ("delete-birthday <name>", "Delete birthday"),
-        ("birthdays <delta>", "Show birthdays in next N days"),
-        ("add-note <title> <content>", "Add note"),
-        ("change-note <title> <new_content>", "Change note"),
-        ("delete-note <title>", "Delete note"),
-        ("find-note <keyword>", "Find note"),
-        ("add-tag <title> <tag>", "Add tag to note"),
-        ("find-tag <tag>", "Find notes by tag"),
-        ("all", "Show all contacts"),
-        ("help", "Show available commands"),
-        ("exit/close", "Exit bot"),
-    ]
 
-    for cmd, desc in commands_list:
-        table.add_row(cmd, desc)
+def help_text():
+    """
+    The help table as the current console prints it, rendered once per terminal setup.
+    For the default console it is also kept in a cache file, so a later start with the
+    same terminal prints it without importing Rich.
+    """
+    if isinstance(console, LazyConsole):
+        key = terminal_key(HELP_ROWS)
+    else:
+        key = (console.width, console.color_system)
+    text = help_texts.get(key)
+    if text is None:
+        name = f"help-{key:08x}.txt" if isinstance(key, int) else None
+        text = name and read_cached(name)
+        if text is None:
+            text = render_help()
+            if name:
+                write_cached(name, text)
+        help_texts[key] = text
+    return text
 
-    console.print(table)
+
+@input_error
+def show_help(args=None, book=None, notes=None):
+    """
+    Show available commands.
+    """
+    if not console.quiet:
+        console.file.write(help_text())
     return ""
 
 
@@ -73,6 +150,7 @@ def hello(args=None, book=None, notes=None):
     return Fore.GREEN + "How can I help you?"
 
 
+@versioned(history, "book")
 @input_error
 def add(args=None, book=None, notes=None):
     name, phone = args
@@ -82,9 +160,14 @@ def add(args=None, book=None, notes=None):
         record = Record(name)
         book.add_record(record)
     record.add_phone(phone)
-    return Fore.GREEN + f"Contact {name} added/updated."
+    message = Fore.GREEN + f"Contact {name} added/updated."
+    others = book.find_by_phone(phone) - {name}
+    if others:
+        message += "\n" + Fore.YELLOW + f"Phone {phone} also belongs to: {', '.join(sorted(others))}"
+    return message
 
 
+@versioned(history, "book")
 @input_error
 def change(args=None, book=None, notes=None):
     name, old_phone, new_phone = args
@@ -92,7 +175,7 @@ def change(args=None, book=None, notes=None):
     if record:
         record.change_phone(old_phone, new_phone)
         return Fore.GREEN + f"{name}'s phone updated."
-    return Fore.RED + "Contact not found."
+    return contact_not_found(book, name)
 
 
 @input_error
@@ -102,17 +185,53 @@ def phone(args=None, book=None, notes=None):
     if record:
         phones = ', '.join(p.value for p in record.phones)
         return Fore.CYAN + f"{name}'s phones: {phones}"
-    return Fore.RED + "Contact not found."
+    return contact_not_found(book, name)
 
 
+@input_error
+@cached(results, "book")
+def search(args=None, book=None, notes=None):
+    query = args[0]
+    names = book.search_names(query, SEARCH_LIMIT)
+    if names:
+        return Fore.CYAN + "\n".join(str(book.find(name)) for name in names)
+    return Fore.YELLOW + "No similar contacts found."
+
+
+@input_error
+@cached(results, "book")
+def who(args=None, book=None, notes=None):
+    phone = args[0]
+    owners = book.find_by_phone(phone)
+    if owners:
+        return Fore.CYAN + f"{phone}: {', '.join(sorted(owners))}"
+    return Fore.RED + "No contact with this phone."
+
+
+@input_error
+@cached(results, "book")
+def find_phone(args=None, book=None, notes=None):
+    pattern = args[0]
+    if pattern.startswith("*"):
+        found = book.search_phones(suffix=pattern[1:])
+    else:
+        found = book.search_phones(prefix=pattern.rstrip("*"))
+    result = "\n".join(f"{p}: {', '.join(sorted(names))}" for p, names in islice(found, FIND_PHONE_LIMIT))
+    if result:
+        return Fore.CYAN + result
+    return Fore.YELLOW + "No phones found."
+
+
+@versioned(history, "book")
 @input_error
 def delete_contact(args=None, book=None, notes=None):
     name = args[0]
     if book.delete(name):
         return Fore.GREEN + f"Contact {name} deleted."
-    return Fore.RED + "Contact not found."
+    return contact_not_found(book, name)
 
 
+@versioned(history, "book")
 @input_error
 def add_email(args=None, book=None, notes=None):
     name, email = args
@@ -121,9 +240,10 @@ def add_email(args=None, book=None, notes=None):
     if record:
         record.add_email(email)
         return Fore.GREEN + f"{name}'s email added."
-    return Fore.RED + "Contact not found."
+    return contact_not_found(book, name)
 
 
+@versioned(history, "book")
 @input_error
 def change_email(args=None, book=None, notes=None):
     name, new_email = args
@@ -132,18 +252,22 @@ def change_email(args=None, book=None, notes=None):
     if record:
         record.change_email(new_email)
         return Fore.GREEN + f"{name}'s email updated."
-    return Fore.RED + "Contact not found."
+    return contact_not_found(book, name)
 
 
+@versioned(history, "book")
 @input_error
 def delete_email(args=None, book=None, notes=None):
     name = args[0]
     record = book.find(name)
-    if record and record.delete_email():
+    if not record:
+        return contact_not_found(book, name)
+    if record.delete_email():
         return Fore.GREEN + f"{name}'s email deleted."
-    return Fore.RED + "Contact not found or email not set."
+    return Fore.RED + "Email not set."
 
 
+@versioned(history, "book")
 @input_error
 def add_birthday(args=None, book=None, notes=None):
     name, birthday = args
@@ -152,9 +276,10 @@ def add_birthday(args=None, book=None, notes=None):
     if record:
         record.add_birthday(birthday)
         return Fore.GREEN + f"{name}'s birthday added."
-    return Fore.RED + "Contact not found."
+    return contact_not_found(book, name)
 
 
+@versioned(history, "book")
 @input_error
 def change_birthday(args=None, book=None, notes=None):
     name, birthday = args
@@ -163,35 +288,35 @@ def change_birthday(args=None, book=None, notes=None):
     if record:
         record.change_birthday(birthday)
         return Fore.GREEN + f"{name}'s birthday updated."
-    return Fore.RED + "Contact not found."
+    return contact_not_found(book, name)
 
 
+@versioned(history, "book")
 @input_error
 def delete_birthday(args=None, book=None, notes=None):
     name = args[0]
     record = book.find(name)
-    if record and record.delete_birthday():
+    if not record:
+        return contact_not_found(book, name)
+    if record.delete_birthday():
         return Fore.GREEN + f"{name}'s birthday deleted."
-    return Fore.RED + "Contact not found or birthday not set."
+    return Fore.RED + "Birthday not set."
 
 
 @input_error
+@cached(results, "book", context=date.today)
 def birthdays(args=None, book=None, notes=None):
     delta = int(args[0]) if args else 7
-    today = datetime.today().date()
-    upcoming = []
-    for rec in book.data.values():
-        if rec.birthday:
-            bday = rec.birthday.value.replace(year=today.year)
-            if bday < today:
-                bday = bday.replace(year=today.year + 1)
-            if 0 <= (bday - today).days <= delta:
-                upcoming.append(f"{rec.name.value}: {rec.birthday.value.strftime('%d.%m.%Y')}")
+    upcoming = [
+        f"{rec.name.value}: {rec.birthday.value.strftime('%d.%m.%Y')}"
+        for _, rec in book.upcoming_birthdays(delta)
+    ]
     if upcoming:
         return Fore.CYAN + "\n".join(upcoming)
     return Fore.YELLOW + "No upcoming birthdays."
 
 
+@versioned(history, "notes")
 @input_error
 def add_note(args=None, book=None, notes=None):
     title, content = args
@@ -200,6 +325,7 @@ def add_note(args=None, book=None, notes=None):
     return Fore.GREEN + f"Note '{title}' added."
 
 
+@versioned(history, "notes")
 @input_error
 def change_note(args=None, book=None, notes=None):
     title, new_content = args
@@ -208,6 +334,7 @@ def change_note(args=None, book=None, notes=None):
     return Fore.RED + "Note not found."
 
 
+@versioned(history, "notes")
 @input_error
 def delete_note(args=None, book=None, notes=None):
     title = args[0]
@@ -217,61 +344,314 @@ def delete_note(args=None, book=None, notes=None):
 
 
 @input_error
+@cached(results, "notes")
 def find_note(args=None, book=None, notes=None):
-    keyword = args[0]
-    found = notes.find_note(keyword)
-    if found:
-        return "\n".join(f"{n.title}: {n.content}" for n in found)
+    if not args:
+        raise IndexError("find-note needs a query")
+    query = " ".join(args)
+    found = islice(notes.search(query), FIND_NOTE_LIMIT)
+    result = "\n".join(f"{n.title}: {n.content}" for n in found)
+    if result:
+        return result
     return Fore.YELLOW + "No notes found."
 
 
+@versioned(history, "notes")
 @input_error
 def add_tag(args=None, book=None, notes=None):
     title, tag = args
     note = notes.find(title)
+    created = ""
     if not note:
         note = Note(title, "")
         notes.add_note(note)
-        console.print(Fore.YELLOW + f"Note '{title}' was not found. Created new note with empty content.")
+        created = Fore.YELLOW + f"Note '{title}' was not found. Created new note with empty content.\n"
 
     note.add_tag(tag)
-    return Fore.GREEN + f"Tag '{tag}' added to note '{title}'."
+    return created + Fore.GREEN + f"Tag '{tag}' added to note '{title}'."
 
 
 @input_error
+@cached(results, "notes")
 def find_tag(args=None, book=None, notes=None):
-    tag = args[0]
-    found = notes.find_by_tag(tag)
+    if not args:
+        raise IndexError("find-tag needs an expression")
+    expression = " ".join(args)
+    found = notes.find_by_tags(expression)
     if found:
         return "\n".join(f"{n.title}: {n.content}" for n in found)
     return Fore.YELLOW + "No notes found with this tag."
 
 
+@input_error
+@cached(results, "notes")
+def tags(args=None, book=None, notes=None):
+    counts = notes.tag_counts()
+    if counts:
+        return "\n".join(f"{tag}: {count}" for tag, count in sorted(counts.items(), key=lambda item: -item[1]))
+    return Fore.YELLOW + "No tags yet."
+
+
+def parse_all_options(args):
+    """
+    Parse 'all' options: --page N, --size K, --sort name|birthday, --reverse,
+    --prefix P and --has phone|email|birthday (may repeat).
+    """
+    options = {"page": None, "size": None, "sort": "name", "reverse": False, "prefix": "", "has": set()}
+    args = iter(args)
+    for arg in args:
+        if arg == "--reverse":
+            options["reverse"] = True
+        elif arg in ("--page", "--size"):
+            value = int(next(args))
+            if value < 1:
+                raise ValueError(f"{arg} must be a positive number")
+            options[arg[2:]] = value
+        elif arg == "--sort":
+            options["sort"] = next(args)
+            if options["sort"] not in ALL_SORTS:
+                raise ValueError(f"--sort must be one of: {', '.join(ALL_SORTS)}")
+        elif arg == "--prefix":
+            options["prefix"] = next(args)
+        elif arg == "--has":
+            field = next(args)
+            if field not in ALL_FIELDS:
+                raise ValueError(f"--has must be one of: {', '.join(ALL_FIELDS)}")
+            options["has"].add(field)
+        else:
+            raise ValueError(f"unknown option '{arg}'")
+    return options
+
+
+def select_contacts(book, options, skip=0):
+    """
+    Lazily yield records in the order and with the filters of parsed 'all' options, after skipping `skip`.
+    Sorting by name streams from the book's ordered name index; by birthday from the birthday calendar.
+    """
+    prefix, has = options["prefix"], options["has"]
+    if options["sort"] == "name" and not has:
+        return (book.find(name) for name in book.iter_names(prefix, options["reverse"], skip))
+
+    if options["sort"] == "birthday":
+        records = book.iter_by_birthday(options["reverse"])
+        if prefix:
+            records = (record for record in records if record.name.value.startswith(prefix))
+    else:
+        records = (book.find(name) for name in book.iter_names(prefix, options["reverse"]))
+    if "phone" in has:
+        records = (record for record in records if record.phones)
+    if "email" in has:
+        records = (record for record in records if record.email)
+    if "birthday" in has:
+        records = (record for record in records if record.birthday)
+    return islice(records, skip, None)
+
+
+def contact_row(record):
+    phones = ', '.join([p.value for p in record.phones])
+    email = record.email.value if record.email else ''
+    birthday = record.birthday.value.strftime("%d.%m.%Y") if record.birthday else ''
+    return record.name.value, phones, email, birthday
+
+
+def contact_page(book, options, page, size):
+    """
+    Rows of one page of 'all', the caption of its table and whether more pages follow.
+    """
+    records = select_contacts(book, options, (page - 1) * size)
+    rows = [contact_row(record) for record in islice(records, size)]
+    more = next(records, None) is not None
+    if options["sort"] == "name" and not options["has"]:
+        _, start, end = book.name_range(options["prefix"])
+        pages = max(1, -(-(end - start) // size))
+        caption = f"Page {page} of {pages} ({end - start} contacts)"
+    else:
+        caption = f"Page {page}" if rows else None
+    return rows, caption, more
+
+
 @input_error
 def all_contacts(args=None, book=None, notes=None):
+    """
+    Show contacts page by page. On a terminal a page is a Rich table; otherwise every
+    selected row is streamed as tab-separated text as soon as it is read. Pages are
+    printed from the result cache; a whole book streamed without pages is not cached.
+    """
+    options = parse_all_options(args or [])
+    if console.quiet:
+        return ""
+    page, size = options["page"] or 1, options["size"]
+    if size is None and (console.is_terminal or options["page"]):
+        size = PAGE_SIZE
+
+    out = sys.stdout
+    if size is None:
+        for record in select_contacts(book, options):
+            out.write("\t".join(contact_row(record)) + "\n")
+        out.flush()
+        return ""
+    rows, caption, more = results.get(("all", tuple(args or ()), size, book.version),
+                                      lambda: contact_page(book, options, page, size))
+    if not console.is_terminal:
+        for row in rows:
+            out.write("\t".join(row) + "\n")
+        out.flush()
+        return ""
+
+    from rich import box
+    from rich.table import Table
+
     table = Table(title="All Contacts", title_style="bold magenta", box=box.MINIMAL_DOUBLE_HEAD)
     table.add_column("Name", style="bold green")
     table.add_column("Phones", style="cyan")
     table.add_column("Email", style="yellow")
     table.add_column("Birthday", style="blue")
-
-    for name, record in book.data.items():
-        phones = ', '.join([p.value for p in record.phones])
-        email = record.email.value if record.email else ''
-        birthday = record.birthday.value.strftime("%d.%m.%Y") if record.birthday else ''
-        table.add_row(name, phones, email, birthday)
-
+    for row in rows:
+        table.add_row(*row)
+    table.caption = caption
     console.print(table)
+    if more:
+        return Fore.YELLOW + f"More contacts: all --page {page + 1}" + \
+            (f" --size {options['size']}" if options["size"] else "")
     return ""
 
 
+@input_error
+def read_import(args=None, book=None, notes=None):
+    """Read and validate the rows 'import' would apply, without touching the book."""
+    filename = args[0]
+    fmt = args[1] if len(args) > 1 else None
+    return list(read_contacts(filename, fmt))
+
+
+@input_error
+def import_file(args=None, book=None, notes=None, report=None):
+    filename = args[0]
+    fmt = args[1] if len(args) > 1 else None
+    if report is None:  # else the rows were applied beforehand (the server does, in slices)
+        report = import_contacts(book, filename, fmt)
+    history.clear()  # imported records are not versioned
+    lines = [Fore.GREEN + f"Imported {report.imported} contacts."]
+    if report.renamed:
+        lines.append(Fore.YELLOW + f"{report.renamed} names contained spaces and were imported with '_' instead "
+                                   "('John Smith' as 'John_Smith').")
+    if report.failed:
+        lines.append(Fore.YELLOW + f"{report.failed} rows failed:")
+        lines.extend(f"  line {line_no}: {message}" for line_no, message in report.errors)
+        if report.failed > len(report.errors):
+            lines.append(f"  ... and {report.failed - len(report.errors)} more")
+    return "\n".join(lines)
+
+
+@input_error
+def export_file(args=None, book=None, notes=None):
+    filename = args[0]
+    fmt = args[1] if len(args) > 1 else None
+    count = export_contacts(book, filename, fmt)
+    return Fore.GREEN + f"Exported {count} contacts to {filename}."
+
+
+@input_error
+def dedupe(args=None, book=None, notes=None):
+    unknown = [arg for arg in args or () if arg != "--dry-run"]
+    if unknown:
+        raise ValueError(f"unknown option '{unknown[0]}'")
+    report = find_duplicates(book)
+    if not report.groups:
+        return Fore.YELLOW + f"No duplicates among {report.total} contacts ({report.candidates} pairs compared)."
+    if args:
+        lines = [Fore.GREEN + f"Found {len(report.groups)} groups of duplicates, {report.duplicates} contacts "
+                              f"to merge ({report.candidates} pairs compared):"]
+    else:
+        merge_duplicates(book, report)
+        history.clear()  # merges are not versioned
+        lines = [Fore.GREEN + f"Merged {report.duplicates} duplicate contacts in {len(report.groups)} groups:"]
+    for group in report.groups[:DEDUPE_LIMIT]:
+        merged = ", ".join(f"{name} ({', '.join(reasons)})" for name, reasons in group.merged)
+        lines.append(f"  {group.keep} <- {merged}")
+    if len(report.groups) > DEDUPE_LIMIT:
+        lines.append(f"  ... and {len(report.groups) - DEDUPE_LIMIT} more")
+    return "\n".join(lines)
+
+
+@input_error
+def use(args=None, book=None, notes=None):
+    entry = workspace.use(args[0])
+    return Fore.GREEN + f"Using book '{entry.name}': {len(entry.book)} contacts, {len(entry.notes.notes)} notes."
+
+
+@input_error
+def books(args=None, book=None, notes=None):
+    lines = [f"  {'book':<20} {'contacts':>9} {'notes':>7}  {'last change':<16}"]
+    for name in workspace.books():
+        info = workspace.info(name)
+        modified = datetime.fromtimestamp(info.modified).strftime("%Y-%m-%d %H:%M") if info.modified else "-"
+        lines.append(f"{'*' if name == workspace.name else ' '} {name:<20} "
+                     f"{'?' if info.contacts is None else info.contacts:>9} {'?' if info.notes is None else info.notes:>7}"
+                     f"  {modified:<16}" + ("  in memory" if info.resident else ""))
+    return "\n".join(lines)
+
+
+@input_error
+def undo(args=None, book=None, notes=None):
+    label = history.undo(book, notes)
+    if label is None:
+        return Fore.YELLOW + "Nothing to undo."
+    return Fore.GREEN + f"Undone: {label}."
+
+
+@input_error
+def redo(args=None, book=None, notes=None):
+    label = history.redo(book, notes)
+    if label is None:
+        return Fore.YELLOW + "Nothing to redo."
+    return Fore.GREEN + f"Redone: {label}."
+
+
+@input_error
+def stats(args=None, book=None, notes=None):
+    action = args[0].lower() if args else ""
+    if action in ("on", "off"):
+        metrics.enabled = action == "on"
+        return Fore.GREEN + f"Statistics {'enabled' if metrics.enabled else 'disabled'}."
+    if action == "reset":
+        metrics.reset()
+        results.clear()
+        return Fore.GREEN + "Statistics reset."
+    if action in ("json", "prometheus"):
+        filename = args[1]
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(metrics.to_json() if action == "json" else metrics.to_prometheus())
+        return Fore.GREEN + f"Statistics written to {filename}."
+    if action:
+        raise ValueError(f"unknown option '{action}'")
+
+    lookups = results.hits + results.misses
+    cache_line = f"Result cache: {results.hits} hits, {results.misses} misses" + \
+        (f" ({results.hits / lookups:.0%} hit rate)" if lookups else "") + f", {len(results)}/{results.maxsize} results"
+    if not metrics.histograms:
+        if metrics.enabled:
+            return Fore.YELLOW + "No statistics yet.\n" + cache_line
+        return Fore.YELLOW + "Statistics are off. Turn them on with 'stats on' or start with --stats.\n" + cache_line
+    names = {handler.__name__: command for command, handler in reversed(COMMANDS.items())}
+    header = f"{'type':<10} {'name':<16} {'calls':>8} {'errors':>7}" + \
+        "".join(f" {f'p{round(p * 100)} ms':>9}" for p in PERCENTILES) + f" {'max ms':>9}"
+    lines = [header]
+    for family, name, h in metrics.rows():
+        if family == "command":
+            name = names.get(name, name)
+        lines.append(f"{family:<10} {name:<16} {h.count:>8} {h.errors:>7}" +
+                     "".join(f" {h.percentile(p) * 1000:>9.3f}" for p in PERCENTILES) + f" {h.max * 1000:>9.3f}")
+    lines.append(cache_line)
+    return "\n".join(lines)
+
+
 @input_error
 def exit_bot(args=None, book=None, notes=None):
     """
-    Save data and exit the bot.
+    Exit the bot. The data is saved by whoever runs the commands, on any exit.
     """
-    print(Fore.YELLOW + "Saving data and exiting... Goodbye!")
-    book.save_to_file()
+    print(Fore.YELLOW + "Exiting... Goodbye!")
     sys.exit()
 
 
@@ -281,6 +661,9 @@ COMMANDS = {
     "add": add,
     "change": change,
     "phone": phone,
+    "search": search,
+    "who": who,
+    "find-phone": find_phone,
     "delete-contact": delete_contact,
     "add-email": add_email,
     "change-email": change_email,
@@ -295,7 +678,51 @@ COMMANDS = {
     "find-note": find_note,
     "add-tag": add_tag,
     "find-tag": find_tag,
+    "tags": tags,
     "all": all_contacts,
+    "import": import_file,
+    "export": export_file,
+    "dedupe": dedupe,
+    "use": use,
+    "books": books,
+    "undo": undo,
+    "redo": redo,
+    "stats": stats,
     "exit": exit_bot,
     "close": exit_bot,
 }
+
+
+workspace = Workspace(COMMANDS, history)  # named books; main configures it and picks the first
+
+
+# Aliases for commands
+ALIASES = {
+    "quit": "exit",
+    "bye": "exit",
+    "create": "add",
+    "remove": "delete-contact",
+}
+
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;]*m")  # colour codes, stripped from non-terminal output
+
+# Commands that change state, mapped to the store they modify (used by the journal).
+MUTATING_COMMANDS = {
+    "add": "book",
+    "change": "book",
+    "delete-contact": "book",
+    "add-email": "book",
+    "change-email": "book",
+    "delete-email": "book",
+    "add-birthday": "book",
+    "change-birthday": "book",
+    "delete-birthday": "book",
+    "add-note": "notes",
+    "change-note": "notes",
+    "delete-note": "notes",
+    "add-tag": "notes",
+}
+
+# Commands whose changes are too big to journal (or cannot be replayed from it);
+# a fresh snapshot is written right after them when they changed anything.
+SNAPSHOT_COMMANDS = {"import", "dedupe", "undo", "redo"}
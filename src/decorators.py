@@ -1,18 +1,73 @@
 from functools import wraps
+from time import perf_counter
+
+from src.utils.metrics import metrics
+
+
+class ErrorMessage(str):
+    """Message returned by a handler that failed, so callers can tell errors from results."""
+
 
 def input_error(func):
+    """
+    Turn exceptions of a handler into ErrorMessage results. While metrics are enabled,
+    also record the handler's latency and whether it failed.
+    """
     @wraps(func)
     def wrapper(*args, **kwargs):
+        started = perf_counter() if metrics.enabled else None
         try:
-            return func(*args, **kwargs)
+            result = func(*args, **kwargs)
         except IndexError:
-            return f"{func.__name__}: Not enough arguments."
+            result = ErrorMessage(f"{func.__name__}: Not enough arguments.")
         except KeyError:
-            return f"{func.__name__}: Key not found."
+            result = ErrorMessage(f"{func.__name__}: Key not found.")
         except ValueError as ve:
             if "not enough values to unpack" in str(ve):
-                return f"{func.__name__}: Not enough arguments."
-            return f"{func.__name__}: Invalid value. {ve}"
+                result = ErrorMessage(f"{func.__name__}: Not enough arguments.")
+            else:
+                result = ErrorMessage(f"{func.__name__}: Invalid value. {ve}")
         except Exception as e:
-            return f"{func.__name__}: Unexpected error. {e}"
+            result = ErrorMessage(f"{func.__name__}: Unexpected error. {e}")
+        if started is not None:
+            metrics.observe("command", func.__name__, perf_counter() - started, isinstance(result, ErrorMessage))
+        return result
     return wrapper
+
+
+def versioned(history, store):
+    """
+    Record the changes a handler makes to one contact ("book") or note ("notes"),
+    named by its first argument, as a new version in history.
+    """
+    def decorator(func):
+        label = func.__name__.replace("_", "-")
+
+        @wraps(func)
+        def wrapper(args=None, book=None, notes=None):
+            if not args or not history.enabled:
+                return func(args, book, notes)
+            history.prepare(store, args[0], book, notes)
+            result = func(args, book, notes)
+            if not isinstance(result, ErrorMessage):
+                history.commit(f"{label} {args[0]}", store, args[0], book, notes)
+            return result
+        return wrapper
+    return decorator
+
+
+def cached(cache, *stores, context=None):
+    """
+    Serve a read-only handler's results from cache, keyed by its arguments and the
+    versions of the stores ("book", "notes") it reads; `context` returns anything else
+    the result depends on. Only for handlers without side effects: a hit skips the call.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(args=None, book=None, notes=None):
+            containers = {"book": book, "notes": notes}
+            key = (func.__name__, tuple(args or ()), tuple(containers[store].version for store in stores),
+                   context() if context is not None else None)
+            return cache.get(key, lambda: func(args, book, notes))
+        return wrapper
+    return decorator
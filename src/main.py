@@ -1,29 +1,131 @@
-from src.models.contacts import AddressBook
-from src.models.notes import Notes
-from src.utils.autocomplete import smart_guess
-from src.storage.persistence import load_contacts, save_contacts, load_notes, save_notes
-from src.commands import COMMANDS, parse_input, show_help
+import argparse
+import sys
+import time
+
+from src.utils.autocomplete import Dispatcher
+from src.storage.persistence import STORAGE_FILES
+from src.utils.metrics import metrics
+from src.storage.journal import FSYNC_EVERY
+from src.storage.saver import SAVE_EVERY, SAVE_INTERVAL
+from src.storage.workspace import DEFAULT_BOOK, RESIDENT_BOOKS
+from src.commands import (COMMANDS, ALIASES, MUTATING_COMMANDS, ANSI_PATTERN, parse_input,
+                          show_help, history, workspace, console as command_console)
+from src.decorators import ErrorMessage
+from src.utils.console import LazyConsole
 from colorama import init, Fore, Style
-from rich.console import Console
 
-console = Console()
-init(autoreset=True)
+console = LazyConsole()
+
+
+def run_batch(lines, workspace, save_every=0, verbose=False):
+    """
+    Run commands from an iterable of lines without prompts, colours or fuzzy matching.
+    Data is saved at the end (and the book in use every `save_every` commands).
+    Returns (commands, errors).
+    """
+    processed = errors = 0
+    command_console.quiet = not verbose  # no Rich tables from 'all'/'help' unless asked for
+    history.enabled = False  # bulk loads are not undone command by command
+    started = time.perf_counter()
+
+    for line in lines:
+        command, args = parse_input(line)
+        if not command or command.startswith("#"):
+            continue
+        command = ALIASES.get(command, command)
+        if command in ("close", "exit"):
+            break
+
+        processed += 1
+        handler = COMMANDS.get(command)
+        if handler is None:
+            errors += 1
+            result = f"Unknown command '{command}'."
+        else:
+            current = workspace.current
+            result = handler(args, current.book, current.notes)
+            current.touch()
+            if isinstance(result, ErrorMessage) or (result and result.startswith(Fore.RED)):
+                errors += 1
+        if verbose and result:
+            print(ANSI_PATTERN.sub("", result))
+        if save_every and processed % save_every == 0:
+            workspace.current.save()
+
+    workspace.close()
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"Processed {processed} commands in {elapsed:.2f}s ({rate:.0f} commands/s), {errors} errors.",
+          file=sys.stderr)
+    return processed, errors
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AddressBook assistant bot")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run commands from FILE ('-' for stdin) non-interactively")
+    parser.add_argument("--save-every", type=int, metavar="N",
+                        help=f"write snapshots after every N changes (default: {SAVE_EVERY}; "
+                             "in batch mode only at the end)")
+    parser.add_argument("--save-interval", type=float, default=SAVE_INTERVAL, metavar="SECONDS",
+                        help=f"write snapshots this often while something changed (default: {SAVE_INTERVAL:g})")
+    parser.add_argument("--verbose", action="store_true", help="in batch mode, print command results")
+    parser.add_argument("--storage", choices=sorted(STORAGE_FILES), default="recordfile",
+                        help="storage backend (default: recordfile)")
+    parser.add_argument("--stats", action="store_true",
+                        help="record call counts and latencies from the start (see the 'stats' command)")
+    parser.add_argument("--serve", metavar="ADDRESS",
+                        help="serve many sessions on ADDRESS ('host:port', 'port' or 'unix:path')")
+    parser.add_argument("--files", metavar="DIR",
+                        help="when serving, the directory import, export and 'stats json|prometheus' may use "
+                             "(without it, sessions cannot use files)")
+    parser.add_argument("--book", default=DEFAULT_BOOK,
+                        help=f"address book to start with (default: {DEFAULT_BOOK}; see the 'use' command)")
+    parser.add_argument("--resident-books", type=int, default=RESIDENT_BOOKS, metavar="N",
+                        help=f"address books kept in memory (default: {RESIDENT_BOOKS})")
+    return parser.parse_args(argv)
 
-# Aliases for commands
-ALIASES = {
-    "quit": "exit",
-    "bye": "exit",
-    "create": "add",
-    "remove": "delete-contact",
-}
 
-def main():
-    book = load_contacts()
-    notes = load_notes()
+def main(argv=None):
+    options = parse_args(argv)
+    metrics.enabled = options.stats
+    if options.batch is None and not options.serve and not sys.stdin.isatty():
+        options.batch = "-"
+    batch = options.batch is not None
+    workspace.configure(options.storage, options.resident_books, savers=not batch, interval=options.save_interval,
+                        every=options.save_every or SAVE_EVERY,
+                        fsync_every=0 if options.serve else FSYNC_EVERY)  # the server syncs once per batch
+    workspace.use(options.book)
 
-    console.print("[bold cyan]Welcome to the Assistant Bot![/bold cyan]")
+    if batch:
+        if options.batch == "-":
+            run_batch(sys.stdin, workspace, options.save_every or 0, options.verbose)
+        else:
+            with open(options.batch, encoding="utf-8") as f:
+                run_batch(f, workspace, options.save_every or 0, options.verbose)
+        return
+
+    if options.serve:
+        from src.server import serve  # asyncio is only needed to serve
+        serve(workspace, options.serve, options.files)
+        return
+
+    init(autoreset=True)
+    print(Style.BRIGHT + Fore.CYAN + "Welcome to the Assistant Bot!")
     show_help()
 
+    try:
+        run_interactive(workspace)
+    finally:
+        workspace.close()  # on exit, end of input, Ctrl+C or a crash alike
+    print(Fore.GREEN + "Good bye! Data saved.")
+
+
+def run_interactive(workspace):
+    """
+    Read commands from the terminal until exit/close or end of input.
+    """
+    dispatcher = Dispatcher(COMMANDS, ALIASES)  # batch runs take commands verbatim and never need it
     while True:
         try:
             user_input = input(Fore.YELLOW + "Enter a command: " + Style.RESET_ALL)
@@ -33,22 +135,48 @@ def main():
 
             command, args = parse_input(user_input)
 
-            guessed_command = smart_guess(command, COMMANDS, ALIASES)
+            if metrics.enabled:
+                started = time.perf_counter()
+                candidates = dispatcher.candidates(command)
+                metrics.observe("dispatch", "candidates", time.perf_counter() - started)
+            else:
+                candidates = dispatcher.candidates(command)
+            guessed_command = candidates[0] if len(candidates) == 1 else None
 
             if guessed_command in ["close", "exit"]:
-                save_contacts(book)
-                save_notes(notes)
-                print(Fore.GREEN + "Good bye! Data saved.")
                 break
 
+            elif guessed_command == "use":
+                print(COMMANDS["use"](args))  # may unload books, so without holding a saver's lock
+
             elif guessed_command in COMMANDS:
-                result = COMMANDS[guessed_command](args, book, notes)
+                current = workspace.current
+                saver = current.saver
+                store = MUTATING_COMMANDS.get(guessed_command)
+                versions, journaled = current.versions(), False
+                try:
+                    with saver.lock:
+                        result = COMMANDS[guessed_command](args, current.book, current.notes)
+                        if store and not isinstance(result, ErrorMessage):  # failed commands are not replayed
+                            current.journal.append(store, guessed_command, args)
+                            journaled = True
+                finally:
+                    current.touch()
+                    if journaled:
+                        saver.changed()
+                    elif current.versions() != versions:
+                        saver.compact()  # changes the journal lacks: undo, import, dedupe, a crash
                 if result:
                     print(result)
 
+            elif candidates:
+                console.print(f"[bold red]Ambiguous command '{command}': {', '.join(candidates)}.[/bold red]")
+
             else:
                 console.print(f"[bold red]Unknown command '{command}'. Type 'help' to see available commands.[/bold red]")
 
+        except (EOFError, KeyboardInterrupt):
+            break
         except Exception as e:
             console.print(f"[bold red]Unexpected error: {e}[/bold red]")
 
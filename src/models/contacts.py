@@ -1,125 +1,430 @@
+import calendar
 import pickle
-from datetime import datetime
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import date
 from collections import UserDict
-from src.utils.validators import validate_phone, validate_email, validate_birthday
+from itertools import count
+from src.utils.validators import validate_phone, validate_email, validate_birthday, PHONE_PATTERN
+from src.utils.trie import Trie
+from src.utils.ngram import NgramIndex
 
 FILE_PATH = "addressbook.pkl"
+_versions = count(1)  # shared by every book, so no two books (or states of one) get the same version
 
 # ----------------- Field classes -----------------
 
 class Field:
     """Base class for all fields."""
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value
 
+    @classmethod
+    def wrap(cls, value):
+        """Build a field from an already validated value."""
+        field = object.__new__(cls)
+        field.value = value
+        return field
+
+    def __setstate__(self, state):
+        # Older pickles store fields with a __dict__, slotted ones as (None, slots).
+        if isinstance(state, tuple):
+            state = state[1]
+        self.value = state["value"]
+
 
 class Name(Field):
     """Contact name field."""
-    pass
+    __slots__ = ()
 
 
 class Phone(Field):
     """Phone field with validation."""
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(validate_phone(value))
 
 
 class Email(Field):
     """Email field with validation."""
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(validate_email(value))
 
 
 class Birthday(Field):
     """Birthday field with validation."""
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__(validate_birthday(value))
 
+# ----------------- Compact phone encoding -----------------
+
+# A validated phone is an optional '+' and 10-15 digits, so it fits in one 64-bit integer:
+# bits 0-49 hold the number, bits 50-55 the digit count (keeps leading zeros), bit 56 the '+'.
+_DIGITS_SHIFT = 50
+_PLUS_BIT = 1 << 56
+_NUMBER_MASK = (1 << _DIGITS_SHIFT) - 1
+
+
+def pack_phone(phone):
+    """Pack a validated phone string into an int."""
+    plus = phone.startswith("+")
+    digits = phone[1:] if plus else phone
+    return int(digits) | (len(digits) << _DIGITS_SHIFT) | (_PLUS_BIT if plus else 0)
+
+
+def unpack_phone(packed):
+    """Restore the phone string from pack_phone() output."""
+    length = (packed >> _DIGITS_SHIFT) & 0x3F
+    digits = str(packed & _NUMBER_MASK).zfill(length)
+    return "+" + digits if packed & _PLUS_BIT else digits
+
 # ----------------- Record class -----------------
 
 class Record:
-    """Record represents a single contact with name, phones, email, birthday and address."""
+    """
+    Record represents a single contact with name, phones, email and birthday.
+
+    Values are kept in a compact form (interned name/email, phones packed into an
+    array of 64-bit ints, birthday as a date ordinal) and exposed as Field objects
+    on access, so callers keep using record.name.value, record.phones etc.
+    """
+    __slots__ = ("_name", "_phones", "_email", "_birthday", "_book")
 
     def __init__(self, name):
-        self.name = Name(name)
-        self.phones = []
-        self.email = None
-        self.birthday = None
+        self._name = sys.intern(name)
+        self._phones = array("Q")
+        self._email = None
+        self._birthday = 0
+        self._book = None  # AddressBook holding this record, kept up to date by its indexes
+
+    @property
+    def name(self):
+        return Name.wrap(self._name)
+
+    @property
+    def phones(self):
+        return [Phone.wrap(unpack_phone(p)) for p in self._phones]
+
+    @property
+    def email(self):
+        return Email.wrap(self._email) if self._email is not None else None
+
+    @property
+    def birthday(self):
+        return Birthday.wrap(date.fromordinal(self._birthday)) if self._birthday else None
 
     # Phone methods
     def add_phone(self, phone):
         """Add a phone to the contact."""
-        self.phones.append(Phone(phone))
+        packed = pack_phone(validate_phone(phone))
+        self._phones.append(packed)
+        if self._book is not None:
+            self._book._index_phone(self, packed)
+
+    def _phone_index(self, phone):
+        if not PHONE_PATTERN.match(phone):
+            return -1
+        packed = pack_phone(phone)
+        for idx, p in enumerate(self._phones):
+            if p == packed:
+                return idx
+        return -1
 
     def change_phone(self, old_phone, new_phone):
         """Change existing phone to a new one."""
-        for idx, p in enumerate(self.phones):
-            if p.value == old_phone:
-                self.phones[idx] = Phone(new_phone)
-                return True
-        return False
+        idx = self._phone_index(old_phone)
+        if idx < 0:
+            return False
+        old, new = self._phones[idx], pack_phone(validate_phone(new_phone))
+        self._phones[idx] = new
+        if self._book is not None:
+            self._book._unindex_phone(self, old)
+            self._book._index_phone(self, new)
+        return True
 
     def delete_phone(self, phone):
         """Delete a phone from the contact."""
-        for p in self.phones:
-            if p.value == phone:
-                self.phones.remove(p)
-                return True
-        return False
+        idx = self._phone_index(phone)
+        if idx < 0:
+            return False
+        packed = self._phones.pop(idx)
+        if self._book is not None:
+            self._book._unindex_phone(self, packed)
+        return True
 
     # Email methods
+    def _set_email(self, email):
+        self._email = email
+        if self._book is not None:
+            self._book._index_email(self)
+
     def add_email(self, email):
         """Add email to contact."""
-        self.email = Email(email)
+        self._set_email(sys.intern(validate_email(email)))
 
     def change_email(self, new_email):
         """Change existing email."""
-        if self.email:
-            self.email = Email(new_email)
+        if self._email is not None:
+            self._set_email(sys.intern(validate_email(new_email)))
             return True
         return False
 
     def delete_email(self):
         """Delete email from contact."""
-        if self.email:
-            self.email = None
+        if self._email is not None:
+            self._set_email(None)
             return True
         return False
 
     # Birthday methods
+    def _set_birthday(self, ordinal):
+        if self._book is not None:
+            self._book._unindex_birthday(self)
+        self._birthday = ordinal
+        if self._book is not None:
+            self._book._index_birthday(self)
+
     def add_birthday(self, birthday):
         """Add birthday to contact."""
-        self.birthday = Birthday(birthday)
+        self._set_birthday(validate_birthday(birthday).toordinal())
 
     def change_birthday(self, birthday):
         """Change existing birthday."""
-        if self.birthday:
-            self.birthday = Birthday(birthday)
+        if self._birthday:
+            self._set_birthday(validate_birthday(birthday).toordinal())
             return True
         return False
 
     def delete_birthday(self):
         """Delete birthday from contact."""
-        if self.birthday:
-            self.birthday = None
+        if self._birthday:
+            self._set_birthday(0)
             return True
         return False
 
+    # Pickle support
+    def __getstate__(self):
+        return (self._name, self._phones.tobytes(), self._email, self._birthday)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Pickles written before the compact layout: Field objects in __dict__.
+            self._book = None
+            self._name = sys.intern(state["name"].value)
+            self._phones = array("Q", (pack_phone(p.value) for p in state["phones"]))
+            self._email = sys.intern(state["email"].value) if state["email"] else None
+            self._birthday = state["birthday"].value.toordinal() if state["birthday"] else 0
+            return
+        self._book = None
+        name, phones, email, birthday = state
+        self._name = name
+        self._phones = array("Q")
+        self._phones.frombytes(phones)
+        self._email = email
+        self._birthday = birthday
+
     def __str__(self):
-        phones_str = ", ".join(p.value for p in self.phones)
-        email_str = self.email.value if self.email else ""
-        birthday_str = self.birthday.value.strftime("%d.%m.%Y") if self.birthday else ""
-        return f"Name: {self.name.value}, Phones: {phones_str}, Email: {email_str}, Birthday: {birthday_str}"
+        phones_str = ", ".join(unpack_phone(p) for p in self._phones)
+        email_str = self._email or ""
+        birthday_str = date.fromordinal(self._birthday).strftime("%d.%m.%Y") if self._birthday else ""
+        return f"Name: {self._name}, Phones: {phones_str}, Email: {email_str}, Birthday: {birthday_str}"
     
 
 # ----------------- AddressBook class -----------------
 
+_JAN_1_2000 = date(2000, 1, 1).toordinal()
+
+
+def day_of_year(month, day):
+    """Index 0..365 of a month/day in a leap year, so 29 February has its own slot."""
+    return date(2000, month, day).toordinal() - _JAN_1_2000
+
+
+_FEB_28 = day_of_year(2, 28)
+_FEB_29 = day_of_year(2, 29)
+
+
+def birthday_slots(delta, today):
+    """
+    Yield (date, day-of-year slot) for the next `delta` days, each slot at most once.
+    In non-leap years the 29 February slot is celebrated on 28 February.
+    """
+    seen = set()
+    for offset in range(min(delta, 365) + 1):
+        day = date.fromordinal(today.toordinal() + offset)
+        slot = day_of_year(day.month, day.day)
+        slots = [slot]
+        if slot == _FEB_28 and not calendar.isleap(day.year):
+            slots.append(_FEB_29)
+        for slot in slots:
+            if slot not in seen:
+                seen.add(slot)
+                yield day, slot
+
+
 class AddressBook(UserDict):
-    """AddressBook manages multiple Record objects."""
+    """
+    AddressBook manages multiple Record objects.
+
+    Besides the name -> record dict it keeps indexes updated by add_record/delete and
+    the records' own methods: a birthday calendar of 366 day-of-year buckets, and a
+    phone -> names map with digit tries for prefix and suffix phone search.
+    A book whose records are loaded lazily defers the indexes until a query needs them.
+    Every change, through the book or one of its records, gives it a new `version`.
+    The trigram index of names for fuzzy search and the sorted list of names for paging
+    need only the keys, so each is built on first use and kept up to date from then on.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._names = None
+        self._order = None
+        self._version = next(_versions)
+        self._reset_indexes()
+        super().__init__(*args, **kwargs)
+
+    @property
+    def version(self):
+        """Changes with every change to the book; no two books share a version."""
+        return self._version
+
+    def _changed(self, record):
+        self._version = next(_versions)
+
+    def _reset_indexes(self, indexed=True):
+        self._indexed = indexed
+        self._birthdays = [{} for _ in range(366)]
+        self._phone_owners = {}           # packed phone -> set of names
+        self._phone_prefixes = Trie()     # digits -> packed phones
+        self._phone_suffixes = Trie()     # reversed digits -> packed phones
+
+    def __setitem__(self, name, record):
+        if name in self.data:
+            self._detach(self.data[name])
+        self.data[name] = record
+        self._attach(record)
+        self._index_name(name)
+        self._changed(record)
+
+    def __delitem__(self, name):
+        record = self.data.pop(name)
+        self._detach(record)
+        self._unindex_name(name)
+        self._changed(record)
+
+    def _index_name(self, name):
+        if self._names is not None:
+            self._names.add(name)
+        if self._order is not None:
+            i = bisect_left(self._order, name)
+            if i == len(self._order) or self._order[i] != name:
+                self._order.insert(i, name)
+
+    def _unindex_name(self, name):
+        if self._names is not None:
+            self._names.remove(name)
+        if self._order is not None:
+            i = bisect_left(self._order, name)
+            if i < len(self._order) and self._order[i] == name:
+                del self._order[i]
+
+    def _attach(self, record):
+        record._book = self
+        if self._indexed:
+            self._add_birthday(record)
+            for packed in record._phones:
+                self._add_phone_owner(record._name, packed)
+
+    def _detach(self, record):
+        if record._book is not self:
+            return
+        if self._indexed:
+            self._drop_birthday(record)
+            for packed in record._phones:
+                self._drop_phone_owner(record._name, packed)
+        record._book = None
+
+    def _reindex(self):
+        """Rebuild all indexes from self.data."""
+        self._reset_indexes()
+        for record in self.data.values():
+            self._attach(record)
+
+    def _defer_indexes(self):
+        """Drop the indexes until the first query that needs them (used with lazily loaded data)."""
+        self._reset_indexes(indexed=False)
+
+    def _ensure_indexes(self):
+        if not self._indexed:
+            self._reindex()
+
+    # Hooks called by the records' methods.
+
+    def _index_phone(self, record, packed):
+        self._changed(record)
+        if self._indexed:
+            self._add_phone_owner(record._name, packed)
+
+    def _unindex_phone(self, record, packed):
+        self._changed(record)
+        if self._indexed and packed not in record._phones:  # the record may still have another copy of it
+            self._drop_phone_owner(record._name, packed)
+
+    def _index_email(self, record):
+        self._changed(record)  # emails are not indexed in memory
+
+    def _index_birthday(self, record):
+        self._changed(record)
+        if self._indexed:
+            self._add_birthday(record)
+
+    def _unindex_birthday(self, record):
+        self._changed(record)
+        if self._indexed:
+            self._drop_birthday(record)
+
+    # Indexes.
+
+    def _add_phone_owner(self, name, packed):
+        owners = self._phone_owners.get(packed)
+        if owners is None:
+            owners = self._phone_owners[packed] = set()
+            digits = unpack_phone(packed).lstrip("+")
+            self._phone_prefixes.insert(digits, packed)
+            self._phone_suffixes.insert(digits[::-1], packed)
+        owners.add(name)
+
+    def _drop_phone_owner(self, name, packed):
+        owners = self._phone_owners.get(packed)
+        if owners is None:
+            return
+        owners.discard(name)
+        if not owners:
+            del self._phone_owners[packed]
+            digits = unpack_phone(packed).lstrip("+")
+            self._phone_prefixes.remove(digits, packed)
+            self._phone_suffixes.remove(digits[::-1], packed)
+
+    def _add_birthday(self, record):
+        if record._birthday:
+            bday = date.fromordinal(record._birthday)
+            self._birthdays[day_of_year(bday.month, bday.day)][record._name] = record
+
+    def _drop_birthday(self, record):
+        if record._birthday:
+            bday = date.fromordinal(record._birthday)
+            self._birthdays[day_of_year(bday.month, bday.day)].pop(record._name, None)
 
     def add_record(self, record):
         """Add a new record to the address book."""
-        self.data[record.name.value] = record
+        self[record._name] = record
 
     def find(self, name):
         """Find record by name."""
@@ -128,10 +433,84 @@ class AddressBook(UserDict):
     def delete(self, name):
         """Delete record by name."""
         if name in self.data:
-            del self.data[name]
+            del self[name]
             return True
         return False
 
+    def name_range(self, prefix=""):
+        """(sorted names, start, end): names[start:end] are the names starting with prefix."""
+        if self._order is None:
+            self._order = sorted(self.data)
+        start = bisect_left(self._order, prefix)
+        end = bisect_left(self._order, prefix[:-1] + chr(ord(prefix[-1]) + 1)) if prefix else len(self._order)
+        return self._order, start, end
+
+    def iter_names(self, prefix="", reverse=False, skip=0):
+        """Yield names in sorted order (or reversed), only those starting with prefix, skipping the first `skip`."""
+        names, start, end = self.name_range(prefix)
+        positions = range(end - 1 - skip, start - 1, -1) if reverse else range(start + skip, end)
+        for i in positions:
+            yield names[i]
+
+    def search_names(self, query, limit=10):
+        """Names most similar to query, best match first."""
+        if self._names is None:
+            self._names = NgramIndex(self.data)
+        return self._names.search(query, limit)
+
+    def find_by_phone(self, phone):
+        """Names of contacts that have this exact phone."""
+        self._ensure_indexes()
+        if not PHONE_PATTERN.match(phone):
+            return set()
+        return set(self._phone_owners.get(pack_phone(phone), ()))
+
+    def search_phones(self, prefix="", suffix=""):
+        """Yield (phone, names) for phones whose digits start with prefix or end with suffix."""
+        self._ensure_indexes()
+        if suffix:
+            packed_phones = self._phone_suffixes.iter_prefix(suffix.lstrip("+")[::-1])
+        else:
+            packed_phones = self._phone_prefixes.iter_prefix(prefix.lstrip("+"))
+        for packed in packed_phones:
+            phone = unpack_phone(packed)
+            if prefix.startswith("+") and not phone.startswith("+"):
+                continue
+            yield phone, self._phone_owners[packed]
+
+    def upcoming_birthdays(self, delta, today=None):
+        """
+        Yield (date, record) for birthdays in the next `delta` days, nearest first.
+        In non-leap years 29 February birthdays are celebrated on 28 February.
+        """
+        self._ensure_indexes()
+        for day, slot in birthday_slots(delta, today or date.today()):
+            for record in self._birthdays[slot].values():
+                yield day, record
+
+    def iter_by_birthday(self, reverse=False):
+        """
+        Yield records in calendar order of their birthdays (latest first if reverse),
+        then the records without a birthday in name order (reversed too).
+        """
+        self._ensure_indexes()
+        for slot in (reversed(self._birthdays) if reverse else self._birthdays):
+            yield from (reversed(slot.values()) if reverse else slot.values())
+        for name in self.iter_names(reverse=reverse):
+            record = self.data[name]
+            if record.birthday is None:
+                yield record
+
+    def __getstate__(self):
+        return {key: value for key, value in self.__dict__.items() if not key.startswith("_")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._names = None
+        self._order = None
+        self._version = next(_versions)
+        self._reindex()
+
     def save_to_file(self, filename=FILE_PATH):
         """Serialize address book to file."""
         with open(filename, "wb") as f:
@@ -145,6 +524,7 @@ class AddressBook(UserDict):
                 data = pickle.load(f)
                 book = cls()
                 book.data = data
+                book._reindex()
                 return book
         except FileNotFoundError:
             return cls()
@@ -0,0 +1,213 @@
+import unicodedata
+from itertools import combinations
+
+from src.models.contacts import unpack_phone
+from src.utils.autocomplete import edit_distance
+
+WINDOW = 8          # records compared with each of their neighbours in a sorted-name pass
+MAX_BLOCK = 50      # records sharing a key that are all compared; larger blocks say nothing
+PHONE_DIGITS = 9    # trailing digits that identify a phone: 0501234567 is +380501234567
+MAX_TYPOS = 2       # edits between two similar names, 1 for names of up to SHORT_NAME characters
+SHORT_NAME = 8
+
+
+def normalize_name(name):
+    """Case-folded letters and digits of a name, accents removed: 'José-Smith' -> 'josesmith'."""
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return "".join(c for c in decomposed if c.isalnum())
+
+
+def phone_key(packed):
+    """The trailing digits of a packed phone, the same in every format of the number."""
+    return unpack_phone(packed)[-PHONE_DIGITS:]
+
+
+def email_key(email):
+    """Local part of an email without '+tag' and dots, case-folded: 'J.Smith+work@x' -> 'jsmith'."""
+    local = email.casefold().partition("@")[0]
+    return local.partition("+")[0].replace(".", "")
+
+
+class Profile:
+    """The fields of a contact in the form they are compared in."""
+    __slots__ = ("name", "key", "phones", "email", "birthday")
+
+    def __init__(self, record):
+        self.name = record._name
+        self.key = normalize_name(record._name)
+        self.phones = {phone_key(p) for p in record._phones}
+        self.email = record._email.casefold() if record._email is not None else None
+        self.birthday = record._birthday
+
+    def filled(self):
+        return len(self.phones) + (self.email is not None) + bool(self.birthday)
+
+
+def similar_names(a, b):
+    """Whether two normalized names differ by a few typos (and not by their numbers)."""
+    if not a or not b or a == b:
+        return a == b
+    limit = 1 if max(len(a), len(b)) <= SHORT_NAME else MAX_TYPOS
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if "".join(c for c in a if c.isdigit()) != "".join(c for c in b if c.isdigit()):
+        return False
+    return edit_distance(a, b) <= limit
+
+
+def compare(a, b):
+    """
+    Reasons to take two profiles for one person, or None. Different emails or birthdays
+    rule it out; otherwise the names must be the same once normalized, or similar with
+    a shared phone, email or birthday, or the two must share a phone and the email.
+    """
+    if a.email and b.email and a.email != b.email:
+        return None
+    if a.birthday and b.birthday and a.birthday != b.birthday:
+        return None
+    shared_phone = not a.phones.isdisjoint(b.phones)
+    same_email = a.email is not None and a.email == b.email
+    same_birthday = bool(a.birthday) and a.birthday == b.birthday
+    reasons = []
+    if a.key == b.key:
+        reasons.append("same name")
+    elif (shared_phone or same_email or same_birthday) and similar_names(a.key, b.key):
+        reasons.append("similar name")
+    elif not (shared_phone and same_email):
+        return None
+    if shared_phone:
+        reasons.append("shared phone")
+    if same_email:
+        reasons.append("same email")
+    if same_birthday:
+        reasons.append("same birthday")
+    return reasons
+
+
+def _blocks(keyed):
+    """Pairs of positions in a sorted (key, position) list that share a key."""
+    start = 0
+    for end in range(1, len(keyed) + 1):
+        if end == len(keyed) or keyed[end][0] != keyed[start][0]:
+            if 1 < end - start <= MAX_BLOCK:
+                yield from combinations((i for _, i in keyed[start:end]), 2)
+            start = end
+
+
+def _neighbours(keyed, window):
+    """Pairs of positions less than `window` apart in a sorted (key, position) list."""
+    for offset in range(1, window):
+        for (_, i), (_, j) in zip(keyed, keyed[offset:]):
+            yield i, j
+
+
+def candidate_pairs(profiles, window=WINDOW):
+    """
+    Set of (i, j) positions, i < j, of the profiles worth comparing. Names are sorted
+    forwards and backwards (a typo near the start of a name moves it far in the first
+    order, not in the second) and compared with their neighbours in a window; profiles
+    sharing a name, phone or email local part are compared within each such block.
+    """
+    names = sorted((p.key, i) for i, p in enumerate(profiles))
+    reversed_names = sorted((p.key[::-1], i) for i, p in enumerate(profiles))
+    phones = sorted((phone, i) for i, p in enumerate(profiles) for phone in p.phones)
+    emails = sorted((email_key(p.email), i) for i, p in enumerate(profiles) if p.email)
+    pairs = set()
+    for keyed in (names, reversed_names):
+        pairs.update(_neighbours(keyed, window))
+    for keyed in (names, phones, emails):
+        pairs.update(_blocks(keyed))
+    return {(i, j) if i < j else (j, i) for i, j in pairs if i != j}
+
+
+class DuplicateGroup:
+    """Contacts found to be one person: the one to keep and the others with the reasons."""
+
+    def __init__(self, keep, merged):
+        self.keep = keep
+        self.merged = merged  # (name, reasons) in name order
+
+
+class DedupeReport:
+    """Outcome of a duplicate search: the groups and how many pairs were compared."""
+
+    def __init__(self, groups, candidates, total):
+        self.groups = groups
+        self.candidates = candidates
+        self.total = total  # contacts searched
+
+    @property
+    def duplicates(self):
+        return sum(len(group.merged) for group in self.groups)
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_duplicates(book, window=WINDOW):
+    """
+    Search the book for contacts that are one person. Confirmed pairs are joined into
+    groups, except where a group would get two different emails or birthdays; the
+    contact with the most fields set is kept.
+    """
+    profiles = [Profile(record) for record in book.data.values()]
+    candidates = candidate_pairs(profiles, window)
+    parent = list(range(len(profiles)))
+    emails = [p.email for p in profiles]
+    birthdays = [p.birthday for p in profiles]
+    reasons = {}
+    for i, j in sorted(candidates):
+        found = compare(profiles[i], profiles[j])
+        if found is None:
+            continue
+        a, b = _find(parent, i), _find(parent, j)
+        if a == b:
+            continue
+        if emails[a] and emails[b] and emails[a] != emails[b]:
+            continue
+        if birthdays[a] and birthdays[b] and birthdays[a] != birthdays[b]:
+            continue
+        parent[b] = a
+        emails[a] = emails[a] or emails[b]
+        birthdays[a] = birthdays[a] or birthdays[b]
+        reasons.setdefault(i, found)
+        reasons.setdefault(j, found)
+
+    members = {}
+    for i in reasons:
+        members.setdefault(_find(parent, i), []).append(i)
+    groups = []
+    for positions in members.values():
+        keep = min(positions, key=lambda i: (-profiles[i].filled(), profiles[i].name.islower(), profiles[i].name))
+        merged = sorted((profiles[i].name, reasons[i]) for i in positions if i != keep)
+        groups.append(DuplicateGroup(profiles[keep].name, merged))
+    groups.sort(key=lambda group: group.keep)
+    return DedupeReport(groups, len(candidates), len(profiles))
+
+
+def merge_duplicates(book, report):
+    """
+    Merge each group of a report into the contact it keeps: phones it lacks (in any
+    format) are added, an email or birthday only where it has none; the others are
+    deleted. Returns the number of contacts deleted.
+    """
+    deleted = 0
+    for group in report.groups:
+        keep = book.find(group.keep)
+        phones = {phone_key(p) for p in keep._phones}
+        for name, _ in group.merged:
+            record = book.find(name)
+            for packed in list(record._phones):
+                if phone_key(packed) not in phones:
+                    phones.add(phone_key(packed))
+                    keep.add_phone(unpack_phone(packed))
+            if keep.email is None and record.email is not None:
+                keep.add_email(record.email.value)
+            if keep.birthday is None and record.birthday is not None:
+                keep.add_birthday(record.birthday.value)
+            deleted += book.delete(name)
+    return deleted
@@ -0,0 +1,128 @@
+from src.models.contacts import Record
+from src.models.notes import Note
+from src.utils.hamt import PersistentMap, MISSING
+
+MAX_VERSIONS = 1000  # undo depth; older versions are dropped
+
+STORES = ("book", "notes")
+
+
+def contact_state(book, name):
+    """Immutable state of a contact, None if there is no such contact."""
+    record = book.find(name)
+    return record.__getstate__() if record is not None else None
+
+
+def note_state(notes, title):
+    """Immutable state of a note, None if there is no such note."""
+    note = notes.find(title)
+    return (note.content, tuple(note.tags)) if note is not None else None
+
+
+def restore_contact(book, name, state):
+    """Make the contact match a state from contact_state."""
+    if state is None:
+        book.delete(name)
+        return
+    record = Record.__new__(Record)
+    record.__setstate__(state)
+    book[name] = record
+
+
+def restore_note(notes, title, state):
+    """Make the note match a state from note_state."""
+    if state is None:
+        notes.delete_note(title)
+        return
+    content, tags = state
+    note = Note(title, content)
+    note.tags = dict.fromkeys(tags)
+    notes.add_note(note)
+
+
+STATE = {"book": contact_state, "notes": note_state}
+RESTORE = {"book": restore_contact, "notes": restore_note}
+
+
+class History:
+    """
+    Undo/redo history of contact and note changes.
+
+    A version is a pair of persistent maps (name -> contact state, title -> note state)
+    with the state of every key changed since the history started; any other key is as
+    it was. Each command adds one key to the previous version in O(log n), sharing the
+    rest of it, and undo/redo restore only the keys two versions differ in, found by
+    diffing their tries. `base` keeps each key's state from before its first change.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.clear()
+
+    def clear(self):
+        """Forget every version, e.g. after changes the history did not see."""
+        self._base = {store: {} for store in STORES}
+        self._versions = [(PersistentMap(), PersistentMap())]
+        self._labels = [None]
+        self._current = 0
+
+    def __len__(self):
+        return len(self._versions) - 1
+
+    def detach(self):
+        """Take the versions out, leaving the history empty; attach() puts them back."""
+        state = self._base, self._versions, self._labels, self._current
+        self.clear()
+        return state
+
+    def attach(self, state):
+        """Continue from versions taken out by detach(), or from none if state is None."""
+        if state is None:
+            self.clear()
+        else:
+            self._base, self._versions, self._labels, self._current = state
+
+    def prepare(self, store, key, book, notes):
+        """Remember the state of key before a command changes it for the first time."""
+        base = self._base[store]
+        if key not in base:
+            base[key] = STATE[store](book if store == "book" else notes, key)
+
+    def commit(self, label, store, key, book, notes):
+        """Record the state of key after a command as a new version, unless nothing changed."""
+        current = self._versions[self._current]
+        i = STORES.index(store)
+        state = STATE[store](book if store == "book" else notes, key)
+        if state == current[i].get(key, self._base[store].get(key)):
+            return
+        changed = current[i].set(key, state)
+        version = (changed, current[1]) if i == 0 else (current[0], changed)
+        del self._versions[self._current + 1:], self._labels[self._current + 1:]
+        self._versions.append(version)
+        self._labels.append(label)
+        if len(self._versions) > MAX_VERSIONS + 1:
+            del self._versions[0], self._labels[0]
+        self._current = len(self._versions) - 1
+
+    def _move(self, target, book, notes):
+        current, wanted = self._versions[self._current], self._versions[target]
+        for i, store in enumerate(STORES):
+            base = self._base[store]
+            for key, _, state in current[i].diff(wanted[i]):
+                RESTORE[store](book if store == "book" else notes, key, base[key] if state is MISSING else state)
+        self._current = target
+
+    def undo(self, book, notes):
+        """Go back one version. Returns the label of the undone command, or None."""
+        if self._current == 0:
+            return None
+        label = self._labels[self._current]
+        self._move(self._current - 1, book, notes)
+        return label
+
+    def redo(self, book, notes):
+        """Re-apply the next version. Returns its label, or None."""
+        if self._current == len(self._versions) - 1:
+            return None
+        self._move(self._current + 1, book, notes)
+        return self._labels[self._current]
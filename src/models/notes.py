@@ -1,18 +1,125 @@
+import heapq
+import math
 import pickle
-from typing import List, Dict, Optional
+import re
+from bisect import bisect_left
+from itertools import count
+from typing import Dict, Iterator, List, Optional, Set
+
+TOKEN_PATTERN = re.compile(r"\w+")
+TAG_EXPR_PATTERN = re.compile(r"[()&|!]|[^\s()&|!]+")
+
+_versions = count(1)  # shared by every Notes, so no two of them (or states of one) get the same version
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def parse_tag_expression(expression: str) -> tuple:
+    """
+    Parse a boolean tag expression into a tree of tuples:
+    ("tag", name), ("not", node), ("and", left, right), ("or", left, right).
+    """
+    tokens = TAG_EXPR_PATTERN.findall(expression)
+    pos = 0
+
+    def peek() -> Optional[str]:
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take() -> str:
+        nonlocal pos
+        if pos >= len(tokens):
+            raise ValueError("Incomplete tag expression")
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or() -> tuple:
+        node = parse_and()
+        while peek() == "|":
+            take()
+            node = ("or", node, parse_and())
+        return node
+
+    def parse_and() -> tuple:
+        node = parse_not()
+        while peek() not in (None, "|", ")"):
+            if peek() == "&":
+                take()
+            node = ("and", node, parse_not())
+        return node
+
+    def parse_not() -> tuple:
+        token = take()
+        if token == "!":
+            return ("not", parse_not())
+        if token == "(":
+            node = parse_or()
+            if take() != ")":
+                raise ValueError("Missing ')' in tag expression")
+            return node
+        if token in ("&", "|", ")"):
+            raise ValueError(f"Unexpected '{token}' in tag expression")
+        return ("tag", token)
+
+    tree = parse_or()
+    if pos != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[pos]}' in tag expression")
+    return tree
+
 
 class Note:
-    """Class representing a single note with title, content, and tags."""
+    """
+    Class representing a single note with title, content, and tags.
+
+    The content is either kept in memory or, for notes in a store with a blob file, only
+    referenced as (blob store, offset, length) and read from the file when asked for.
+    """
 
     def __init__(self, title: str, content: str):
         self.title: str = title
-        self.content: str = content
-        self.tags: List[str] = []
+        self.content = content
+        self.tags: Dict[str, None] = {}  # insertion-ordered set
+        self._notes: Optional["Notes"] = None  # owning Notes, keeps its tag index in sync
+
+    @property
+    def content(self) -> str:
+        if self._blob is None:
+            return self._content
+        store, offset, length = self._blob
+        return store.text(offset, length)
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._content: Optional[str] = value
+        self._blob: Optional[tuple] = None
 
     def add_tag(self, tag: str) -> None:
         """Add a unique tag to the note."""
         if tag not in self.tags:
-            self.tags.append(tag)
+            self.tags[tag] = None
+            if self._notes is not None:
+                self._notes._index_tag(self, tag)
+
+    def __getstate__(self) -> dict:
+        state = {key: value for key, value in self.__dict__.items() if key not in ("_notes", "_content", "_blob")}
+        state["content"] = self.content
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        state = dict(state)
+        content = state.pop("content")
+        self.__dict__.update(state)
+        self.content = content
+        if isinstance(self.tags, list):
+            # Pickles written before tags became an ordered set.
+            self.tags = dict.fromkeys(self.tags)
+        self._notes = None
 
     def __str__(self) -> str:
         tags_str = ", ".join(self.tags)
@@ -20,28 +127,209 @@ class Note:
 
 
 class Notes:
-    """Class for managing multiple notes."""
+    """
+    Class for managing multiple notes.
+
+    Note contents are indexed in an inverted index (term -> {title: term frequency})
+    kept in sync by add_note, change_note and delete_note, so searches never rescan bodies.
+    Tags have a reverse index (tag -> titles) updated by add_note, delete_note and Note.add_tag.
+
+    With a blob store attached (`_bodies`, anything with append(bytes) -> (offset, length)
+    and text(offset, length)), added and changed bodies are written to it and notes keep
+    only a reference. Notes loaded that way defer the full-text index to the first search.
+    Every change to the notes or their tags gives them a new `version`.
+    """
 
     def __init__(self):
         self.notes: Dict[str, Note] = {}
+        self._bodies = None
+        self._version = next(_versions)
+        self._reset_index()
+
+    @property
+    def version(self) -> int:
+        """Changes with every change to the notes; no two Notes share a version."""
+        return self._version
+
+    def _changed(self) -> None:
+        self._version = next(_versions)
+
+    # ----------------- full-text index -----------------
+
+    def _reset_index(self, indexed: bool = True) -> None:
+        self._text_indexed = indexed
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_len: Dict[str, int] = {}
+        self._total_len: int = 0
+        self._sorted_terms: Optional[List[str]] = None
+        self._tags: Dict[str, Set[str]] = {}
+
+    def _index_note(self, note: Note) -> None:
+        if not self._text_indexed:
+            return
+        tokens = tokenize(note.content)
+        for term in tokens:
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                self._sorted_terms = None
+            posting[note.title] = posting.get(note.title, 0) + 1
+        self._doc_len[note.title] = len(tokens)
+        self._total_len += len(tokens)
+
+    def _unindex_note(self, note: Note) -> None:
+        if not self._text_indexed:
+            return
+        for term in set(tokenize(note.content)):
+            posting = self._postings[term]
+            del posting[note.title]
+            if not posting:
+                del self._postings[term]
+                self._sorted_terms = None
+        self._total_len -= self._doc_len.pop(note.title)
+
+    def _index_tag(self, note: Note, tag: str) -> None:
+        self._changed()
+        self._tags.setdefault(tag, set()).add(note.title)
+
+    def _attach(self, note: Note) -> None:
+        note._notes = self
+        self._index_note(note)
+        for tag in note.tags:
+            self._index_tag(note, tag)
+
+    def _detach(self, note: Note) -> None:
+        self._unindex_note(note)
+        for tag in note.tags:
+            titles = self._tags[tag]
+            titles.discard(note.title)
+            if not titles:
+                del self._tags[tag]
+        note._notes = None
+
+    def _reindex(self) -> None:
+        """Rebuild indexes from self.notes."""
+        self._reset_index()
+        for note in self.notes.values():
+            self._attach(note)
+
+    def _defer_text_index(self) -> None:
+        """Drop the full-text index until the first search (used when bodies stay on disk)."""
+        self._reset_index(indexed=False)
+        for note in self.notes.values():
+            self._attach(note)
+
+    def _ensure_text_index(self) -> None:
+        if not self._text_indexed:
+            self._text_indexed = True
+            for note in self.notes.values():
+                self._index_note(note)
+
+    def _store_body(self, note: Note) -> None:
+        """Move the note's content to the blob store, if there is one and it is not there yet."""
+        bodies = self._bodies
+        if bodies is None or (note._blob is not None and note._blob[0] is bodies):
+            return
+        note._blob = (bodies, *bodies.append(note.content.encode("utf-8")))
+        note._content = None
+
+    def _expand(self, term: str) -> List[str]:
+        """Indexed terms matching a query term; 'ab*' matches every term starting with 'ab'."""
+        if not term.endswith("*"):
+            return [term] if term in self._postings else []
+        prefix = term[:-1]
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = []
+        for i in range(bisect_left(self._sorted_terms, prefix), len(self._sorted_terms)):
+            if not self._sorted_terms[i].startswith(prefix):
+                break
+            terms.append(self._sorted_terms[i])
+        return terms
+
+    @staticmethod
+    def _parse_query(query: str) -> List[List[str]]:
+        """
+        Parse a query into OR-ed clauses of AND-ed terms.
+        "python async or rust*" -> [["python", "async"], ["rust*"]]
+        """
+        clauses: List[List[str]] = [[]]
+        for word in query.lower().split():
+            if word in ("or", "|"):
+                clauses.append([])
+                continue
+            if word in ("and", "&"):
+                continue
+            prefix = word.endswith("*")
+            for token in tokenize(word):
+                clauses[-1].append(token)
+            if prefix and clauses[-1]:
+                clauses[-1][-1] += "*"
+        return [clause for clause in clauses if clause]
+
+    def search(self, query: str) -> Iterator[Note]:
+        """Yield notes matching the query, best BM25 score first, computed lazily."""
+        self._ensure_text_index()
+        n_docs = len(self.notes)
+        if not n_docs:
+            return
+        avg_len = self._total_len / n_docs or 1.0
+
+        matched: Set[str] = set()
+        scored_terms: Set[str] = set()
+        for clause in self._parse_query(query):
+            clause_docs: Optional[Set[str]] = None
+            for term in clause:
+                expanded = self._expand(term)
+                docs: Set[str] = set()
+                for t in expanded:
+                    docs.update(self._postings[t])
+                clause_docs = docs if clause_docs is None else clause_docs & docs
+                scored_terms.update(expanded)
+                if not clause_docs:
+                    break
+            matched |= clause_docs or set()
+
+        scores: Dict[str, float] = dict.fromkeys(matched, 0.0)
+        for term in scored_terms:
+            posting = self._postings[term]
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for title in scores:
+                tf = posting.get(title)
+                if tf:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_len[title] / avg_len)
+                    scores[title] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        heap = [(-score, title) for title, score in scores.items()]
+        heapq.heapify(heap)
+        while heap:
+            _, title = heapq.heappop(heap)
+            yield self.notes[title]
+
+    # ----------------- notes API -----------------
 
     def add_note(self, note: Note) -> None:
         """Add a new note."""
+        if note.title in self.notes:
+            self._detach(self.notes[note.title])
+        self._store_body(note)
         self.notes[note.title] = note
+        self._attach(note)
+        self._changed()
 
     def find(self, title: str) -> Optional[Note]:
         """Find a note by its title."""
         return self.notes.get(title)
 
     def find_note(self, keyword: str) -> List[Note]:
-        """Find notes containing the keyword in their content (case insensitive)."""
-        keyword_lower = keyword.lower()
-        return [note for note in self.notes.values() if keyword_lower in note.content.lower()]
+        """Find notes matching the keyword query, best match first (case insensitive)."""
+        return list(self.search(keyword))
 
     def delete_note(self, title: str) -> bool:
         """Delete a note by title."""
         if title in self.notes:
-            del self.notes[title]
+            self._detach(self.notes.pop(title))
+            self._changed()
             return True
         return False
 
@@ -49,13 +337,48 @@ class Notes:
         """Change content of an existing note."""
         note = self.find(title)
         if note:
+            self._unindex_note(note)
             note.content = new_content
+            self._store_body(note)
+            self._index_note(note)
+            self._changed()
             return True
         return False
 
     def find_by_tag(self, tag: str) -> List[Note]:
         """Find notes containing a specific tag."""
-        return [note for note in self.notes.values() if tag in note.tags]
+        return [self.notes[title] for title in sorted(self._tags.get(tag, ()))]
+
+    def find_by_tags(self, expression: str) -> List[Note]:
+        """
+        Find notes matching a boolean tag expression, e.g. "work & urgent", "a | b", "!archived".
+        Precedence is ! over & over |; parentheses group; adjacent tags are AND-ed.
+        """
+        titles = self._eval_tags(parse_tag_expression(expression))
+        return [self.notes[title] for title in sorted(titles)]
+
+    def _eval_tags(self, node: tuple) -> Set[str]:
+        op = node[0]
+        if op == "tag":
+            return set(self._tags.get(node[1], ()))
+        if op == "not":
+            return self.notes.keys() - self._eval_tags(node[1])
+        if op == "and":
+            return self._eval_tags(node[1]) & self._eval_tags(node[2])
+        return self._eval_tags(node[1]) | self._eval_tags(node[2])
+
+    def tag_counts(self) -> Dict[str, int]:
+        """Number of notes per tag."""
+        return {tag: len(titles) for tag, titles in self._tags.items()}
+
+    def __getstate__(self) -> dict:
+        return {key: value for key, value in self.__dict__.items() if not key.startswith("_")}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._bodies = None
+        self._version = next(_versions)
+        self._reindex()
 
     def save_to_file(self, filename: str = "notes.pkl") -> None:
         """Serialize notes to file."""
@@ -70,6 +393,7 @@ class Notes:
                 data = pickle.load(f)
                 notes = cls()
                 notes.notes = data
+                notes._reindex()
                 return notes
         except FileNotFoundError:
             return cls()
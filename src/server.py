@@ -0,0 +1,248 @@
+import asyncio
+import io
+import os
+import signal
+import sys
+from collections import Counter
+from contextlib import redirect_stdout
+
+from rich.console import Console
+
+from src import commands
+from src.commands import COMMANDS, ALIASES, MUTATING_COMMANDS, SNAPSHOT_COMMANDS, ANSI_PATTERN, parse_input, read_import
+from src.decorators import ErrorMessage
+from src.storage.exchange import ImportReport, apply_contacts
+
+OUTPUT_WIDTH = 120  # width of tables sent to clients
+HISTORY_COMMANDS = ("undo", "redo")  # refused while other sessions share the book
+IMPORT_SLICE = 5_000  # imported rows applied between two chances for the event loop to answer reads
+
+
+def file_argument(command, args):
+    """Position of the file name among a command's arguments, None if it names no file."""
+    if command in ("import", "export"):
+        return 0
+    if command == "stats" and args and args[0].lower() in ("json", "prometheus"):
+        return 1
+    return None
+
+
+def format_reply(text):
+    """
+    Encode one reply for the line protocol: its non-empty lines, then an empty line.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    return ("\n".join(lines) + "\n\n" if lines else "\n").encode("utf-8")
+
+
+class Server:
+    """
+    Serves the command handlers over TCP or Unix sockets to many sessions at once.
+
+    Protocol: the client sends one command per line; every reply is plain text
+    terminated by an empty line. All handlers run on the event loop thread, so reads
+    are answered as soon as they arrive while mutating commands go through a queue to
+    a single writer task, which journals and applies them in order and fsyncs the
+    journals once per batch before answering. Snapshots are left to the savers.
+
+    Each session has its own book in use (see 'use'), starting with the one the
+    workspace had when the server started; each of its commands runs with that book
+    and its undo history in use, and the workspace goes back to its own after it.
+    The history belongs to the book, so undo and redo are refused while another
+    session has the book in use: they would revert that session's changes.
+
+    Commands naming a file (import, export, stats json|prometheus) only reach files
+    under the `files` directory, and are refused without one. Import files are read
+    and validated in a thread and applied IMPORT_SLICE rows at a time, so sessions
+    keep getting answers during a big import.
+    """
+
+    def __init__(self, workspace, files=None):
+        self.workspace = workspace
+        self.files = os.path.realpath(files) if files is not None else None
+        self.first_book = workspace.name
+        self.users = Counter()  # book name -> sessions using it
+        self.sessions = 0
+        self._console = Console(file=io.StringIO(), width=OUTPUT_WIDTH)
+        self._writes = None
+        self._stop = None
+
+    def confine(self, command, args):
+        """args with the file name, if any, resolved under self.files; ValueError if it is not allowed."""
+        i = file_argument(command, args)
+        if i is None or i >= len(args):
+            return args  # the handler reports a missing file name
+        if self.files is None:
+            raise ValueError(f"'{command}' with a file is not available here: the server has no --files directory")
+        path = os.path.realpath(os.path.join(self.files, args[i]))
+        if os.path.commonpath([self.files, path]) != self.files:
+            raise ValueError(f"'{args[i]}' is outside the server's files directory")
+        return args[:i] + [path] + args[i + 1:]
+
+    def execute(self, command, args, entry, **extra):
+        """Run one handler on a book and return everything it printed or returned as plain text."""
+        out = self._console.file = io.StringIO()
+        console, commands.console = commands.console, self._console
+        try:
+            with redirect_stdout(out):
+                result = COMMANDS[command](args, entry.book, entry.notes, **extra)
+        finally:
+            commands.console = console
+        entry.touch()
+        reply = ANSI_PATTERN.sub("", out.getvalue() + (result or ""))
+        return ErrorMessage(reply) if isinstance(result, ErrorMessage) else reply
+
+    async def writer(self):
+        """Apply queued mutating commands in arrival order, answering each batch after one fsync."""
+        while True:
+            batch = [await self._writes.get()]
+            while not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+
+            replies, snapshots = [], {}  # changed book -> whether it needs a snapshot now
+            try:
+                for name, command, args, future in batch:
+                    try:
+                        if command == "import":
+                            reply = await self.import_file(name, args, snapshots)
+                        else:
+                            reply = self.write(name, command, args, snapshots)
+                        replies.append((future, reply))
+                    except Exception as e:  # answer it and go on: the other sessions wait for this task
+                        replies.append((future, f"Unexpected error: {e}"))
+                resident = self.workspace.resident_books()
+                for entry, snapshot in snapshots.items():
+                    if entry not in resident:
+                        continue  # unloaded by a later command of the batch, and saved then
+                    entry.journal.sync()
+                    if snapshot:
+                        entry.saver.compact()
+                    else:
+                        entry.saver.changed()
+            except Exception as e:
+                replies = [(future, f"Unexpected error: changes may not be saved. {e}") for future, _ in replies]
+            finally:
+                for future, reply in replies:
+                    if not future.done():
+                        future.set_result(reply)
+                for _ in batch:
+                    self._writes.task_done()
+
+    async def import_file(self, name, args, snapshots):
+        """'import' for the writer: the rows are read in a thread, then applied in slices."""
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, read_import, args)
+        if isinstance(rows, ErrorMessage):
+            return rows
+        report = ImportReport()
+        with self.workspace.pinned(name) as entry:
+            versions = entry.versions()
+            for start in range(0, len(rows), IMPORT_SLICE):
+                with entry.saver.lock:
+                    apply_contacts(entry.book, rows[start:start + IMPORT_SLICE], report)
+                await asyncio.sleep(0)  # answer the reads that came in meanwhile
+            return self.write(name, "import", args, snapshots, versions, report=report)
+
+    def write(self, name, command, args, snapshots, versions=None, **extra):
+        """
+        Apply one mutating command and journal it if it succeeded; notes the book in snapshots
+        if it changed since `versions` (by default, since the command started).
+        """
+        if command in HISTORY_COMMANDS and self.users[name] > 1:
+            return ErrorMessage(f"{command}: other sessions are using book '{name}' and {command} would revert "
+                                "their changes too.")
+        with self.workspace.using(name) as entry:
+            store = MUTATING_COMMANDS.get(command)
+            versions, journaled = versions or entry.versions(), False
+            try:
+                with entry.saver.lock:
+                    reply = self.execute(command, args, entry, **extra)
+                    if store and not isinstance(reply, ErrorMessage):  # failed commands are not replayed
+                        entry.journal.append(store, command, args)
+                        journaled = True
+            finally:
+                snapshot = not journaled and entry.versions() != versions  # not 'dedupe --dry-run'
+                if journaled or snapshot:
+                    snapshots[entry] = snapshots.get(entry, False) or snapshot
+        return reply
+
+    async def session(self, reader, writer):
+        """Serve one client connection until it disconnects or sends exit/close."""
+        self.sessions += 1
+        name = self.first_book
+        self.users[name] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command, args = parse_input(line.decode("utf-8", "replace"))
+                if not command:
+                    continue
+                command = ALIASES.get(command, command)
+                if command in ("exit", "close"):
+                    writer.write(format_reply("Good bye!"))
+                    break
+                try:
+                    args = self.confine(command, args)
+                except ValueError as e:
+                    writer.write(format_reply(str(e)))
+                    await writer.drain()
+                    continue
+                if command not in COMMANDS:
+                    reply = f"Unknown command '{command}'."
+                elif command in MUTATING_COMMANDS or command in SNAPSHOT_COMMANDS:
+                    future = loop.create_future()
+                    await self._writes.put((name, command, args, future))
+                    reply = await future
+                else:
+                    with self.workspace.using(name) as entry:
+                        reply = self.execute(command, args, entry)
+                        switched = self.workspace.name  # by 'use'
+                    self.users[name] -= 1
+                    self.users[switched] += 1
+                    name = switched
+                writer.write(format_reply(reply))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            self.users[name] -= 1
+            writer.close()
+
+    async def run(self, address):
+        """
+        Listen on address ("host:port", "port" or "unix:path") until SIGINT/SIGTERM.
+        """
+        self._writes = asyncio.Queue()
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self._stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # e.g. Windows, or not the main thread
+
+        if address.startswith("unix:"):
+            server = await asyncio.start_unix_server(self.session, address[5:])
+        else:
+            host, _, port = address.rpartition(":")
+            server = await asyncio.start_server(self.session, host or "127.0.0.1", int(port))
+        writer_task = asyncio.create_task(self.writer())
+        print(f"Serving on {address}", file=sys.stderr, flush=True)
+
+        async with server:
+            await self._stop.wait()
+            server.close()
+            await self._writes.join()
+        writer_task.cancel()
+
+
+def serve(workspace, address, files=None):
+    """Run the server until it is stopped, then save the dirty books."""
+    try:
+        asyncio.run(Server(workspace, files).run(address))
+    finally:
+        workspace.close()
@@ -0,0 +1,107 @@
+import mmap
+import os
+
+BLOB_SUFFIX = ".blobs"
+WRITE_CHUNK = 1 << 20  # bytes gathered per write by append_many
+
+
+class BlobStore:
+    """
+    Append-only file of note bodies, addressed by (offset, length) and read through a
+    memory map. Bodies are written once; a changed or deleted note leaves its old body
+    behind as garbage until the store is compacted into a new file.
+    """
+
+    def __init__(self, filename, truncate=False):
+        self.filename = filename
+        self.pid = os.getpid()  # a forked saver must not compact the parent's store
+        self._truncate = truncate
+        self._fd = None  # the file is opened (and created) on first use
+        self._size = 0
+        self._mm = None
+        self._mapped = 0
+
+    def _open(self):
+        flags = os.O_RDWR | os.O_CREAT | os.O_APPEND | (os.O_TRUNC if self._truncate else 0)
+        self._fd = os.open(self.filename, flags, 0o644)
+        self._size = os.fstat(self._fd).st_size
+        self._truncate = False
+
+    @property
+    def size(self):
+        """Bytes in the file, live bodies and garbage."""
+        if self._fd is None:
+            return os.path.getsize(self.filename) if os.path.exists(self.filename) and not self._truncate else 0
+        return self._size
+
+    def append(self, data):
+        """Write bytes at the end of the file; returns their (offset, length)."""
+        if self._fd is None:
+            self._open()
+        offset = self._size
+        view = memoryview(data)
+        while view:
+            written = os.write(self._fd, view)
+            view = view[written:]
+        self._size += len(data)
+        return offset, len(data)
+
+    def append_many(self, bodies):
+        """Append many bodies with few writes; returns the (offset, length) of each."""
+        if self._fd is None:
+            self._open()
+        refs = []
+        chunk = bytearray()
+        offset = self._size
+        for body in bodies:
+            refs.append((offset + len(chunk), len(body)))
+            chunk += body
+            if len(chunk) >= WRITE_CHUNK:
+                self.append(chunk)
+                offset, chunk = self._size, bytearray()
+        if chunk:
+            self.append(chunk)
+        return refs
+
+    def view(self, offset, length):
+        """Zero-copy view of a stored body."""
+        if offset + length > self._mapped:
+            # Bodies appended since the last map: map the whole file again. Views of the old
+            # map keep it alive until they are released.
+            if self._fd is None:
+                self._open()
+            self._mm = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ) if self._size else None
+            self._mapped = self._size
+        return memoryview(self._mm)[offset:offset + length] if length else memoryview(b"")
+
+    def text(self, offset, length):
+        return str(self.view(offset, length), "utf-8")
+
+    def sync(self):
+        """Make appended bodies durable (creating the file if nothing was appended yet)."""
+        if self._fd is None:
+            self._open()
+        os.fsync(self._fd)
+
+    def close(self):
+        self._mm = None
+        self._mapped = 0
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def blob_file(notes_file, generation=0):
+    """Name of a store for the notes file; compaction moves to the next generation."""
+    return f"{notes_file}.{generation}{BLOB_SUFFIX}"
+
+
+def belongs(notes_file, filename):
+    """Whether filename is one of the notes file's blob files."""
+    return filename.startswith(notes_file + ".") and filename.endswith(BLOB_SUFFIX)
+
+
+def next_blob_file(notes_file, current):
+    """The name compaction writes to after `current`."""
+    generation = current[len(notes_file) + 1:-len(BLOB_SUFFIX)]
+    return blob_file(notes_file, int(generation) + 1 if generation.isdigit() else 0)
@@ -0,0 +1,320 @@
+import csv
+import json
+import os
+import re
+from collections import deque
+from datetime import datetime
+
+from src.models.contacts import Record
+from src.utils.validators import validate_phone, validate_email, validate_birthday
+
+FORMATS = {
+    ".csv": "csv",
+    ".vcf": "vcard",
+    ".vcard": "vcard",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+CSV_FIELDS = ["name", "phones", "email", "birthday"]
+CHUNK_SIZE = 10_000          # rows per validation task
+MAX_REPORTED_ERRORS = 100    # errors kept in ImportReport.errors (all are counted)
+VCARD_ESCAPES = {"\\": "\\\\", ",": "\\,", ";": "\\;", "\n": "\\n"}  # RFC 6350, 3.4
+VCARD_ESCAPED = re.compile(r"\\(.)")
+
+
+class ImportReport:
+    """Outcome of an import: how many rows were applied and which ones failed."""
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.renamed = 0  # imported names whose whitespace was replaced with '_'
+        self.errors = []  # (line number, message), at most MAX_REPORTED_ERRORS
+
+    def add_error(self, line_no, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+
+def detect_format(filename, fmt=None):
+    """Resolve the format name from an explicit value or the file extension."""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in FORMATS.values():
+            raise ValueError(f"Unknown format '{fmt}'. Use csv, vcard or jsonl")
+        return fmt
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError("Cannot detect format from file extension. Use csv, vcard or jsonl")
+    return FORMATS[ext]
+
+# ------------------------------
+# Reading
+# ------------------------------
+
+def _iter_raw(fmt, f):
+    """Yield (line number, raw row) pairs; raw rows are parsed later in worker processes."""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield line_no, line
+    else:
+        card, start = None, 0
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip("\r\n")
+            if line.upper() == "BEGIN:VCARD":
+                card, start = [], line_no
+            elif line.upper() == "END:VCARD":
+                if card is not None:
+                    yield start, card
+                card = None
+            elif card is not None:
+                if line[:1] in (" ", "\t") and card:
+                    card[-1] += line[1:]  # folded line
+                else:
+                    card.append(line)
+
+
+def _vcard_unescape(value):
+    return VCARD_ESCAPED.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _vcard_split(value):
+    """Split a structured vCard value (such as N) at the unescaped ';'."""
+    parts, part, chars = [], "", iter(value)
+    for char in chars:
+        if char == "\\":
+            part += char + next(chars, "")
+        elif char == ";":
+            parts.append(part)
+            part = ""
+        else:
+            part += char
+    parts.append(part)
+    return [_vcard_unescape(part) for part in parts]
+
+
+def _parse_vcard_date(value):
+    for pattern in ("%Y-%m-%d", "%Y%m%d", "%d.%m.%Y"):
+        try:
+            return datetime.strptime(value, pattern).date()
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid BDAY '{value}'")
+
+
+def _parse(fmt, raw):
+    """Turn a raw row into {"name", "phones", "email", "birthday"}."""
+    if fmt == "csv":
+        phones = (raw.get("phones") or "").replace(",", ";").split(";")
+        return {
+            "name": raw.get("name"),
+            "phones": [p.strip() for p in phones if p.strip()],
+            "email": raw.get("email") or None,
+            "birthday": raw.get("birthday") or None,
+        }
+    if fmt == "jsonl":
+        row = json.loads(raw)
+        if not isinstance(row, dict):
+            raise ValueError("Expected a JSON object")
+        phones = row.get("phones") or []
+        return {
+            "name": row.get("name"),
+            "phones": [phones] if isinstance(phones, str) else phones,
+            "email": row.get("email") or None,
+            "birthday": row.get("birthday") or None,
+        }
+
+    row = {"name": None, "phones": [], "email": None, "birthday": None}
+    for line in raw:
+        key, _, value = line.partition(":")
+        key = key.split(";")[0].upper()
+        value = value.strip()
+        if key == "FN":
+            row["name"] = _vcard_unescape(value)
+        elif key == "N" and not row["name"]:
+            row["name"] = " ".join(part for part in reversed(_vcard_split(value)[:2]) if part)
+        elif key == "TEL":
+            row["phones"].append(_vcard_unescape(value).replace(" ", "").replace("-", ""))
+        elif key == "EMAIL" and not row["email"]:
+            row["email"] = _vcard_unescape(value)
+        elif key == "BDAY" and value:
+            row["birthday"] = _parse_vcard_date(value)
+    return row
+
+
+def validate_contact(row):
+    """
+    Validate a parsed row with the usual validators, raising ValueError on the first problem.
+    Whitespace in the name (as in most vCard FN and CSV names) is replaced with '_', since
+    commands split their arguments at spaces: "John Smith" becomes "John_Smith".
+    """
+    words = (row["name"] or "").split()
+    if not words:
+        raise ValueError("Missing name")
+    name = "_".join(words)
+    return {
+        "name": name,
+        "renamed": len(words) > 1,
+        "phones": [validate_phone(p) for p in row["phones"]],
+        "email": validate_email(row["email"]) if row["email"] else None,
+        "birthday": validate_birthday(row["birthday"]) if row["birthday"] else None,
+    }
+
+
+def _process_chunk(fmt, chunk):
+    """Parse and validate a chunk of raw rows. Runs in a worker process."""
+    results = []
+    for line_no, raw in chunk:
+        try:
+            results.append((line_no, validate_contact(_parse(fmt, raw)), None))
+        except (ValueError, TypeError, AttributeError) as e:
+            results.append((line_no, None, str(e)))
+    return results
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _processed_chunks(fmt, rows, workers):
+    """Yield processed chunks in file order, keeping at most 2 * workers chunks in flight."""
+    chunks = _chunks(rows, CHUNK_SIZE)
+    first = next(chunks, [])
+    if workers <= 1 or len(first) < CHUNK_SIZE:
+        # Single-chunk files are not worth starting a pool for.
+        yield _process_chunk(fmt, first)
+        for chunk in chunks:
+            yield _process_chunk(fmt, chunk)
+        return
+    import multiprocessing  # slow to import, only needed for big files
+    from concurrent.futures import ProcessPoolExecutor
+    methods = multiprocessing.get_all_start_methods()
+    # Forking copies whatever locks the other threads (savers, the server's loop) hold.
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else None)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending = deque([pool.submit(_process_chunk, fmt, first)])
+        for chunk in chunks:
+            pending.append(pool.submit(_process_chunk, fmt, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _apply(book, contact):
+    record = book.find(contact["name"])
+    if record is None:
+        record = Record(contact["name"])
+        book.add_record(record)
+    for phone in contact["phones"]:
+        if contact["name"] not in book.find_by_phone(phone):
+            record.add_phone(phone)
+    if contact["email"]:
+        record.add_email(contact["email"])
+    if contact["birthday"]:
+        record.add_birthday(contact["birthday"])
+
+
+def read_contacts(filename, fmt=None, workers=None):
+    """
+    Yield (line number, contact, error) for each row of a CSV/vCard/JSONL file, one of
+    contact and error None. Rows are parsed and validated in chunks on a process pool
+    (inline when workers <= 1).
+    """
+    fmt = detect_format(filename, fmt)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    with open(filename, encoding="utf-8", newline="") as f:
+        for chunk in _processed_chunks(fmt, _iter_raw(fmt, f), workers):
+            yield from chunk
+
+
+def apply_contacts(book, rows, report=None):
+    """
+    Merge rows from read_contacts into the book; bad rows are reported, not applied.
+    Pass the report of earlier rows of the same file to add to it.
+    """
+    report = ImportReport() if report is None else report
+    for line_no, contact, error in rows:
+        if error:
+            report.add_error(line_no, error)
+        else:
+            _apply(book, contact)
+            report.imported += 1
+            report.renamed += contact["renamed"]
+    return report
+
+
+def import_contacts(book, filename, fmt=None, workers=None):
+    """
+    Stream contacts from a CSV/vCard/JSONL file into the book; existing contacts are merged.
+    Bad rows are reported without aborting the import.
+    """
+    return apply_contacts(book, read_contacts(filename, fmt, workers))
+
+# ------------------------------
+# Writing
+# ------------------------------
+
+def _iter_contacts(book):
+    for record in book.data.values():
+        yield {
+            "name": record.name.value,
+            "phones": [p.value for p in record.phones],
+            "email": record.email.value if record.email else None,
+            "birthday": record.birthday.value if record.birthday else None,
+        }
+
+
+def _vcard_escape(value):
+    return "".join(VCARD_ESCAPES.get(char, char) for char in value)
+
+
+def _format_contact(fmt, c):
+    """Lines of one contact in jsonl or vcard format."""
+    if fmt == "jsonl":
+        birthday = c["birthday"].strftime("%d.%m.%Y") if c["birthday"] else None
+        return [json.dumps({**c, "birthday": birthday}, ensure_ascii=False) + "\n"]
+    lines = ["BEGIN:VCARD\n", "VERSION:3.0\n", f"FN:{_vcard_escape(c['name'])}\n"]
+    lines.extend(f"TEL:{_vcard_escape(phone)}\n" for phone in c["phones"])
+    if c["email"]:
+        lines.append(f"EMAIL:{_vcard_escape(c['email'])}\n")
+    if c["birthday"]:
+        lines.append(f"BDAY:{c['birthday'].isoformat()}\n")
+    lines.append("END:VCARD\n")
+    return lines
+
+
+def export_contacts(book, filename, fmt=None):
+    """Stream all contacts of the book to a file. Returns the number of contacts written."""
+    fmt = detect_format(filename, fmt)
+    count = 0
+    with open(filename, "w", encoding="utf-8", newline="") as f:
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+        for c in _iter_contacts(book):
+            if writer:
+                writer.writerow({
+                    "name": c["name"],
+                    "phones": ";".join(c["phones"]),
+                    "email": c["email"] or "",
+                    "birthday": c["birthday"].strftime("%d.%m.%Y") if c["birthday"] else "",
+                })
+            else:
+                f.writelines(_format_contact(fmt, c))
+            count += 1
+    return count
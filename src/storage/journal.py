@@ -0,0 +1,128 @@
+import json
+import os
+
+from src.storage.persistence import save_contacts, save_notes, CONTACTS_FILE, NOTES_FILE
+
+JOURNAL_FILE = "journal.log"
+FSYNC_EVERY = 1        # fsync after this many appended entries (0 - leave it to the OS)
+
+
+class Journal:
+    """
+    Append-only log of the mutating commands that succeeded, in the order they were applied.
+
+    Every entry is one JSON line: {"seq": n, "store": "book"|"notes", "cmd": ..., "args": [...]}.
+    Snapshots (the storage backend's files) remember the last sequence number they contain
+    in `journal_seq`, so replay only applies entries that are newer than the snapshot.
+    `entries` counts the entries no snapshot contains yet: the store is dirty while it is non-zero.
+    """
+
+    def __init__(self, filename=JOURNAL_FILE, fsync_every=FSYNC_EVERY,
+                 contacts_file=CONTACTS_FILE, notes_file=NOTES_FILE):
+        self.filename = filename
+        self.contacts_file = contacts_file
+        self.notes_file = notes_file
+        self.fsync_every = fsync_every
+        self.seq = 0
+        self.entries = 0
+        self._unsynced = 0
+        self._file = None
+
+    def replay(self, book, notes, commands):
+        """Re-apply journal entries newer than the loaded snapshots. Returns number of applied entries."""
+        stores = {"book": book, "notes": notes}
+        self.seq = max(getattr(book, "journal_seq", 0), getattr(notes, "journal_seq", 0))
+        applied = 0
+        good_offset = 0
+
+        if os.path.exists(self.filename):
+            with open(self.filename, "rb") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Torn write at the tail after a crash - drop it.
+                        break
+                    good_offset += len(line)
+                    self.entries += 1
+                    self.seq = max(self.seq, entry["seq"])
+                    if entry["seq"] <= getattr(stores[entry["store"]], "journal_seq", 0):
+                        continue
+                    handler = commands.get(entry["cmd"])
+                    if handler:
+                        handler(entry["args"], book, notes)
+                        applied += 1
+
+            if good_offset != os.path.getsize(self.filename):
+                with open(self.filename, "r+b") as f:
+                    f.truncate(good_offset)
+
+        self._file = open(self.filename, "ab")
+        return applied
+
+    def append(self, store, cmd, args):
+        """
+        Write one mutation to the log after it was applied without error, while still holding
+        the saver's lock, so no snapshot falls between the two. Replay re-runs the entries in
+        order on the snapshot state, so each one meets the state it first succeeded on.
+        """
+        if self._file is None:
+            self._file = open(self.filename, "ab")
+        self.seq += 1
+        entry = {"seq": self.seq, "store": store, "cmd": cmd, "args": list(args)}
+        self._file.write(json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        self.entries += 1
+        self._unsynced += 1
+        if self.fsync_every and self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        """Force appended entries to disk."""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def checkpoint(self, book, notes):
+        """
+        Stamp book and notes with the current sequence number before they are saved.
+        Returns the checkpoint to pass to truncate() once the snapshots are written.
+        """
+        book.journal_seq = self.seq
+        notes.journal_seq = self.seq
+        offset = self._file.tell() if self._file is not None else 0
+        return offset, self.entries
+
+    def truncate(self, checkpoint):
+        """Drop the entries written before checkpoint, which the new snapshots contain."""
+        offset, entries = checkpoint
+        tail = b""
+        if offset and os.path.exists(self.filename):
+            with open(self.filename, "rb") as f:
+                f.seek(offset)
+                tail = f.read()
+        tmp = self.filename + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp, self.filename)
+        self._file = open(self.filename, "ab")
+        self.entries -= entries
+        self._unsynced = 0
+
+    def compact(self, book, notes):
+        """Write full snapshots and truncate the journal."""
+        checkpoint = self.checkpoint(book, notes)
+        save_contacts(book, self.contacts_file)
+        save_notes(notes, self.notes_file)
+        self.truncate(checkpoint)
+
+    def close(self):
+        """Flush and close the journal file."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
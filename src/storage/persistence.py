@@ -1,36 +1,101 @@
-import pickle
+import os
 from src.models.contacts import AddressBook
 from src.models.notes import Notes
+from src.storage import recordfile, shards, snapshot, sqlite_backend
+from src.utils.metrics import timed
 
-CONTACTS_FILE = "addressbook.pkl"
-NOTES_FILE = "notes.pkl"
+CONTACTS_FILE = "addressbook.dat"
+NOTES_FILE = "notes.dat"
+
+# Storage backend -> (contacts file, notes file). The backend is picked from the file
+# extension: .pkl is pickle (the original format, now written as a compressed and
+# checksummed snapshot, see snapshot.py), .db/.sqlite is SQLite, .shards is a directory
+# of pickled shards (contacts only), anything else is a record file. Missing data is
+# migrated once from the legacy pickle files.
+STORAGE_FILES = {
+    "recordfile": ("addressbook.dat", "notes.dat"),
+    "sqlite": ("addressbook.db", "addressbook.db"),
+    "pickle": ("addressbook.pkl", "notes.pkl"),
+    "sharded": ("addressbook.shards", "notes.dat"),
+}
+LEGACY_CONTACTS_FILE = "addressbook.pkl"
+LEGACY_NOTES_FILE = "notes.pkl"
+SQLITE_SUFFIXES = (".db", ".sqlite")
+SHARDS_SUFFIX = ".shards"
+
+
+def _atomic_dump(obj, filename):
+    """Write obj as a snapshot to a temp file and rename it over filename, so a crash never leaves half a snapshot."""
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        snapshot.dump(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+
+def _load_pickle(filename, default):
+    """Load a snapshot (or a plain pickle from before snapshots); a damaged one raises SnapshotError."""
+    try:
+        with open(filename, "rb") as f:
+            return snapshot.load(f)
+    except FileNotFoundError:
+        return default()
+
+
+def _is_pickle(filename):
+    return filename.endswith(".pkl")
+
+
+def _backend(filename):
+    if filename.endswith(SQLITE_SUFFIXES):
+        return sqlite_backend
+    return shards if filename.endswith(SHARDS_SUFFIX) else recordfile
+
+
+def _migrate(filename, kind, legacy_name, default, backend):
+    """Copy data from the legacy pickle next to filename into a backend that has none yet."""
+    if backend.exists(filename, kind):
+        return
+    legacy = os.path.join(os.path.dirname(filename), legacy_name)
+    if os.path.exists(legacy):
+        save = backend.save_contacts if kind == "contacts" else backend.save_notes
+        save(_load_pickle(legacy, default), filename)
 
 # ------------------------------
 # AddressBook persistence
 # ------------------------------
 
+@timed("storage")
 def save_contacts(book, filename=CONTACTS_FILE):
-    with open(filename, "wb") as f:
-        pickle.dump(book, f)
+    if _is_pickle(filename):
+        _atomic_dump(book, filename)
+    else:
+        _backend(filename).save_contacts(book, filename)
 
+@timed("storage")
 def load_contacts(filename=CONTACTS_FILE):
-    try:
-        with open(filename, "rb") as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        return AddressBook()
+    if _is_pickle(filename):
+        return _load_pickle(filename, AddressBook)
+    backend = _backend(filename)
+    _migrate(filename, "contacts", LEGACY_CONTACTS_FILE, AddressBook, backend)
+    return backend.load_contacts(filename)
 
 # ------------------------------
 # Notes persistence
 # ------------------------------
 
+@timed("storage")
 def save_notes(notes, filename=NOTES_FILE):
-    with open(filename, "wb") as f:
-        pickle.dump(notes, f)
+    if _is_pickle(filename):
+        _atomic_dump(notes, filename)
+    else:
+        _backend(filename).save_notes(notes, filename)
 
+@timed("storage")
 def load_notes(filename=NOTES_FILE):
-    try:
-        with open(filename, "rb") as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        return Notes()
+    if _is_pickle(filename):
+        return _load_pickle(filename, Notes)
+    backend = _backend(filename)
+    _migrate(filename, "notes", LEGACY_NOTES_FILE, Notes, backend)
+    return backend.load_notes(filename)
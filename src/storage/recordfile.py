@@ -0,0 +1,400 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import MutableMapping
+
+from src.models.contacts import AddressBook, Record
+from src.models.notes import Notes, Note
+from src.storage.blobstore import BlobStore, blob_file, belongs, next_blob_file
+
+# File layout (little-endian):
+#   header  | records ... | index
+# The index is an array of (record offset, record length) sorted by the record's key
+# (contact name / note title, UTF-8), and every record starts with its length-prefixed key,
+# so a lookup is a binary search over the memory-mapped file.
+# Since version 2 a notes file keeps the bodies in a blob file: the header is followed by
+# the blob file's name (length-prefixed) and a note record holds the body's (offset, length).
+MAGIC = b"ABRF"
+VERSION = 2
+KIND_CONTACTS = 0
+KIND_NOTES = 1
+
+HEADER = struct.Struct("<4sHHQQQ")   # magic, version, kind, count, index offset, journal seq
+INDEX_ENTRY = struct.Struct("<QI")   # record offset, record length
+BLOB_REF = struct.Struct("<QI")      # body offset, body length in the blob file
+COMPACT_MIN_GARBAGE = 1 << 20        # blob files are compacted once garbage exceeds both this and the live bodies
+U32 = struct.Struct("<I")
+
+
+class FormatError(ValueError):
+    """The file is not a record file this version can read."""
+
+# ------------------------------
+# Record encoding
+# ------------------------------
+
+def _pack_str(value):
+    data = value.encode("utf-8")
+    return U32.pack(len(data)) + data
+
+
+def _unpack_str(buf, offset):
+    length, = U32.unpack_from(buf, offset)
+    offset += 4
+    return bytes(buf[offset:offset + length]).decode("utf-8"), offset + length
+
+
+def encode_contact(record):
+    name, phones, email, birthday = record.__getstate__()
+    if sys.byteorder == "big":
+        swapped = array("Q")
+        swapped.frombytes(phones)
+        swapped.byteswap()
+        phones = swapped.tobytes()
+    return b"".join([
+        _pack_str(name),
+        U32.pack(len(phones) // 8), phones,
+        _pack_str(email or ""),
+        U32.pack(birthday),
+    ])
+
+
+def decode_contact(buf, offset):
+    name, offset = _unpack_str(buf, offset)
+    count, = U32.unpack_from(buf, offset)
+    offset += 4
+    phones = bytes(buf[offset:offset + 8 * count])
+    offset += 8 * count
+    if sys.byteorder == "big":
+        swapped = array("Q")
+        swapped.frombytes(phones)
+        swapped.byteswap()
+        phones = swapped.tobytes()
+    email, offset = _unpack_str(buf, offset)
+    birthday, = U32.unpack_from(buf, offset)
+    record = Record.__new__(Record)
+    record.__setstate__((sys.intern(name), phones, sys.intern(email) if email else None, birthday))
+    return record
+
+
+def encode_note(note, ref):
+    _, body_offset, body_length = ref
+    parts = [_pack_str(note.title), BLOB_REF.pack(body_offset, body_length), U32.pack(len(note.tags))]
+    parts.extend(_pack_str(tag) for tag in note.tags)
+    return b"".join(parts)
+
+
+def decode_note(buf, offset, bodies=None):
+    """Decode a note; with a blob store (version 2 files) the body stays in it."""
+    title, offset = _unpack_str(buf, offset)
+    if bodies is None:
+        content, offset = _unpack_str(buf, offset)
+        note = Note(title, content)
+    else:
+        body_offset, body_length = BLOB_REF.unpack_from(buf, offset)
+        offset += BLOB_REF.size
+        note = Note(title, None)
+        note._blob = (bodies, body_offset, body_length)
+    count, = U32.unpack_from(buf, offset)
+    offset += 4
+    for _ in range(count):
+        tag, offset = _unpack_str(buf, offset)
+        note.tags[tag] = None
+    return note
+
+# ------------------------------
+# Reading
+# ------------------------------
+
+class RecordFile:
+    """Read-only, memory-mapped view of a record file."""
+
+    def __init__(self, filename, kind):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, file_kind, self.count, self.index_offset, self.journal_seq = \
+            HEADER.unpack_from(self._mm, 0)
+        self.version = version
+        if magic != MAGIC:
+            raise FormatError(f"{filename} is not a record file")
+        if version > VERSION:
+            raise FormatError(f"{filename} has format version {version}, newer than supported {VERSION}")
+        if file_kind != kind:
+            raise FormatError(f"{filename} holds a different kind of records")
+        self._decode = decode_contact if kind == KIND_CONTACTS else decode_note
+        self.blob_file = None
+        if kind == KIND_NOTES and version >= 2:
+            name, _ = _unpack_str(self._mm, HEADER.size)
+            self.blob_file = os.path.join(os.path.dirname(filename), name)
+
+    def close(self):
+        self._mm.close()
+
+    def _entry(self, i):
+        return INDEX_ENTRY.unpack_from(self._mm, self.index_offset + i * INDEX_ENTRY.size)
+
+    def key(self, i):
+        """Raw UTF-8 key of the i-th record in key order."""
+        offset, _ = self._entry(i)
+        length, = U32.unpack_from(self._mm, offset)
+        return self._mm[offset + 4:offset + 4 + length]
+
+    def raw(self, i):
+        """Encoded bytes of the i-th record."""
+        offset, length = self._entry(i)
+        return self._mm[offset:offset + length]
+
+    def position(self, key):
+        """Index of the record with this key, or -1."""
+        target = key.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self.key(lo) == target:
+            return lo
+        return -1
+
+    def get(self, key):
+        """Decode the record with this key, or None."""
+        i = self.position(key)
+        return self._decode(self._mm, self._entry(i)[0]) if i >= 0 else None
+
+    def keys(self):
+        for i in range(self.count):
+            yield self.key(i).decode("utf-8")
+
+    def values(self, *args):
+        """Decode every record in key order; args go to the decoder."""
+        for i in range(self.count):
+            yield self._decode(self._mm, self._entry(i)[0], *args)
+
+
+class LazyRecords(MutableMapping):
+    """
+    Name -> Record mapping over a RecordFile that decodes records on first access.
+    Loaded, added and deleted records are kept in memory until the next save.
+    Decoded records are attached to `book`, so changes to them reach its hooks.
+    """
+
+    def __init__(self, records_file, book=None):
+        self.file = records_file
+        self.book = book
+        self.loaded = {}     # decoded or added records
+        self.added = set()   # names not present in the file
+        self.deleted = set() # file names deleted since loading
+
+    def __getitem__(self, name):
+        record = self.loaded.get(name)
+        if record is not None:
+            return record
+        if name in self.deleted or self.file is None:
+            raise KeyError(name)
+        record = self.file.get(name)
+        if record is None:
+            raise KeyError(name)
+        record._book = self.book
+        self.loaded[name] = record
+        return record
+
+    def _in_file(self, name):
+        return self.file is not None and name not in self.added and self.file.position(name) >= 0
+
+    def __setitem__(self, name, record):
+        if name not in self.loaded and name not in self.deleted and not self._in_file(name):
+            self.added.add(name)
+        self.deleted.discard(name)
+        self.loaded[name] = record
+
+    def __delitem__(self, name):
+        in_file = self._in_file(name) and name not in self.deleted
+        if name not in self.loaded and not in_file:
+            raise KeyError(name)
+        self.loaded.pop(name, None)
+        if name in self.added:
+            self.added.discard(name)
+        else:
+            self.deleted.add(name)
+
+    def __contains__(self, name):
+        if name in self.loaded:
+            return True
+        return name not in self.deleted and self._in_file(name)
+
+    def __len__(self):
+        count = self.file.count if self.file is not None else 0
+        return count - len(self.deleted) + len(self.added)
+
+    def __iter__(self):
+        if self.file is not None:
+            for name in self.file.keys():
+                if name not in self.deleted:
+                    yield name
+        yield from list(self.added)
+
+# ------------------------------
+# Writing
+# ------------------------------
+
+def _write(filename, kind, count, journal_seq, encoded_items, prefix=b""):
+    """Write (key bytes, encoded record) pairs, already sorted by key, atomically."""
+    tmp = filename + ".tmp"
+    index = []
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, kind, 0, 0, 0))
+        f.write(prefix)
+        offset = HEADER.size + len(prefix)
+        for _, data in encoded_items:
+            index.append(INDEX_ENTRY.pack(offset, len(data)))
+            f.write(data)
+            offset += len(data)
+        f.write(b"".join(index))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, kind, len(index), offset, journal_seq))
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp
+
+
+def save_contacts(book, filename):
+    """Write the address book. Records never loaded from the old file are copied as raw bytes."""
+    data = book.data
+    seq = getattr(book, "journal_seq", 0)
+    if isinstance(data, LazyRecords) and data.file is not None:
+        old = data.file
+
+        def items():
+            pending = sorted((name.encode("utf-8"), name) for name in data.loaded)
+            j = 0
+            for i in range(old.count):
+                key = bytes(old.key(i))
+                while j < len(pending) and pending[j][0] < key:
+                    yield pending[j][0], encode_contact(data.loaded[pending[j][1]])
+                    j += 1
+                if j < len(pending) and pending[j][0] == key:
+                    yield key, encode_contact(data.loaded[pending[j][1]])
+                    j += 1
+                elif key.decode("utf-8") not in data.deleted:
+                    yield key, bytes(old.raw(i))
+            for key, name in pending[j:]:
+                yield key, encode_contact(data.loaded[name])
+
+        tmp = _write(filename, KIND_CONTACTS, len(data), seq, items())
+        old.close()
+    else:
+        records = sorted((name.encode("utf-8"), record) for name, record in data.items())
+        tmp = _write(filename, KIND_CONTACTS, len(records), seq,
+                     ((key, encode_contact(record)) for key, record in records))
+    os.replace(tmp, filename)
+
+    if isinstance(data, LazyRecords):
+        data.file = RecordFile(filename, KIND_CONTACTS)
+        data.added.clear()
+        data.deleted.clear()
+
+
+def load_contacts(filename):
+    """Open an address book file; records are decoded lazily on first access."""
+    if not os.path.exists(filename):
+        return AddressBook()
+    records_file = RecordFile(filename, KIND_CONTACTS)
+    book = AddressBook()
+    book.data = LazyRecords(records_file, book)
+    book._defer_indexes()
+    book.journal_seq = records_file.journal_seq
+    return book
+
+
+def _saved_blob_file(filename):
+    """Blob file the saved notes file refers to (None if there is no version 2 file)."""
+    if not os.path.exists(filename):
+        return None
+    records_file = RecordFile(filename, KIND_NOTES)
+    try:
+        return records_file.blob_file
+    finally:
+        records_file.close()
+
+
+def _copy_bodies(items, store, source=None):
+    """Append the bodies of items (from the source store, or from the notes) to store; returns their refs."""
+    if source is not None:
+        bodies = (source.view(*note._blob[1:]) for _, note in items)
+    else:
+        bodies = (note.content.encode("utf-8") for _, note in items)
+    return [(store, *ref) for ref in store.append_many(bodies)]
+
+
+def save_notes(notes, filename):
+    """
+    Write the notes file and make sure its blob file holds every body.
+
+    For notes loaded from this file, bodies are already in the blob file (they are
+    appended as notes change), so only titles, tags and references are written. When
+    more than half of the blob file is garbage from changed and deleted notes, the live
+    bodies are copied to the next blob file and the old one is removed once the notes
+    file refers to the new one. Other notes get a fresh blob file of their own.
+    A forked background save never compacts: the parent keeps appending to the store.
+    """
+    items = sorted((title.encode("utf-8"), note) for title, note in notes.notes.items())
+    store = notes._bodies
+    old_file = _saved_blob_file(filename)
+    if store is not None and belongs(filename, store.filename):
+        for _, note in items:
+            notes._store_body(note)
+        live = sum(note._blob[2] for _, note in items)
+        refs = [note._blob for _, note in items]
+        if store.pid == os.getpid() and store.size - live > max(COMPACT_MIN_GARBAGE, live):
+            old, store = store, BlobStore(next_blob_file(filename, store.filename), truncate=True)
+            refs = _copy_bodies(items, store, source=old)
+            for (_, note), ref in zip(items, refs):
+                note._blob = ref
+            notes._bodies = store
+            old_file = old.filename
+            old.close()
+        elif old_file == store.filename:
+            old_file = None
+    else:
+        store = BlobStore(next_blob_file(filename, old_file) if old_file else blob_file(filename), truncate=True)
+        refs = _copy_bodies(items, store)
+    store.sync()
+    tmp = _write(filename, KIND_NOTES, len(items), getattr(notes, "journal_seq", 0),
+                 ((key, encode_note(note, ref)) for (key, note), ref in zip(items, refs)),
+                 prefix=_pack_str(os.path.basename(store.filename)))
+    os.replace(tmp, filename)
+    if store is not notes._bodies:
+        store.close()
+    if old_file and old_file != store.filename and os.path.exists(old_file):
+        os.remove(old_file)
+
+
+def load_notes(filename):
+    """Open a notes file: titles and tags are loaded, bodies are read from the blob file when needed."""
+    if not os.path.exists(filename):
+        notes = Notes()
+        notes._bodies = BlobStore(blob_file(filename))
+        return notes
+    records_file = RecordFile(filename, KIND_NOTES)
+    if records_file.blob_file and not os.path.exists(records_file.blob_file):
+        records_file.close()
+        raise FormatError(f"{filename} refers to the missing blob file {records_file.blob_file}")
+    notes = Notes()
+    notes._bodies = BlobStore(records_file.blob_file or blob_file(filename))
+    notes._defer_text_index()
+    # Version 1 files hold the bodies inline; add_note moves them to the blob file.
+    for note in records_file.values(notes._bodies if records_file.blob_file else None):
+        notes.add_note(note)
+    notes.journal_seq = records_file.journal_seq
+    records_file.close()
+    return notes
+
+
+def exists(filename, kind):
+    """Whether a record file was saved for this kind of data."""
+    return os.path.exists(filename)
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+
+from src.storage.persistence import save_contacts, save_notes, SQLITE_SUFFIXES
+from src.utils.metrics import metrics
+
+SAVE_INTERVAL = 60.0   # seconds between snapshots while something changed
+SAVE_EVERY = 1000      # ... or after this many journal entries, whichever comes first
+
+
+class Saver:
+    """
+    Writes fresh snapshots of the book and notes in the background.
+
+    Every change is already durable in the journal, so snapshots only keep replay short.
+    The store is dirty while the journal holds entries no snapshot contains; once a
+    command finds `interval` seconds passed or `every` entries piled up, changed() forks
+    while the command's thread holds `lock`, between two commands: the child gets a
+    copy-on-write image of the book and notes, writes the snapshots (to temp files
+    renamed over the old ones) and exits, while commands go on in the parent. Forking
+    from the thread that runs the commands, and not from a thread of its own, keeps the
+    child from inheriting a lock that thread held half way. A later changed() (or
+    compact()) reaps the child and, if it succeeded, drops the journal entries it saved.
+    With no commands coming, the journal just waits: replay covers it.
+
+    Without os.fork, for SQLite (whose save commits the connection the commands use)
+    or with background=False, snapshots are written inline by changed().
+    """
+
+    def __init__(self, book, notes, journal, interval=SAVE_INTERVAL, every=SAVE_EVERY, background=True):
+        self.book = book
+        self.notes = notes
+        self.journal = journal
+        self.interval = interval
+        self.every = every
+        self.lock = threading.Lock()
+        self.background = background and hasattr(os, "fork") and not journal.contacts_file.endswith(SQLITE_SUFFIXES)
+        self.saves = 0
+        self.failures = 0
+        self.last_duration = 0.0
+        self._last_save = time.monotonic()
+        self._saving = threading.Lock()  # one snapshot at a time
+        self._child = None  # (pid, checkpoint, started) of the forked save running now
+
+    def _due(self):
+        entries = self.journal.entries
+        return entries and (entries >= self.every or time.monotonic() - self._last_save >= self.interval)
+
+    def changed(self):
+        """Call after journaling a command (without holding lock): saves if a snapshot is due."""
+        with self._saving:
+            if self._child is not None and not self._reap(wait=False):
+                return  # the last snapshot is still being written
+            if not self._due():
+                return
+            if self.background:
+                self._fork()
+            else:
+                self._save_inline()
+
+    def _save_inline(self):
+        started = time.monotonic()
+        self.journal.compact(self.book, self.notes)
+        self._finish(started, True)
+
+    def _finish(self, started, ok):
+        self._last_save = time.monotonic()
+        self.last_duration = self._last_save - started
+        if ok:
+            self.saves += 1
+        else:
+            self.failures += 1
+
+    def _fork(self):
+        started = time.monotonic()
+        with self.lock:
+            checkpoint = self.journal.checkpoint(self.book, self.notes)
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    save_contacts(self.book, self.journal.contacts_file)
+                    save_notes(self.notes, self.journal.notes_file)
+                    status = 0
+                finally:
+                    os._exit(status)
+        self._child = pid, checkpoint, started
+        if metrics.enabled:
+            metrics.observe("storage", "fork", time.monotonic() - started)  # commands wait this long
+
+    def _reap(self, wait):
+        """Collect the forked save (waiting for it if wait); returns False if it is still running."""
+        pid, checkpoint, started = self._child
+        done, status = os.waitpid(pid, 0 if wait else os.WNOHANG)
+        if not done:
+            return False
+        self._child = None
+        ok = os.waitstatus_to_exitcode(status) == 0
+        if ok:
+            with self.lock:
+                self.journal.truncate(checkpoint)
+        self._finish(started, ok)
+        if metrics.enabled:
+            metrics.observe("storage", "background_save", self.last_duration, not ok)
+        return True
+
+    def compact(self):
+        """Write snapshots now, in the foreground (after import, undo and on exit)."""
+        with self._saving:
+            if self._child is not None:
+                self._reap(wait=True)
+            with self.lock:
+                self._save_inline()
+
+    def close(self, compact=True):
+        """Wait for a forked save, write final snapshots (unless compact is False) and close the journal."""
+        if compact:
+            self.compact()
+        elif self._child is not None:
+            with self._saving:
+                self._reap(wait=True)
+        self.journal.close()
@@ -0,0 +1,224 @@
+import json
+import os
+import zlib
+from collections.abc import MutableMapping
+
+from src.models.contacts import AddressBook
+from src.storage import snapshot
+
+# A sharded address book is a directory: manifest.json and one snapshot (see snapshot.py)
+# per shard holding the name -> Record dict of the names that hash to it. Shard files get a new name every
+# time they are written and the manifest, replaced last, says which ones are current, so
+# a crash in the middle of a save leaves the previous save intact.
+SHARDS = 32
+MANIFEST = "manifest.json"
+SHARD_SUFFIX = ".pkl"
+FORMAT = 1
+
+
+def shard_of(name, count):
+    """Shard holding a name. crc32 rather than hash(): it must not change between runs."""
+    return zlib.crc32(name.encode("utf-8")) % count
+
+
+def read_manifest(dirname):
+    """The saved manifest, or None if nothing was saved to dirname yet."""
+    try:
+        with open(os.path.join(dirname, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _load_shard(path):
+    with open(path, "rb") as f:
+        return snapshot.load(f)
+
+
+class ShardedRecords(MutableMapping):
+    """
+    Name -> Record mapping split into shards by name hash. A shard is read from its file
+    on first access, so a lookup loads one shard and only iteration loads them all.
+
+    Every change bumps a counter and stamps the changed shard with it; a save writes the
+    shards whose stamp is newer than the one the manifest has for them. The manifest also
+    records this session, so saves made by a forked child are known to the parent.
+    """
+
+    def __init__(self, book, dirname, manifest=None, count=SHARDS):
+        self.book = book
+        self.dirname = dirname
+        self.session = os.urandom(8).hex()
+        if manifest is None:
+            self.count = count
+            self.files = [None] * count
+            self.sizes = [0] * count
+            self.shards = [{} for _ in range(count)]
+        else:
+            self.count = manifest["shards"]
+            self.files = manifest["files"]
+            self.sizes = manifest["sizes"]
+            self.shards = [None] * self.count
+        self.version = 0
+        self.changes = [0] * self.count  # version of the last change per shard
+
+    def shard(self, i):
+        """The i-th shard, loaded now if needed."""
+        shard = self.shards[i]
+        if shard is None:
+            shard = self.shards[i] = _load_shard(os.path.join(self.dirname, self.files[i])) if self.files[i] else {}
+            for record in shard.values():
+                record._book = self.book  # so that changes to it mark the shard dirty
+        return shard
+
+    def load_all(self):
+        for i in range(self.count):
+            self.shard(i)
+
+    def touch(self, name):
+        """Mark the shard of name changed."""
+        self.version += 1
+        self.changes[shard_of(name, self.count)] = self.version
+
+    def __getitem__(self, name):
+        return self.shard(shard_of(name, self.count))[name]
+
+    def __setitem__(self, name, record):
+        self.shard(shard_of(name, self.count))[name] = record
+        self.touch(name)
+
+    def __delitem__(self, name):
+        del self.shard(shard_of(name, self.count))[name]
+        self.touch(name)
+
+    def __contains__(self, name):
+        return name in self.shard(shard_of(name, self.count))
+
+    def __len__(self):
+        return sum(len(shard) if shard is not None else size for shard, size in zip(self.shards, self.sizes))
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield from list(self.shard(i))
+
+    def values(self):
+        for i in range(self.count):
+            yield from list(self.shard(i).values())
+
+    def items(self):
+        for i in range(self.count):
+            yield from list(self.shard(i).items())
+
+
+class ShardedAddressBook(AddressBook):
+    """
+    AddressBook over ShardedRecords. Records are attached from the moment they are
+    loaded, so every change to one marks its shard dirty. Indexes are deferred until a
+    query needs them, which loads every shard.
+    """
+
+    def _changed(self, record):
+        super()._changed(record)
+        self.data.touch(record._name)
+
+    def __getstate__(self):
+        raise TypeError("ShardedAddressBook is stored in its shard files, not pickled")
+
+# ------------------------------
+# Writing
+# ------------------------------
+
+_writing = {}  # shard file path -> records, read by forked pool workers
+_PID = os.getpid()  # a forked saver writes its shards itself rather than fork again
+
+
+def _write_shard(path, records=None, workers=1):
+    with open(path, "wb") as f:
+        snapshot.dump(_writing[path] if records is None else records, f, workers=workers)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _write_shards(shards, workers):
+    """
+    Write {path: records} with a pool of forked processes that pickle the records from
+    their copy of this process's memory, so nothing but paths goes through the pool.
+    A process forked by the saver writes them one by one instead of forking again.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(shards))
+    if workers <= 1 or not hasattr(os, "fork") or os.getpid() != _PID:
+        for path, records in shards.items():
+            _write_shard(path, records, workers=None)  # blocks compressed by a thread per CPU
+        return
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    _writing.update(shards)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            for _ in pool.map(_write_shard, shards):
+                pass
+    finally:
+        _writing.clear()
+
+
+def _write_manifest(dirname, manifest):
+    path = os.path.join(dirname, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def save_contacts(book, dirname, workers=None):
+    """
+    Write the shards changed since the last save (every shard for a book from elsewhere),
+    then the manifest. Shard files no manifest refers to any more are removed.
+    """
+    os.makedirs(dirname, exist_ok=True)
+    saved = read_manifest(dirname)
+    data = book.data
+    if isinstance(data, ShardedRecords) and data.dirname == dirname:
+        same_session = saved is not None and saved.get("session") == data.session
+        saved_changes = saved["changes"] if same_session else [0] * data.count
+        files = list(saved["files"]) if saved is not None else [None] * data.count
+        dirty = [i for i in range(data.count) if data.changes[i] > saved_changes[i] or files[i] is None]
+        shards, count, session, changes = data.shards, data.count, data.session, list(data.changes)
+        sizes = [len(shard) if shard is not None else size for shard, size in zip(data.shards, data.sizes)]
+    else:
+        count, session = SHARDS, os.urandom(8).hex()
+        shards = [{} for _ in range(count)]
+        for name, record in data.items():
+            shards[shard_of(name, count)][name] = record
+        dirty, files, changes = list(range(count)), [None] * count, [0] * count
+        sizes = [len(shard) for shard in shards]
+
+    pending = {}
+    for i in dirty:
+        files[i] = f"shard-{i:03d}-{session}-{changes[i]}{SHARD_SUFFIX}"
+        pending[os.path.join(dirname, files[i])] = shards[i]
+    _write_shards(pending, workers)
+    _write_manifest(dirname, {
+        "format": FORMAT, "shards": count, "session": session, "journal_seq": getattr(book, "journal_seq", 0),
+        "files": files, "sizes": sizes, "changes": changes,
+    })
+    current = set(files)
+    for name in os.listdir(dirname):
+        if name.endswith(SHARD_SUFFIX) and name not in current:
+            os.remove(os.path.join(dirname, name))
+
+
+def load_contacts(dirname):
+    """Open a sharded address book; shards are read on first access."""
+    book = ShardedAddressBook()
+    manifest = read_manifest(dirname)
+    book.data = ShardedRecords(book, dirname, manifest)
+    book._defer_indexes()
+    book.journal_seq = manifest["journal_seq"] if manifest else 0
+    return book
+
+
+def exists(dirname, kind):
+    """Whether an address book was saved to this directory."""
+    return read_manifest(dirname) is not None
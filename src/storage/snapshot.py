@@ -0,0 +1,271 @@
+import os
+import pickle
+import struct
+import zlib
+from collections import deque
+
+# File layout (little-endian):
+#   header | block ... | end marker | trailer
+# The pickle stream is cut into blocks of `block size` bytes, each compressed on its own
+# (so blocks are compressed and decompressed in parallel) and stored after a header with
+# its raw and stored length and the CRC32 of the stored bytes. The trailer holds the
+# block count and the raw length, so a file cut short anywhere fails to load.
+MAGIC = b"ABSNAP\r\n"
+VERSION = 1
+CODECS = {"none": 0, "zlib": 1, "lzma": 2}
+DEFAULT_CODEC = "zlib"
+DEFAULT_LEVEL = {"none": None, "zlib": 1, "lzma": 0}  # fast levels: snapshots are written often
+BLOCK_SIZE = 1 << 20
+
+HEADER = struct.Struct("<8sHBxI")  # magic, version, codec, block size
+BLOCK = struct.Struct("<III")       # raw length, stored length, CRC32 of the stored bytes
+TRAILER = struct.Struct("<QQ")      # blocks, raw length
+END = BLOCK.pack(0, 0, 0)
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this version can read, or it is damaged."""
+
+
+def _codec(codec, level):
+    """(compress, decompress) functions for a codec."""
+    if codec == "zlib":
+        level = DEFAULT_LEVEL["zlib"] if level is None else level
+        return (lambda data: zlib.compress(data, level)), zlib.decompress
+    if codec == "lzma":
+        import lzma
+
+        preset = DEFAULT_LEVEL["lzma"] if level is None else level
+        return (lambda data: lzma.compress(data, preset=preset)), lzma.decompress
+    if codec == "none":
+        return bytes, bytes
+    raise ValueError(f"unknown codec {codec!r}, expected one of: {', '.join(CODECS)}")
+
+
+def _pool(workers):
+    """Thread pool for the codec (zlib, lzma and crc32 release the GIL), None for one worker."""
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        return None, 1
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot"), workers
+
+
+class _Done:
+    """Stands in for a future when blocks are processed in the calling thread."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+
+class BlockWriter:
+    """
+    Binary file-like object that writes what it is given as a snapshot: pickle.dump(obj,
+    writer). Full blocks are compressed by the pool while the pickler goes on; they are
+    written in order, with at most two blocks per worker waiting.
+    """
+
+    def __init__(self, f, codec=DEFAULT_CODEC, level=None, block_size=BLOCK_SIZE, workers=None):
+        self._f = f
+        self._compress = _codec(codec, level)[0]
+        self._block_size = block_size
+        self._pool, workers = _pool(workers)
+        self._window = 2 * workers
+        self._pending = deque()
+        self._buffer = bytearray()
+        self.blocks = 0
+        self.raw_size = 0
+        f.write(HEADER.pack(MAGIC, VERSION, CODECS[codec], block_size))
+
+    def _pack(self, block):
+        stored = self._compress(block)
+        return BLOCK.pack(len(block), len(stored), zlib.crc32(stored)), stored
+
+    def _submit(self, block):
+        self.blocks += 1
+        self.raw_size += len(block)
+        if self._pool is None:
+            self._pending.append(_Done(self._pack(block)))
+        else:
+            self._pending.append(self._pool.submit(self._pack, block))
+        while len(self._pending) > self._window:
+            self._write_next()
+
+    def _write_next(self):
+        header, stored = self._pending.popleft().result()
+        self._f.write(header)
+        self._f.write(stored)
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self._block_size:
+            view = memoryview(self._buffer)
+            end = len(self._buffer) - len(self._buffer) % self._block_size
+            for start in range(0, end, self._block_size):
+                self._submit(bytes(view[start:start + self._block_size]))
+            view.release()
+            del self._buffer[:end]
+        return len(data)
+
+    def close(self):
+        """Write the last block, the end marker and the trailer (the file stays open)."""
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            while self._pending:
+                self._write_next()
+            self._f.write(END + TRAILER.pack(self.blocks, self.raw_size))
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        elif self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+
+class BlockReader:
+    """
+    Binary file-like object reading the data of a snapshot whose header was read:
+    pickle.load(reader). Blocks are checked and decompressed by the pool a few blocks
+    ahead of the unpickler, so the whole file is never in memory at once.
+    """
+
+    def __init__(self, f, codec, workers=None):
+        self._f = f
+        self._decompress = _codec(codec, None)[1]
+        self._pool, workers = _pool(workers)
+        self._window = 2 * workers
+        self._pending = deque()
+        self._blocks = self._read_blocks()
+        self._exhausted = False
+        self._data = b""
+        self._pos = 0
+
+    def _read_exactly(self, size, what):
+        data = self._f.read(size)
+        if len(data) != size:
+            raise SnapshotError(f"snapshot is truncated in {what}")
+        return data
+
+    def _read_blocks(self):
+        count = raw_size = 0
+        while True:
+            raw_len, stored_len, crc = BLOCK.unpack(self._read_exactly(BLOCK.size, f"the header of block {count}"))
+            if raw_len == 0 and stored_len == 0:
+                break
+            yield count, raw_len, crc, self._read_exactly(stored_len, f"block {count}")
+            count += 1
+            raw_size += raw_len
+        if TRAILER.unpack(self._read_exactly(TRAILER.size, "the trailer")) != (count, raw_size):
+            raise SnapshotError("snapshot trailer does not match its blocks")
+
+    def _unpack(self, index, raw_len, crc, stored):
+        if zlib.crc32(stored) != crc:
+            raise SnapshotError(f"snapshot block {index} is corrupt (CRC mismatch)")
+        try:
+            data = self._decompress(stored)
+        except Exception as e:
+            raise SnapshotError(f"snapshot block {index} cannot be decompressed: {e}") from None
+        if len(data) != raw_len:
+            raise SnapshotError(f"snapshot block {index} has {len(data)} bytes, expected {raw_len}")
+        return data
+
+    def _fill(self):
+        """Next block of data into the buffer; False at the end of the snapshot."""
+        while not self._exhausted and len(self._pending) < self._window:
+            block = next(self._blocks, None)
+            if block is None:
+                self._exhausted = True
+            elif self._pool is None:
+                self._pending.append(_Done(self._unpack(*block)))
+            else:
+                self._pending.append(self._pool.submit(self._unpack, *block))
+        if not self._pending:
+            return False
+        self._data = self._pending.popleft().result()
+        self._pos = 0
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = [self._data[self._pos:]]
+            while self._fill():
+                chunks.append(self._data)
+            self._data, self._pos = b"", 0
+            return b"".join(chunks)
+        chunks = []
+        while size > 0:
+            if self._pos == len(self._data) and not self._fill():
+                break
+            chunk = self._data[self._pos:self._pos + size]
+            self._pos += len(chunk)
+            size -= len(chunk)
+            chunks.append(chunk)
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readline(self):
+        chunks = []
+        while True:
+            if self._pos == len(self._data) and not self._fill():
+                break
+            end = self._data.find(b"\n", self._pos)
+            stop = len(self._data) if end < 0 else end + 1
+            chunks.append(self._data[self._pos:stop])
+            self._pos = stop
+            if end >= 0:
+                break
+        return b"".join(chunks)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def dump(obj, f, codec=DEFAULT_CODEC, level=None, block_size=BLOCK_SIZE, workers=None):
+    """Pickle obj into the open binary file f as a snapshot."""
+    with BlockWriter(f, codec, level, block_size, workers) as writer:
+        pickle.dump(obj, writer, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load(f, workers=None):
+    """Unpickle a snapshot from the open binary file f; plain pickles load as before."""
+    head = f.read(HEADER.size)
+    if head and len(head) < len(MAGIC) and MAGIC.startswith(head):
+        raise SnapshotError("snapshot is truncated in its header")
+    if not head.startswith(MAGIC):
+        f.seek(0)
+        return pickle.load(f)
+    if len(head) < HEADER.size:
+        raise SnapshotError("snapshot is truncated in its header")
+    _, version, codec_id, _ = HEADER.unpack(head)
+    if version > VERSION:
+        raise SnapshotError(f"snapshot has format version {version}, newer than supported {VERSION}")
+    codec = next((name for name, i in CODECS.items() if i == codec_id), None)
+    if codec is None:
+        raise SnapshotError(f"snapshot uses an unknown codec ({codec_id})")
+    with BlockReader(f, codec, workers) as reader:
+        obj = pickle.load(reader)
+        if reader.read(1):
+            raise SnapshotError("snapshot has data after the pickle")
+    return obj
@@ -0,0 +1,492 @@
+import sqlite3
+from array import array
+from collections.abc import MutableMapping
+from datetime import date
+from typing import Dict, Iterator, List, Set
+
+from src.models.contacts import AddressBook, Record, pack_phone, unpack_phone, day_of_year, birthday_slots
+from src.models.notes import Notes, Note
+from src.utils.validators import PHONE_PATTERN
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+CREATE TABLE IF NOT EXISTS records (name TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS phones (
+    name TEXT NOT NULL REFERENCES records(name) ON DELETE CASCADE,
+    phone TEXT NOT NULL,
+    digits TEXT NOT NULL,
+    rdigits TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phones_name ON phones(name);
+CREATE INDEX IF NOT EXISTS phones_phone ON phones(phone);
+CREATE INDEX IF NOT EXISTS phones_digits ON phones(digits);
+CREATE INDEX IF NOT EXISTS phones_rdigits ON phones(rdigits);
+CREATE TABLE IF NOT EXISTS emails (
+    name TEXT PRIMARY KEY REFERENCES records(name) ON DELETE CASCADE,
+    email TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emails_email ON emails(email);
+CREATE TABLE IF NOT EXISTS birthdays (
+    name TEXT PRIMARY KEY REFERENCES records(name) ON DELETE CASCADE,
+    ordinal INTEGER NOT NULL,
+    day INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS birthdays_day ON birthdays(day);
+CREATE TABLE IF NOT EXISTS notes (title TEXT PRIMARY KEY, content TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS tags (
+    title TEXT NOT NULL REFERENCES notes(title) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (title, tag)
+);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags(tag);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(content);  -- rowid = notes.rowid
+"""
+
+_connections: Dict[str, sqlite3.Connection] = {}
+
+
+def connect(filename: str) -> sqlite3.Connection:
+    """One shared connection per database file, so contacts and notes commit together."""
+    conn = _connections.get(filename)
+    if conn is None:
+        conn = sqlite3.connect(filename)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(SCHEMA)
+        _connections[filename] = conn
+    return conn
+
+
+def _get_meta(conn, key, default=0):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def _prefix_range(prefix):
+    """Bounds for an index range scan matching strings that start with prefix."""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+# ------------------------------
+# Contacts
+# ------------------------------
+
+def _write_record(conn, record):
+    name = record._name
+    conn.execute("INSERT OR IGNORE INTO records (name) VALUES (?)", (name,))
+    conn.execute("DELETE FROM phones WHERE name = ?", (name,))
+    rows = []
+    for packed in record._phones:
+        phone = unpack_phone(packed)
+        digits = phone.lstrip("+")
+        rows.append((name, phone, digits, digits[::-1]))
+    conn.executemany("INSERT INTO phones (name, phone, digits, rdigits) VALUES (?, ?, ?, ?)", rows)
+    _write_email(conn, record)
+    _write_birthday(conn, record)
+
+
+def _write_email(conn, record):
+    if record._email is None:
+        conn.execute("DELETE FROM emails WHERE name = ?", (record._name,))
+    else:
+        conn.execute("INSERT OR REPLACE INTO emails (name, email) VALUES (?, ?)", (record._name, record._email))
+
+
+def _write_birthday(conn, record):
+    if not record._birthday:
+        conn.execute("DELETE FROM birthdays WHERE name = ?", (record._name,))
+    else:
+        bday = date.fromordinal(record._birthday)
+        conn.execute("INSERT OR REPLACE INTO birthdays (name, ordinal, day) VALUES (?, ?, ?)",
+                     (record._name, record._birthday, day_of_year(bday.month, bday.day)))
+
+
+class SqliteRecords(MutableMapping):
+    """Name -> Record mapping over the records tables, with an identity map of loaded records."""
+
+    def __init__(self, book: "SqliteAddressBook"):
+        self.book = book
+        self.conn = book.conn
+        self.cache: Dict[str, Record] = {}
+
+    def __getitem__(self, name):
+        record = self.cache.get(name)
+        if record is not None:
+            return record
+        if not self.conn.execute("SELECT 1 FROM records WHERE name = ?", (name,)).fetchone():
+            raise KeyError(name)
+        phones = array("Q", (pack_phone(p) for p, in self.conn.execute(
+            "SELECT phone FROM phones WHERE name = ? ORDER BY rowid", (name,))))
+        email = self.conn.execute("SELECT email FROM emails WHERE name = ?", (name,)).fetchone()
+        birthday = self.conn.execute("SELECT ordinal FROM birthdays WHERE name = ?", (name,)).fetchone()
+        record = Record.__new__(Record)
+        record.__setstate__((name, phones.tobytes(), email[0] if email else None, birthday[0] if birthday else 0))
+        record._book = self.book
+        self.cache[name] = record
+        return record
+
+    def __setitem__(self, name, record):
+        _write_record(self.conn, record)
+        self.cache[name] = record
+
+    def __delitem__(self, name):
+        if self.conn.execute("DELETE FROM records WHERE name = ?", (name,)).rowcount == 0:
+            raise KeyError(name)
+        self.cache.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self.cache or bool(
+            self.conn.execute("SELECT 1 FROM records WHERE name = ?", (name,)).fetchone())
+
+    def __iter__(self):
+        for name, in self.conn.execute("SELECT name FROM records ORDER BY name").fetchall():
+            yield name
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+
+class SqliteAddressBook(AddressBook):
+    """
+    AddressBook facade over SQLite. Record methods write through the index hooks,
+    and phone and birthday lookups are indexed queries. Changes are committed
+    in one transaction per save.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        super().__init__()
+        self.data = SqliteRecords(self)
+
+    def _reset_indexes(self, indexed=True):
+        self._indexed = True  # the database is the index
+
+    def __setitem__(self, name, record):
+        old = self.data.cache.get(name)
+        if old is not None and old is not record:
+            old._book = None
+        self.data[name] = record
+        record._book = self
+        self._index_name(name)
+        self._changed(record)
+
+    def __delitem__(self, name):
+        record = self.data.cache.get(name)
+        del self.data[name]
+        if record is not None:
+            record._book = None
+        self._unindex_name(name)
+        self._changed(record)
+
+    def _index_phone(self, record, packed):
+        self._changed(record)
+        phone = unpack_phone(packed)
+        digits = phone.lstrip("+")
+        self.conn.execute("INSERT INTO phones (name, phone, digits, rdigits) VALUES (?, ?, ?, ?)",
+                          (record._name, phone, digits, digits[::-1]))
+
+    def _unindex_phone(self, record, packed):
+        self._changed(record)
+        self.conn.execute(
+            "DELETE FROM phones WHERE rowid = (SELECT rowid FROM phones WHERE name = ? AND phone = ? LIMIT 1)",
+            (record._name, unpack_phone(packed)))
+
+    def _index_email(self, record):
+        self._changed(record)
+        _write_email(self.conn, record)
+
+    def _index_birthday(self, record):
+        self._changed(record)
+        _write_birthday(self.conn, record)
+
+    def _unindex_birthday(self, record):
+        pass  # _index_birthday overwrites the row (and changes the version)
+
+    def find_by_phone(self, phone):
+        """Names of contacts that have this exact phone."""
+        if not PHONE_PATTERN.match(phone):
+            return set()
+        return {name for name, in self.conn.execute("SELECT name FROM phones WHERE phone = ?", (phone,))}
+
+    def search_phones(self, prefix="", suffix=""):
+        """Yield (phone, names) for phones whose digits start with prefix or end with suffix."""
+        if suffix:
+            column, key = "rdigits", suffix.lstrip("+")[::-1]
+        else:
+            column, key = "digits", prefix.lstrip("+")
+        if key:
+            low, high = _prefix_range(key)
+            rows = self.conn.execute(
+                f"SELECT phone, name FROM phones WHERE {column} >= ? AND {column} < ? ORDER BY phone",
+                (low, high))
+        else:
+            rows = self.conn.execute("SELECT phone, name FROM phones ORDER BY phone")
+        current, names = None, set()
+        for phone, name in rows:
+            if prefix.startswith("+") and not phone.startswith("+"):
+                continue
+            if phone != current and current is not None:
+                yield current, names
+                names = set()
+            current = phone
+            names.add(name)
+        if current is not None:
+            yield current, names
+
+    def upcoming_birthdays(self, delta, today=None):
+        """Yield (date, record) for birthdays in the next `delta` days, nearest first."""
+        slots = list(birthday_slots(delta, today or date.today()))
+        if not slots:
+            return
+        by_slot: Dict[int, List[str]] = {}
+        placeholders = ",".join("?" * len(slots))
+        for name, slot in self.conn.execute(
+                f"SELECT name, day FROM birthdays WHERE day IN ({placeholders}) ORDER BY name",
+                [slot for _, slot in slots]):
+            by_slot.setdefault(slot, []).append(name)
+        for day, slot in slots:
+            for name in by_slot.get(slot, ()):
+                yield day, self.data[name]
+
+    def iter_by_birthday(self, reverse=False):
+        """Yield records by birthday (latest first if reverse), then those without one, by name."""
+        order = "DESC" if reverse else "ASC"
+        for (name,) in self.conn.execute(f"SELECT name FROM birthdays ORDER BY day {order}, name {order}"):
+            yield self.data[name]
+        for (name,) in self.conn.execute(
+                f"SELECT name FROM records WHERE name NOT IN (SELECT name FROM birthdays) ORDER BY name {order}"):
+            yield self.data[name]
+
+    def commit(self):
+        _set_meta(self.conn, "journal_seq", getattr(self, "journal_seq", 0))
+        self.conn.commit()
+        self.data.cache.clear()
+
+    def __getstate__(self):
+        raise TypeError("SqliteAddressBook is stored in its database, not pickled")
+
+# ------------------------------
+# Notes
+# ------------------------------
+
+def _note_rowid(conn, title):
+    row = conn.execute("SELECT rowid FROM notes WHERE title = ?", (title,)).fetchone()
+    return row[0] if row else None
+
+
+def _write_note(conn, note):
+    # Upsert keeps the rowid stable, which is also the note's rowid in notes_fts.
+    conn.execute("INSERT INTO notes (title, content) VALUES (?, ?) "
+                 "ON CONFLICT(title) DO UPDATE SET content = excluded.content", (note.title, note.content))
+    rowid = _note_rowid(conn, note.title)
+    conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (rowid,))
+    conn.execute("INSERT INTO notes_fts (rowid, content) VALUES (?, ?)", (rowid, note.content))
+    conn.execute("DELETE FROM tags WHERE title = ?", (note.title,))
+    conn.executemany("INSERT INTO tags (title, tag) VALUES (?, ?)", [(note.title, tag) for tag in note.tags])
+
+
+class SqliteNoteMap(MutableMapping):
+    """Title -> Note mapping over the notes tables, with an identity map of loaded notes."""
+
+    def __init__(self, notes: "SqliteNotes"):
+        self.owner = notes
+        self.conn = notes.conn
+        self.cache: Dict[str, Note] = {}
+
+    def __getitem__(self, title):
+        note = self.cache.get(title)
+        if note is not None:
+            return note
+        row = self.conn.execute("SELECT content FROM notes WHERE title = ?", (title,)).fetchone()
+        if row is None:
+            raise KeyError(title)
+        note = Note(title, row[0])
+        for tag, in self.conn.execute("SELECT tag FROM tags WHERE title = ? ORDER BY rowid", (title,)):
+            note.tags[tag] = None
+        note._notes = self.owner
+        self.cache[title] = note
+        return note
+
+    def __setitem__(self, title, note):
+        _write_note(self.conn, note)
+        self.cache[title] = note
+
+    def __delitem__(self, title):
+        rowid = _note_rowid(self.conn, title)
+        if rowid is None:
+            raise KeyError(title)
+        self.conn.execute("DELETE FROM notes_fts WHERE rowid = ?", (rowid,))
+        self.conn.execute("DELETE FROM notes WHERE rowid = ?", (rowid,))
+        self.cache.pop(title, None)
+
+    def __contains__(self, title):
+        return title in self.cache or bool(
+            self.conn.execute("SELECT 1 FROM notes WHERE title = ?", (title,)).fetchone())
+
+    def __iter__(self):
+        for title, in self.conn.execute("SELECT title FROM notes ORDER BY title").fetchall():
+            yield title
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+
+def _fts_query(query: str) -> str:
+    """Translate a find-note query (AND-ed words, 'or' groups, 'word*') to FTS5 syntax."""
+    clauses = []
+    for clause in Notes._parse_query(query):
+        terms = []
+        for term in clause:
+            if term.endswith("*"):
+                terms.append(f'"{term[:-1]}"*')
+            else:
+                terms.append(f'"{term}"')
+        clauses.append("(" + " AND ".join(terms) + ")")
+    return " OR ".join(clauses)
+
+
+def _tags_sql(node: tuple, params: list) -> str:
+    """Translate a parsed tag expression to a compound SELECT of titles."""
+    op = node[0]
+    if op == "tag":
+        params.append(node[1])
+        return "SELECT title FROM tags WHERE tag = ?"
+    if op == "not":
+        return f"SELECT title FROM notes EXCEPT SELECT * FROM ({_tags_sql(node[1], params)})"
+    left = _tags_sql(node[1], params)
+    right = _tags_sql(node[2], params)
+    keyword = "INTERSECT" if op == "and" else "UNION"
+    return f"SELECT * FROM ({left}) {keyword} SELECT * FROM ({right})"
+
+
+class SqliteNotes(Notes):
+    """Notes facade over SQLite: full-text search through FTS5 (bm25), tag queries through SQL."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        super().__init__()
+        self.notes = SqliteNoteMap(self)
+
+    def _reset_index(self, indexed: bool = True) -> None:
+        pass  # the database is the index
+
+    def add_note(self, note: Note) -> None:
+        """Add a new note."""
+        self.notes[note.title] = note
+        note._notes = self
+        self._changed()
+
+    def delete_note(self, title: str) -> bool:
+        """Delete a note by title."""
+        note = self.notes.cache.get(title)
+        try:
+            del self.notes[title]
+        except KeyError:
+            return False
+        if note is not None:
+            note._notes = None
+        self._changed()
+        return True
+
+    def change_note(self, title: str, new_content: str) -> bool:
+        """Change content of an existing note."""
+        note = self.find(title)
+        if note:
+            note.content = new_content
+            self.conn.execute("UPDATE notes SET content = ? WHERE title = ?", (new_content, title))
+            self.conn.execute("UPDATE notes_fts SET content = ? WHERE rowid = ?",
+                              (new_content, _note_rowid(self.conn, title)))
+            self._changed()
+            return True
+        return False
+
+    def _index_tag(self, note: Note, tag: str) -> None:
+        self._changed()
+        self.conn.execute("INSERT OR IGNORE INTO tags (title, tag) VALUES (?, ?)", (note.title, tag))
+
+    def search(self, query: str) -> Iterator[Note]:
+        """Yield notes matching the query, best bm25 score first, streamed from the cursor."""
+        match = _fts_query(query)
+        if not match:
+            return
+        rows = self.conn.execute(
+            "SELECT notes.title FROM notes_fts JOIN notes ON notes.rowid = notes_fts.rowid "
+            "WHERE notes_fts MATCH ? ORDER BY bm25(notes_fts)", (match,))
+        for title, in rows:
+            yield self.notes[title]
+
+    def find_by_tag(self, tag: str) -> List[Note]:
+        """Find notes containing a specific tag."""
+        rows = self.conn.execute("SELECT title FROM tags WHERE tag = ? ORDER BY title", (tag,)).fetchall()
+        return [self.notes[title] for title, in rows]
+
+    def _eval_tags(self, node: tuple) -> Set[str]:
+        params: list = []
+        sql = _tags_sql(node, params)
+        return {title for title, in self.conn.execute(sql, params)}
+
+    def tag_counts(self) -> Dict[str, int]:
+        """Number of notes per tag."""
+        return dict(self.conn.execute("SELECT tag, COUNT(*) FROM tags GROUP BY tag"))
+
+    def commit(self) -> None:
+        _set_meta(self.conn, "journal_seq", getattr(self, "journal_seq", 0))
+        self.conn.commit()
+        self.notes.cache.clear()
+
+    def __getstate__(self) -> dict:
+        raise TypeError("SqliteNotes is stored in its database, not pickled")
+
+# ------------------------------
+# Backend interface
+# ------------------------------
+
+def exists(filename: str, kind: str) -> bool:
+    """Whether contacts/notes were ever saved to this database."""
+    return bool(_get_meta(connect(filename), kind))
+
+
+def save_contacts(book, filename: str) -> None:
+    conn = connect(filename)
+    if isinstance(book, SqliteAddressBook) and book.conn is conn:
+        book.commit()
+        return
+    conn.execute("DELETE FROM records")
+    for record in book.data.values():
+        _write_record(conn, record)
+    _set_meta(conn, "contacts", 1)
+    _set_meta(conn, "journal_seq", getattr(book, "journal_seq", 0))
+    conn.commit()
+
+
+def load_contacts(filename: str) -> SqliteAddressBook:
+    conn = connect(filename)
+    book = SqliteAddressBook(conn)
+    book.journal_seq = _get_meta(conn, "journal_seq")
+    _set_meta(conn, "contacts", 1)
+    return book
+
+
+def save_notes(notes, filename: str) -> None:
+    conn = connect(filename)
+    if isinstance(notes, SqliteNotes) and notes.conn is conn:
+        notes.commit()
+        return
+    conn.execute("DELETE FROM notes")
+    conn.execute("DELETE FROM notes_fts")
+    for note in notes.notes.values():
+        _write_note(conn, note)
+    _set_meta(conn, "notes", 1)
+    _set_meta(conn, "journal_seq", getattr(notes, "journal_seq", 0))
+    conn.commit()
+
+
+def load_notes(filename: str) -> SqliteNotes:
+    conn = connect(filename)
+    notes = SqliteNotes(conn)
+    notes.journal_seq = _get_meta(conn, "journal_seq")
+    _set_meta(conn, "notes", 1)
+    return notes
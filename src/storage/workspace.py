@@ -0,0 +1,272 @@
+import json
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from src.storage.journal import Journal, JOURNAL_FILE, FSYNC_EVERY
+from src.storage.persistence import load_contacts, load_notes, STORAGE_FILES
+from src.storage.saver import Saver, SAVE_EVERY, SAVE_INTERVAL
+
+WORKSPACE_DIR = "books"    # named books live in WORKSPACE_DIR/<name>/
+DEFAULT_BOOK = "default"   # kept in the working directory, where the single book always was
+RESIDENT_BOOKS = 4         # books kept in memory; the least recently used one is unloaded
+META_FILE = "book.json"    # counts and time of the last change, read without loading the book
+BOOK_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+
+def check_name(name):
+    """Raise ValueError unless name can name a book (and its directory)."""
+    if not BOOK_NAME.fullmatch(name):
+        raise ValueError(f"invalid book name '{name}': use letters, digits, '-' and '_'")
+    return name
+
+
+def read_meta(directory):
+    """Metadata written when the book in directory was last saved, {} if there is none."""
+    try:
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+class BookInfo:
+    """What is known about a book without loading it; counts are None when unknown."""
+
+    def __init__(self, name, contacts, notes, modified, resident):
+        self.name = name
+        self.contacts = contacts
+        self.notes = notes
+        self.modified = modified  # time.time() of the last change, None if unknown
+        self.resident = resident
+
+
+class OpenBook:
+    """
+    A book in memory with its notes, journal and saver (None when snapshots are only
+    written on request, as in batch mode).
+    """
+
+    def __init__(self, name, directory, book, notes, journal, saver, modified):
+        self.name = name
+        self.directory = directory
+        self.book = book
+        self.notes = notes
+        self.journal = journal
+        self.saver = saver
+        self.modified = modified
+        self.history = None  # undo history, kept here while another book is in use
+        self._seen = self._saved = self.versions()
+
+    def versions(self):
+        return self.book.version, self.notes.version
+
+    def touch(self):
+        """Call after each command: notes the time if the book or notes changed."""
+        versions = self.versions()
+        if versions != self._seen:
+            self._seen = versions
+            self.modified = time.time()
+
+    @property
+    def dirty(self):
+        """
+        Whether the snapshots lack changes: journal entries (replayed or appended) not
+        saved yet and, without a saver, unjournaled changes since the last save().
+        """
+        if self.saver is not None:
+            return self.journal.entries > 0
+        return self.journal.entries > 0 or self.versions() != self._saved
+
+    def info(self):
+        return BookInfo(self.name, len(self.book), len(self.notes.notes), self.modified, True)
+
+    def save(self):
+        """Write snapshots now."""
+        if self.saver is not None:
+            self.saver.compact()
+        else:
+            self.journal.compact(self.book, self.notes)
+            self._saved = self.versions()
+        self._write_meta()
+
+    def close(self):
+        """Save if dirty, stop the saver and close the journal."""
+        if self.saver is not None:
+            self.saver.close(compact=self.dirty)
+        else:
+            if self.dirty:
+                self.journal.compact(self.book, self.notes)
+            self.journal.close()
+        self._write_meta()
+
+    def _write_meta(self):
+        info = self.info()
+        tmp = os.path.join(self.directory, META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"contacts": info.contacts, "notes": info.notes, "modified": info.modified}, f)
+        os.replace(tmp, os.path.join(self.directory, META_FILE))
+
+
+class Workspace:
+    """
+    Named address books, each with its own notes, journal and snapshots. The default
+    book keeps its files in the working directory; others in WORKSPACE_DIR/<name>/.
+
+    Up to `resident` books stay loaded, in LRU order: using a loaded book costs
+    nothing, and loading one more first unloads the least recently used, saving it
+    if it is dirty. Every unloaded book leaves its counts and the time of its last
+    change in META_FILE, so books() lists all of them without loading any.
+
+    The undo history belongs to the book in use: use() puts it aside with the book
+    it came from, and using() does the same for the length of one request. It is
+    lost when that book is unloaded.
+    """
+
+    def __init__(self, commands, history, root=WORKSPACE_DIR):
+        self.commands = commands  # handlers to replay journals with
+        self.history = history
+        self.root = root
+        self.name = DEFAULT_BOOK
+        self.configure()
+        self._books = OrderedDict()
+        self._pinned = Counter()  # name -> pinned() blocks keeping the book loaded
+
+    def configure(self, storage="recordfile", resident=RESIDENT_BOOKS, savers=True, interval=SAVE_INTERVAL,
+                  every=SAVE_EVERY, fsync_every=FSYNC_EVERY):
+        """Options for the books loaded from now on; savers=False leaves saving to save() and close()."""
+        if resident < 1:
+            raise ValueError("at least one book must stay in memory")
+        self.storage = storage
+        self.resident = resident
+        self.savers = savers
+        self.interval = interval
+        self.every = every
+        self.fsync_every = fsync_every
+
+    @property
+    def current(self):
+        """The book in use, loaded if it is not in memory."""
+        return self.open(self.name)
+
+    def directory(self, name):
+        return "" if name == DEFAULT_BOOK else os.path.join(self.root, name)
+
+    def _files(self, name):
+        directory = self.directory(name)
+        contacts_file, notes_file = STORAGE_FILES[self.storage]
+        return (os.path.join(directory, contacts_file), os.path.join(directory, notes_file),
+                os.path.join(directory, JOURNAL_FILE))
+
+    def open(self, name):
+        """The book called name, loaded (after unloading the least recently used) if needed."""
+        entry = self._books.get(name)
+        if entry is not None:
+            self._books.move_to_end(name)
+            return entry
+        check_name(name)
+        while len(self._books) >= self.resident:
+            evicted = next((other for other in self._books if not self._pinned[other]), None)
+            if evicted is None:
+                break  # all pinned: keep one more for now
+            self._books.pop(evicted).close()
+        entry = self._books[name] = self._load(name)
+        return entry
+
+    def _load(self, name):
+        directory = self.directory(name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        contacts_file, notes_file, journal_file = self._files(name)
+        book = load_contacts(contacts_file)
+        notes = load_notes(notes_file)
+        journal = Journal(journal_file, self.fsync_every, contacts_file, notes_file)
+        enabled, self.history.enabled = self.history.enabled, False  # replayed commands are not undone
+        try:
+            replayed = journal.replay(book, notes, self.commands)
+        finally:
+            self.history.enabled = enabled
+        modified = os.path.getmtime(journal_file) if replayed else read_meta(directory).get("modified")
+        saver = Saver(book, notes, journal, self.interval, self.every) if self.savers else None
+        return OpenBook(name, directory, book, notes, journal, saver, modified or self._mtime(name))
+
+    def use(self, name):
+        """Make the book called name the one in use; returns it."""
+        entry = self.open(name)
+        self._switch(name)
+        return entry
+
+    @contextmanager
+    def pinned(self, name):
+        """
+        Keep the book called name loaded for a with block (yielding it), so a change made
+        in steps, with other books opened in between, is not cut off by an unload.
+        """
+        self._pinned[name] += 1
+        try:
+            yield self.open(name)
+        finally:
+            self._pinned[name] -= 1
+
+    @contextmanager
+    def using(self, name):
+        """
+        Make the book called name the one in use, with its undo history, for a with
+        block only (a request of one of the server's sessions); yields the book. The
+        book in use before is put back after it, without being loaded again if the
+        block unloaded it. A 'use' in the block moves it to another book: self.name
+        inside the block tells which.
+        """
+        previous = self.name
+        entry = self.use(name)
+        try:
+            yield entry
+        finally:
+            self._switch(previous)
+
+    def _switch(self, name):
+        """Hand the undo history over to the book called name (even if it is not loaded)."""
+        if name == self.name:
+            return
+        previous = self._books.get(self.name)  # None if open() just unloaded it
+        state = self.history.detach()
+        if previous is not None:
+            previous.history = state
+        entry = self._books.get(name)
+        if entry is not None:
+            self.history.attach(entry.history)
+            entry.history = None
+        self.name = name
+
+    def _mtime(self, name):
+        times = [os.path.getmtime(f) for f in self._files(name) if os.path.exists(f)]
+        return max(times) if times else None
+
+    def info(self, name):
+        """BookInfo of a book, from memory if it is loaded and from META_FILE otherwise."""
+        entry = self._books.get(name)
+        if entry is not None:
+            return entry.info()
+        meta = read_meta(self.directory(name))
+        return BookInfo(name, meta.get("contacts"), meta.get("notes"), meta.get("modified") or self._mtime(name),
+                        False)
+
+    def books(self):
+        """Names of the books in memory or on disk, sorted."""
+        names = {DEFAULT_BOOK, *self._books}
+        if os.path.isdir(self.root):
+            names.update(name for name in os.listdir(self.root)
+                         if BOOK_NAME.fullmatch(name) and os.path.isdir(os.path.join(self.root, name)))
+        return sorted(names)
+
+    def resident_books(self):
+        """The loaded books, least recently used first."""
+        return list(self._books.values())
+
+    def close(self):
+        """Save the dirty books and unload all of them."""
+        while self._books:
+            _, entry = self._books.popitem(last=False)
+            entry.close()
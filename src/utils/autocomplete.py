@@ -1,32 +1,107 @@
-import difflib
-
-def guess_command(user_input, commands, aliases):
-    user_input = user_input.lower()
-    possible = list(commands.keys()) + list(aliases.keys())
-
-    prefix_matches = [cmd for cmd in possible if cmd.startswith(user_input)]
-    
-    if len(prefix_matches) == 1:
-        return prefix_matches[0]
-    elif len(prefix_matches) > 1:
-        return prefix_matches[0]
-
-    matches = difflib.get_close_matches(user_input, possible, n=1, cutoff=0.8)
-    if matches:
-        return matches[0]
-    return None
-
-def smart_guess(user_input, commands, aliases):
-    text = user_input.lower()
-    
-    if text in aliases:
-        return aliases[text]
-    
-    if text in commands:
-        return text
-    
-    for cmd in commands:
-        if cmd in text:
-            return cmd
-
-    return guess_command(text, commands, aliases)
+from src.utils.trie import Trie
+
+MAX_DISTANCE = 2     # typos tolerated in command names (1 for names of up to SHORT_NAME chars)
+SHORT_NAME = 4
+CACHE_SIZE = 65536   # remembered inputs before the memo is cleared
+
+
+def edit_distance(a, b, limit=None):
+    """
+    Optimal string alignment distance: insertions, deletions, substitutions and adjacent
+    swaps. With a limit, it stops as soon as the distance must exceed it and returns
+    some number above the limit.
+    """
+    if limit is not None and abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if limit is not None and min(row) > limit and min(prev) > limit:  # swaps reach back two rows
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+def deletes(word, depth):
+    """All strings obtained from word by removing up to `depth` characters (word included)."""
+    result = frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        result = result | frontier
+    return result
+
+
+class Dispatcher:
+    """
+    Resolves user input to a command name. Built once from the command and alias tables.
+
+    Resolution order: exact command or alias, then prefix (via a trie), then typos within
+    MAX_DISTANCE edits (via a SymSpell-style index of precomputed deletions). A prefix matching
+    several commands resolves only when one of them is a prefix of all the others ('ad' -> 'add');
+    otherwise the input is ambiguous and every candidate is reported. Results are memoized.
+    """
+
+    def __init__(self, commands, aliases, max_distance=MAX_DISTANCE):
+        self.max_distance = max_distance
+        self.targets = {name: name for name in commands}
+        self.targets.update((alias, target) for alias, target in aliases.items())
+        self.longest = max(map(len, self.targets), default=0)
+
+        self._prefixes = Trie()
+        self._deletes = {}
+        for name in self.targets:
+            self._prefixes.insert(name, name)
+            for variant in deletes(name, max_distance):
+                self._deletes.setdefault(variant, set()).add(name)
+        self._cache = {}
+
+    def resolve(self, text):
+        """Command name for text, or None if it is unknown or ambiguous."""
+        found = self.candidates(text)
+        return found[0] if len(found) == 1 else None
+
+    def candidates(self, text):
+        """Sorted tuple of commands text may stand for: one for a clear match, several if ambiguous."""
+        text = text.lower()
+        found = self._cache.get(text)
+        if found is None:
+            found = self._lookup(text)
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[text] = found
+        return found
+
+    def _lookup(self, text):
+        if not text:
+            return ()
+        target = self.targets.get(text)
+        if target is not None:
+            return (target,)
+
+        names = sorted(set(self._prefixes.iter_prefix(text)), key=len)
+        if names:
+            root = names[0]
+            if all(name.startswith(root) for name in names):
+                return (self.targets[root],)
+            return tuple(sorted({self.targets[name] for name in names}))
+
+        limit = 1 if len(text) <= SHORT_NAME else self.max_distance
+        if len(text) > self.longest + limit:
+            return ()
+        names = set()
+        for variant in deletes(text, limit):
+            names.update(self._deletes.get(variant, ()))
+        best, matches = limit + 1, set()
+        for name in names:
+            if abs(len(name) - len(text)) <= limit:
+                distance = edit_distance(text, name)
+                if distance < best:
+                    best, matches = distance, {self.targets[name]}
+                elif distance == best:
+                    matches.add(self.targets[name])
+        return tuple(sorted(matches))
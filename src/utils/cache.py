@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+CACHE_SIZE = 256  # results kept by default
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of command results. Keys include the versions of the stores a
+    result was read from, so a change makes its old results unreachable; they are
+    evicted as the least recently used.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.enabled = maxsize > 0
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key, compute):
+        """The result cached under key, or compute() (cached unless it raises)."""
+        if not self.enabled:
+            return compute()
+        try:
+            result = self._results[key]
+        except KeyError:
+            self.misses += 1
+            result = self._results[key] = compute()
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+            return result
+        self.hits += 1
+        self._results.move_to_end(key)
+        return result
+
+    def clear(self):
+        """Drop the results and reset the counters."""
+        self._results.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,93 @@
+import os
+import sys
+import zlib
+
+# Environment variables Rich reads when choosing the size and colours of a console.
+CONSOLE_ENV = ("TERM", "COLORTERM", "NO_COLOR", "FORCE_COLOR", "TTY_COMPATIBLE", "TTY_INTERACTIVE",
+               "COLUMNS", "LINES", "JUPYTER_COLUMNS")
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                         "addressbook-assistant-bot")
+
+
+class LazyConsole:
+    """
+    A Rich Console created on first use: importing Rich is most of the startup time, and
+    batch runs or a session without tables never need it. Attributes set before the
+    console exists (like quiet) are passed to its constructor.
+    """
+
+    def __init__(self, **options):
+        object.__setattr__(self, "_options", options)
+        object.__setattr__(self, "_console", None)
+
+    @property
+    def loaded(self):
+        return self._console is not None
+
+    @property
+    def quiet(self):
+        return self._options.get("quiet", False) if self._console is None else self._console.quiet
+
+    @property
+    def file(self):
+        if self._console is None:
+            return self._options.get("file") or sys.stdout
+        return self._console.file
+
+    def get(self):
+        """The Rich console, created now if needed."""
+        if self._console is None:
+            from rich.console import Console
+            object.__setattr__(self, "_console", Console(**self._options))
+        return self._console
+
+    def __getattr__(self, name):
+        if self._console is None and name in self._options:
+            return self._options[name]
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        if self._console is None:
+            self._options[name] = value
+        else:
+            setattr(self._console, name, value)
+
+
+def terminal_key(*parts):
+    """
+    Checksum of everything a default console's output depends on, read without importing
+    Rich: the terminal size, whether stdout is a terminal, the environment variables Rich
+    looks at and the installed Rich version (by file time), plus the given parts.
+    """
+    try:
+        size = tuple(os.get_terminal_size(sys.stdout.fileno()))
+        tty = sys.stdout.isatty()
+    except (AttributeError, ValueError, OSError):
+        size, tty = None, False
+    from importlib.util import find_spec  # only needed when the help is shown
+    spec = find_spec("rich")
+    rich = os.stat(spec.origin).st_mtime_ns if spec and spec.origin else None
+    state = (size, tty, rich, tuple(os.environ.get(name) for name in CONSOLE_ENV), parts)
+    return zlib.crc32(repr(state).encode("utf-8"))
+
+
+def read_cached(name):
+    """Text cached under name by an earlier run, or None."""
+    try:
+        with open(os.path.join(CACHE_DIR, name), encoding="utf-8") as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def write_cached(name, text):
+    """Cache text under name for later runs; a cache that cannot be written is skipped."""
+    path = os.path.join(CACHE_DIR, name)
+    tmp = f"{path}.{os.getpid()}.tmp"  # runs started together do not share a temp file
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError:
+        pass
@@ -0,0 +1,214 @@
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_BITS = 64
+
+MISSING = object()  # returned for absent keys by PersistentMap.diff
+
+
+class _Node:
+    """Bitmap-indexed node: `children` holds one entry per set bit of `bitmap`."""
+    __slots__ = ("bitmap", "children")
+
+    def __init__(self, bitmap, children):
+        self.bitmap = bitmap
+        self.children = children  # tuple of _Node, _Collision or (key, value, hash) leaves
+
+
+class _Collision:
+    """Keys whose hashes are equal in every bit."""
+    __slots__ = ("hash", "items")
+
+    def __init__(self, hash_, items):
+        self.hash = hash_
+        self.items = items  # tuple of (key, value)
+
+
+_EMPTY = _Node(0, ())
+
+
+def _hash(key):
+    return hash(key) & ((1 << HASH_BITS) - 1)
+
+
+def _popcount(x):
+    return bin(x).count("1")
+
+
+def _merge(a, b, shift):
+    """Smallest subtree holding a leaf or collision `a` and a leaf `b` with a new key."""
+    ha = a.hash if isinstance(a, _Collision) else a[2]
+    if ha == b[2]:
+        return _Collision(ha, (a.items if isinstance(a, _Collision) else (a[:2],)) + (b[:2],))
+    ia, ib = (ha >> shift) & MASK, (b[2] >> shift) & MASK
+    if ia == ib:
+        return _Node(1 << ia, (_merge(a, b, shift + BITS),))
+    return _Node((1 << ia) | (1 << ib), (a, b) if ia < ib else (b, a))
+
+
+def _set(node, key, value, h, shift):
+    """Return (new node, whether a key was added); the same node if nothing changed."""
+    bit = 1 << ((h >> shift) & MASK)
+    index = _popcount(node.bitmap & (bit - 1))
+    if not node.bitmap & bit:
+        children = node.children[:index] + ((key, value, h),) + node.children[index:]
+        return _Node(node.bitmap | bit, children), True
+
+    child = node.children[index]
+    added = False
+    if isinstance(child, _Node):
+        new_child, added = _set(child, key, value, h, shift + BITS)
+    elif isinstance(child, _Collision):
+        if h == child.hash:
+            items = tuple(item for item in child.items if item[0] != key)
+            added = len(items) == len(child.items)
+            new_child = _Collision(h, items + ((key, value),))
+        else:
+            new_child, added = _merge(child, (key, value, h), shift + BITS), True
+    elif child[0] == key:
+        new_child = child if child[1] is value or child[1] == value else (key, value, h)
+    else:
+        new_child, added = _merge(child, (key, value, h), shift + BITS), True
+    if new_child is child:
+        return node, False
+    return _Node(node.bitmap, node.children[:index] + (new_child,) + node.children[index + 1:]), added
+
+
+def _delete(node, key, h, shift):
+    """Return the node without key (None if it became empty); the same node if key is absent."""
+    bit = 1 << ((h >> shift) & MASK)
+    if not node.bitmap & bit:
+        return node
+    index = _popcount(node.bitmap & (bit - 1))
+    child = node.children[index]
+    if isinstance(child, _Node):
+        new_child = _delete(child, key, h, shift + BITS)
+        if new_child is not None and len(new_child.children) == 1 and not isinstance(new_child.children[0], _Node):
+            new_child = new_child.children[0]  # a lone leaf moves up to where its hash prefix ends
+    elif isinstance(child, _Collision):
+        items = tuple(item for item in child.items if item[0] != key)
+        if len(items) == len(child.items):
+            return node
+        new_child = _Collision(child.hash, items) if len(items) > 1 else items[0] + (child.hash,)
+    else:
+        new_child = None if child[0] == key else child
+    if new_child is child:
+        return node
+    if new_child is None:
+        if node.bitmap == bit:
+            return None
+        return _Node(node.bitmap & ~bit, node.children[:index] + node.children[index + 1:])
+    return _Node(node.bitmap, node.children[:index] + (new_child,) + node.children[index + 1:])
+
+
+def _items(entry):
+    if isinstance(entry, _Node):
+        stack = [entry]
+        while stack:
+            for child in stack.pop().children:
+                if isinstance(child, _Node):
+                    stack.append(child)
+                elif isinstance(child, _Collision):
+                    yield from child.items
+                else:
+                    yield child[0], child[1]
+    elif isinstance(entry, _Collision):
+        yield from entry.items
+    elif entry is not None:
+        yield entry[0], entry[1]
+
+
+def _diff(a, b):
+    if a is b:
+        return
+    if isinstance(a, _Node) and isinstance(b, _Node):
+        if a.bitmap == b.bitmap:
+            for ca, cb in zip(a.children, b.children):
+                if ca is not cb:
+                    yield from _diff(ca, cb)
+            return
+        bitmap = a.bitmap | b.bitmap
+        while bitmap:
+            bit = bitmap & -bitmap
+            bitmap ^= bit
+            ca = a.children[_popcount(a.bitmap & (bit - 1))] if a.bitmap & bit else None
+            cb = b.children[_popcount(b.bitmap & (bit - 1))] if b.bitmap & bit else None
+            if ca is not cb:
+                yield from _diff(ca, cb)
+        return
+    old, new = dict(_items(a)), dict(_items(b))
+    for key, value in old.items():
+        other = new.get(key, MISSING)
+        if other is MISSING or (other is not value and other != value):
+            yield key, value, other
+    for key, value in new.items():
+        if key not in old:
+            yield key, MISSING, value
+
+
+class PersistentMap:
+    """
+    Immutable hash map (a hash array mapped trie) whose updates return a new map.
+
+    set() and delete() copy only the O(log32 n) nodes on the path to the key and share
+    everything else with the old map, so keeping many versions costs memory proportional
+    to the changes. diff() walks two versions and skips the subtrees they share.
+    """
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, items=()):
+        self._root, self._size = _EMPTY, 0
+        for key, value in items:
+            self._root, added = _set(self._root, key, value, _hash(key), 0)
+            self._size += added
+
+    @classmethod
+    def _make(cls, root, size):
+        new = cls.__new__(cls)
+        new._root, new._size = root, size
+        return new
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def __iter__(self):
+        for key, _ in _items(self._root):
+            yield key
+
+    def items(self):
+        return _items(self._root)
+
+    def get(self, key, default=None):
+        h, shift, node = _hash(key), 0, self._root
+        while True:
+            bit = 1 << ((h >> shift) & MASK)
+            if not node.bitmap & bit:
+                return default
+            child = node.children[_popcount(node.bitmap & (bit - 1))]
+            if isinstance(child, _Node):
+                node, shift = child, shift + BITS
+            elif isinstance(child, _Collision):
+                for k, v in child.items:
+                    if k == key:
+                        return v
+                return default
+            else:
+                return child[1] if child[0] == key else default
+
+    def set(self, key, value):
+        """New map with key set to value (this map if it already was)."""
+        root, added = _set(self._root, key, value, _hash(key), 0)
+        return self if root is self._root else self._make(root, self._size + added)
+
+    def delete(self, key):
+        """New map without key (this map if it was absent)."""
+        root = _delete(self._root, key, _hash(key), 0)
+        if root is self._root:
+            return self
+        return self._make(root if root is not None else _EMPTY, self._size - 1)
+
+    def diff(self, other):
+        """Yield (key, value here, value in other) for keys that differ; MISSING marks an absent key."""
+        return _diff(self._root, other._root)
@@ -0,0 +1,124 @@
+import json
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+
+# Latency buckets: upper bounds growing by 2**(1/4) (at most 19% apart) from 1 us to about 2 min.
+BUCKET_BOUNDS = [1e-6 * 2 ** (i / 4) for i in range(4 * 27 + 1)]
+PROMETHEUS_EVERY = 4  # exported buckets are every 4th bound: 1 us, 2 us, 4 us, ...
+PREFIX = "addressbook"
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Call count, error count and latency distribution of one operation."""
+    __slots__ = ("count", "errors", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)  # the last one is above every bound
+
+    def observe(self, seconds, error=False):
+        self.count += 1
+        self.errors += error
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th fraction of calls (the max for the last one)."""
+        rank = p * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return 0.0
+
+
+class Metrics:
+    """
+    Histograms per (family, name): "command" handlers, "storage" loads and saves,
+    "dispatch" of typed commands. Recording is off until `enabled` is set; then every
+    timed call costs a clock read and a bisect.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+
+    def observe(self, family, name, seconds, error=False):
+        histogram = self.histograms.get((family, name))
+        if histogram is None:
+            histogram = self.histograms[family, name] = Histogram()
+        histogram.observe(seconds, error)
+
+    def reset(self):
+        self.histograms.clear()
+
+    def rows(self):
+        """(family, name, histogram) sorted by family and name."""
+        return [(family, name, self.histograms[family, name]) for family, name in sorted(self.histograms)]
+
+    def to_json(self):
+        result = {}
+        for family, name, h in self.rows():
+            result.setdefault(family, {})[name] = {
+                "count": h.count,
+                "errors": h.errors,
+                "total_seconds": h.total,
+                "max_seconds": h.max,
+                **{f"p{round(p * 100)}_seconds": h.percentile(p) for p in PERCENTILES},
+            }
+        return json.dumps(result, indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """Text exposition format: one histogram and one error counter per family."""
+        lines = []
+        families = sorted({family for family, _ in self.histograms})
+        for family in families:
+            metric = f"{PREFIX}_{family}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for fam, name, h in self.rows():
+                if fam != family:
+                    continue
+                label = f'{family}="{name}"'
+                cumulative = 0
+                for i, bound in enumerate(BUCKET_BOUNDS):
+                    cumulative += h.buckets[i]
+                    if i % PROMETHEUS_EVERY == 0:
+                        lines.append(f'{metric}_bucket{{{label},le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {h.count}')
+                lines.append(f"{metric}_sum{{{label}}} {h.total:.9g}")
+                lines.append(f"{metric}_count{{{label}}} {h.count}")
+            errors = f"{PREFIX}_{family}_errors_total"
+            lines.append(f"# TYPE {errors} counter")
+            for fam, name, h in self.rows():
+                if fam == family:
+                    lines.append(f'{errors}{{{family}="{name}"}} {h.errors}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def timed(family, name=None):
+    """Record the latency of every call of the decorated function while metrics are enabled."""
+    def decorator(func):
+        label = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe(family, label, perf_counter() - started)
+        return wrapper
+    return decorator
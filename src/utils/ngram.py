@@ -0,0 +1,137 @@
+import heapq
+from collections import Counter
+from itertools import chain
+
+from src.utils.autocomplete import deletes, edit_distance
+
+N = 3
+MAX_TYPOS = 2          # edits a match may have; each destroys at most N + 1 grams of the query
+SHORT_QUERY = (N + 1) * MAX_TYPOS  # queries this short may share no gram with a match
+SCAN_BUDGET = 20_000   # posting entries merged per query, rarest grams first
+CANDIDATES = 200       # keys sharing the most grams that are checked by edit distance
+
+
+def ngrams(text, n=N):
+    """Set of case-folded character n-grams of text, padded with a space on each side."""
+    padded = " " + text.casefold() + " "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def similarity(grams, key):
+    """Jaccard similarity of a set of grams and the grams of key."""
+    key_grams = ngrams(key)
+    common = len(grams & key_grams)
+    return common / (len(grams) + len(key_grams) - common)
+
+
+class NgramIndex:
+    """
+    Character trigram index over a set of string keys for approximate (typo-tolerant) lookup.
+
+    Postings are lists of key ids per (gram, key length). A key within MAX_TYPOS edits of the
+    query is at most MAX_TYPOS characters longer or shorter, so a query only reads those length
+    buckets. It merges the postings of its rarest grams (up to SCAN_BUDGET ids) with a C-level
+    Counter and keeps the keys sharing the most of them; edit distance decides which of those
+    match. A typo or two can leave a short query no gram in common with its key ("Jhon" and
+    "John"), so keys of up to SHORT_QUERY + 1 characters are also indexed by every one-letter
+    deletion, which finds each key one edit away from a short query. Removed keys leave
+    tombstone ids that are dropped by a rebuild once they outnumber the live keys.
+    """
+
+    def __init__(self, keys=()):
+        self._ids = {}       # key -> id
+        self._keys = []      # id -> key, None once removed
+        self._postings = {}  # (gram, key length) -> list of ids
+        self._deletes = {}   # short key, case-folded, less at most one letter -> list of ids
+        self._removed = 0
+        for key in keys:
+            self.add(key)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def add(self, key):
+        """Index key (no-op if it is already there)."""
+        if key in self._ids:
+            return
+        i = self._ids[key] = len(self._keys)
+        self._keys.append(key)
+        length = len(key)
+        for gram in ngrams(key):
+            postings = self._postings.get((gram, length))
+            if postings is None:
+                postings = self._postings[gram, length] = []
+            postings.append(i)
+        if length <= SHORT_QUERY + 1:
+            for variant in deletes(key.casefold(), 1):
+                ids = self._deletes.get(variant)
+                if ids is None:
+                    ids = self._deletes[variant] = []
+                ids.append(i)
+
+    def remove(self, key):
+        """Forget key."""
+        i = self._ids.pop(key, None)
+        if i is None:
+            return
+        self._keys[i] = None
+        self._removed += 1
+        if self._removed > len(self._ids):
+            self._rebuild()
+
+    def _rebuild(self):
+        keys = list(self._ids)
+        self._ids, self._keys, self._postings, self._deletes, self._removed = {}, [], {}, {}, 0
+        for key in keys:
+            self.add(key)
+
+    def search(self, query, limit=10):
+        """Up to `limit` keys within MAX_TYPOS edits of query, fewest edits first."""
+        grams = ngrams(query)
+        lengths = range(max(1, len(query) - MAX_TYPOS), len(query) + MAX_TYPOS + 1)
+        per_gram = []
+        for gram in grams:
+            buckets = [ids for ids in (self._postings.get((gram, length)) for length in lengths) if ids]
+            if buckets:
+                per_gram.append((sum(map(len, buckets)), buckets))
+        per_gram.sort(key=lambda item: item[0])
+
+        scanned = total = 0
+        for size, _ in per_gram:
+            if scanned >= 2 and total + size > SCAN_BUDGET:
+                break
+            scanned += 1
+            total += size
+        shared = Counter(chain.from_iterable(
+            ids for _, buckets in per_gram[:scanned] for ids in buckets))
+
+        # Keep the keys sharing the most grams: whole count levels, up to CANDIDATES keys
+        # (or the top level alone), never below what MAX_TYPOS edits could leave.
+        floor = max(1, scanned - (N + 1) * MAX_TYPOS)
+        need, kept = len(grams) + 1, 0
+        histogram = Counter(shared.values())
+        for count in sorted(histogram, reverse=True):
+            if count < floor or (kept and kept + histogram[count] > CANDIDATES):
+                break
+            need, kept = count, kept + histogram[count]
+
+        keys = self._keys
+        candidates = {i for i, count in shared.items() if count >= need and keys[i] is not None}
+        if len(candidates) > CANDIDATES:
+            candidates = set(heapq.nlargest(CANDIDATES, candidates, key=lambda i: similarity(grams, keys[i])))
+        target = query.casefold()
+        if len(query) <= SHORT_QUERY:
+            for variant in deletes(target, 1):
+                candidates.update(i for i in self._deletes.get(variant, ()) if keys[i] is not None)
+
+        ranked = []
+        for i in candidates:
+            key = keys[i]
+            distance = edit_distance(target, key.casefold(), MAX_TYPOS)
+            if distance <= MAX_TYPOS:
+                ranked.append((distance, -similarity(grams, key), key))
+        ranked.sort()
+        return [key for _, _, key in ranked[:limit]]
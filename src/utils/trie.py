@@ -0,0 +1,97 @@
+BURST_LIMIT = 64  # keys a leaf bucket holds before it is split into child nodes
+
+
+class _Node:
+    __slots__ = ("children", "values", "bucket")
+
+    def __init__(self):
+        self.children = None  # char -> _Node, once the node has burst
+        self.values = ()      # values whose key ends exactly at this node
+        self.bucket = {}      # key remainder -> tuple of values, until the node bursts
+
+
+class Trie:
+    """
+    Burst trie mapping string keys to small tuples of values, with prefix iteration.
+
+    Keys live in leaf buckets that split into per-character child nodes when they grow
+    past BURST_LIMIT, so millions of keys need thousands of nodes instead of a dict per character.
+    """
+
+    def __init__(self):
+        self.root = _Node()
+
+    def insert(self, key, value):
+        """Store value under key."""
+        node, i = self.root, 0
+        while node.bucket is None:
+            if i == len(key):
+                if value not in node.values:
+                    node.values += (value,)
+                return
+            child = node.children.get(key[i])
+            if child is None:
+                child = node.children[key[i]] = _Node()
+            node, i = child, i + 1
+        rest = key[i:]
+        values = node.bucket.get(rest, ())
+        if value not in values:
+            node.bucket[rest] = values + (value,)
+        if len(node.bucket) > BURST_LIMIT:
+            self._burst(node)
+
+    def _burst(self, node):
+        bucket, node.bucket, node.children = node.bucket, None, {}
+        for rest, values in bucket.items():
+            if not rest:
+                node.values = values
+                continue
+            child = node.children.get(rest[0])
+            if child is None:
+                child = node.children[rest[0]] = _Node()
+            child.bucket[rest[1:]] = values
+        for child in node.children.values():
+            if len(child.bucket) > BURST_LIMIT:
+                self._burst(child)
+
+    def remove(self, key, value):
+        """Remove value from key."""
+        node, i = self.root, 0
+        while node.bucket is None:
+            if i == len(key):
+                node.values = tuple(v for v in node.values if v != value)
+                return
+            node = node.children.get(key[i])
+            if node is None:
+                return
+            i += 1
+        rest = key[i:]
+        values = tuple(v for v in node.bucket.get(rest, ()) if v != value)
+        if values:
+            node.bucket[rest] = values
+        else:
+            node.bucket.pop(rest, None)
+
+    def iter_prefix(self, prefix):
+        """Yield values of all keys starting with prefix."""
+        node, i = self.root, 0
+        while node.bucket is None and i < len(prefix):
+            node = node.children.get(prefix[i])
+            if node is None:
+                return
+            i += 1
+        if node.bucket is not None:
+            rest = prefix[i:]
+            for key, values in node.bucket.items():
+                if key.startswith(rest):
+                    yield from values
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield from node.values
+            if node.bucket is not None:
+                for values in node.bucket.values():
+                    yield from values
+            else:
+                stack.extend(node.children.values())